@@ -0,0 +1,79 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Import time budget of the srim modules
+
+Each module is imported in a fresh interpreter with -X importtime, the
+best of several runs is compared to its budget and the modules that
+should stay lazy (yaml, scipy, asyncio) are checked not to be imported.
+
+    python benchmarks/bench_import.py [--repeat 5] [--budget 150]
+
+Exits with status 1 when a module is over budget.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+MODULES = ('srim', 'srim.output', 'srim.routine')
+LAZY_MODULES = ('yaml', 'scipy', 'asyncio')
+
+
+def import_time(module):
+    """ Cumulative import time [ms] of module and the lazy modules it imported """
+    code = 'import sys, {0}; print(",".join(m for m in {1!r} if m in sys.modules))'.format(
+        module, LAZY_MODULES)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    for line in reversed(process.stderr.splitlines()):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1000.0
+            break
+    else:
+        raise RuntimeError('no import time reported for {}'.format(module))
+    imported = [name for name in process.stdout.strip().split(',') if name]
+    return cumulative, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure import time of srim modules')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per module, the best is kept')
+    parser.add_argument('--budget', type=float, default=150.0, help='budget [ms] per module')
+    parser.add_argument('--json', action='store_true', help='print results as json')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in MODULES:
+        times = []
+        for _ in range(args.repeat):
+            cumulative, imported = import_time(module)
+            times.append(cumulative)
+        results[module] = {
+            'ms': min(times),
+            'budget_ms': args.budget,
+            'lazy_modules_imported': imported
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results.items():
+            print('{:<16s} {:8.1f} ms (budget {:.0f} ms) {}'.format(
+                module, result['ms'], result['budget_ms'],
+                'imports ' + ', '.join(result['lazy_modules_imported']) if result['lazy_modules_imported'] else ''))
+
+    over = [module for module, result in results.items()
+            if result['ms'] > result['budget_ms'] or result['lazy_modules_imported']]
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Throughput and peak memory of the output parsers and input writers
+
+Fixtures are generated once (see fixtures.py) and reused by later runs:
+
+    python benchmarks/bench_suite.py --fixtures /tmp/pysrim-bench --json results.json
+    python benchmarks/bench_suite.py --collision-sizes 100MB,1GB,10GB --only collision
+    python benchmarks/bench_suite.py --compare results.json --tolerance 0.25
+
+Each benchmark keeps the best time of --repeat runs and measures the
+peak of the python allocations (tracemalloc, numpy arrays included,
+memory maps excluded) in one more run. With --compare the results are
+checked against a previous --json file and the exit status is 1 when
+a benchmark got slower or bigger than the tolerance allows.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+from fixtures import Fixtures, calculation, parse_size
+
+from srim import output
+from srim.output import (
+    Results, Ioniz, Vacancy, NoVacancy, EnergyToRecoils, Phonons, Range,
+    Transmit, Backscat, Sputter, Range3D, EXYZ, SRResults, Collision, read_table
+)
+from srim.routine import merge_results
+from srim.input import TRIMInput
+from srim.core.elementdb import ElementDB
+
+
+class Benchmark(object):
+    """ A timed function
+
+    :param str name: name of the benchmark
+    :param callable function: called without argument, once per repeat
+    :param int size: bytes processed per call (throughput in MB/s)
+    :param int operations: operations per call (throughput in operations/s)
+    :param callable setup: called before each call, outside of the timing
+    """
+    def __init__(self, name, function, size=None, operations=None, setup=None):
+        self.name = name
+        self.function = function
+        self.size = size
+        self.operations = operations
+        self.setup = setup
+
+    def _call(self):
+        if self.setup:
+            self.setup()
+        start = time.perf_counter()
+        self.function()
+        return time.perf_counter() - start
+
+    def run(self, repeat=3, memory=True):
+        times = [self._call() for _ in range(repeat)]
+        result = {'seconds': min(times), 'mean_seconds': sum(times) / len(times), 'repeat': repeat}
+        if self.size:
+            result['bytes'] = self.size
+            result['mb_per_s'] = self.size / 1.0e6 / result['seconds']
+        if self.operations:
+            result['operations'] = self.operations
+            result['operations_per_s'] = self.operations / result['seconds']
+        if memory:
+            if self.setup:
+                self.setup()
+            tracemalloc.start()
+            try:
+                self.function()
+                result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 1.0e6
+            finally:
+                tracemalloc.stop()
+        return result
+
+
+def table_benchmarks(directory):
+    """ read_table, the SRIM_Output tables, the per particle files and SR_OUTPUT.txt """
+    benchmarks = []
+    tables = [
+        ('IONIZ.txt', Ioniz), ('VACANCY.txt', Vacancy), ('NOVAC.txt', NoVacancy),
+        ('E2RECOIL.txt', EnergyToRecoils), ('PHONON.txt', Phonons), ('RANGE.txt', Range),
+        ('TRANSMIT.txt', Transmit), ('BACKSCAT.txt', Backscat), ('SPUTTER.txt', Sputter),
+        ('RANGE_3D.txt', Range3D), ('EXYZ.txt', EXYZ), ('SR_OUTPUT.txt', SRResults)
+    ]
+    for filename, table_type in tables:
+        path = os.path.join(directory, filename)
+        size = os.path.getsize(path)
+        if filename in output.header_filenames:
+            with open(path, 'rb') as f:
+                content = f.read()
+            benchmarks.append(Benchmark('read_table.{}'.format(filename),
+                                        lambda content=content: read_table(content), size=size))
+        benchmarks.append(Benchmark('{}'.format(table_type.__name__),
+                                    lambda table_type=table_type: table_type(directory), size=size))
+
+    size = sum(os.path.getsize(os.path.join(directory, filename)) for filename in output.header_filenames)
+    benchmarks.append(Benchmark('Results.load', lambda: Results(directory).load(), size=size))
+    return benchmarks
+
+
+def collision_benchmarks(path, random_ions=1000, batch_size=1000):
+    """ Index, sidecar index, random access and sequential iteration of a COLLISON file """
+    size = os.path.getsize(path)
+    label = os.path.basename(path)[len('COLLISON-'):-len('.txt')]
+
+    def index():
+        Collision(path, index_file=False).close()
+
+    def load_index():
+        Collision(path).close()
+
+    # writes the sidecar index read by load_index
+    collision = Collision(path)
+    rng = random.Random(0)
+    ions = [rng.randrange(len(collision)) for _ in range(random_ions)]
+
+    def read_arrays():
+        for i in ions:
+            collision.read_arrays(i)
+
+    def read_dicts():
+        for i in ions[:random_ions // 10]:
+            collision[i]
+
+    def iter_ions():
+        with Collision(path, index_file=False) as c:
+            for _ in c.iter_ions(batch_size=batch_size, arrays=True):
+                pass
+
+    return [
+        Benchmark('collision.index.{}'.format(label), index, size=size),
+        Benchmark('collision.index_sidecar.{}'.format(label), load_index, size=size),
+        Benchmark('collision.read_arrays.{}'.format(label), read_arrays, operations=len(ions)),
+        Benchmark('collision.getitem.{}'.format(label), read_dicts, operations=len(ions[:random_ions // 10])),
+        Benchmark('collision.iter_ions.{}'.format(label), iter_ions, size=size),
+    ]
+
+
+def merge_benchmarks(directories):
+    """ merge_results of the step run directories """
+    save_directory = tempfile.mkdtemp(prefix='pysrim-bench-')
+    size = sum(os.path.getsize(os.path.join(directory, filename))
+               for directory in directories for filename in ('RANGE.txt', 'VACANCY.txt'))
+    return [Benchmark('merge_results', lambda: merge_results(directories, save_directory=save_directory),
+                      size=size)]
+
+
+def input_benchmarks(count=200):
+    """ TRIMInput.write with new targets (no cached blocks) and with the same target """
+    directory = tempfile.mkdtemp(prefix='pysrim-bench-')
+    srim = calculation()
+    calculations = []
+
+    def new_calculations():
+        calculations[:] = [calculation() for _ in range(count)]
+
+    def write_new():
+        for srim in calculations:
+            TRIMInput(srim).write(directory)
+
+    def write_same():
+        for _ in range(count):
+            TRIMInput(srim).write(directory)
+
+    return [
+        Benchmark('TRIMInput.write.new_target', write_new, operations=count, setup=new_calculations),
+        Benchmark('TRIMInput.write.same_target', write_same, operations=count),
+    ]
+
+
+def elementdb_benchmarks(count=100000):
+    """ ElementDB.lookup by symbol, name and atomic number """
+    elements = list(ElementDB.database().values())
+    identifiers = {
+        'symbol': [element['symbol'] for element in elements],
+        'name': [element['name'] for element in elements],
+        'atomic_number': [element['z'] for element in elements]
+    }
+    benchmarks = []
+    for kind, values in identifiers.items():
+        values = (values * (count // len(values) + 1))[:count]
+
+        def lookup(values=values):
+            for value in values:
+                ElementDB.lookup(value)
+        benchmarks.append(Benchmark('ElementDB.lookup.{}'.format(kind), lookup, operations=count))
+    return benchmarks
+
+
+def compare(results, baseline, tolerance):
+    """ Names and reasons of the benchmarks slower or bigger than baseline by more than tolerance """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = result['seconds'] / reference['seconds']
+        if ratio > 1.0 + tolerance:
+            regressions.append((name, 'time x{:.2f}'.format(ratio)))
+        if 'peak_memory_mb' in result and 'peak_memory_mb' in reference:
+            # allocations under 1 MB are noise
+            memory = max(reference['peak_memory_mb'], 1.0)
+            if result['peak_memory_mb'] > memory * (1.0 + tolerance):
+                regressions.append((name, 'memory {:.1f} MB (was {:.1f} MB)'.format(
+                    result['peak_memory_mb'], reference['peak_memory_mb'])))
+    return regressions
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark srim output parsers and input writers')
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'pysrim-bench'),
+                        help='fixtures directory, generated when missing')
+    parser.add_argument('--bins', type=int, default=100, help='rows of the depth tables')
+    parser.add_argument('--particles', type=int, default=100000, help='rows of the per particle files')
+    parser.add_argument('--runs', type=int, default=16, help='run directories merged by merge_results')
+    parser.add_argument('--collision-sizes', default='100MB', help='comma separated sizes of COLLISON files')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best is kept')
+    parser.add_argument('--only', default=None, help='run the benchmarks whose name contains this text')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--json', default=None, help='write the results to this file')
+    parser.add_argument('--compare', default=None, help='results file of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slow down or growth')
+    args = parser.parse_args(argv)
+
+    fixtures = Fixtures(args.fixtures)
+    collision_sizes = [size for size in args.collision_sizes.split(',') if size]
+
+    def wanted(*names):
+        return args.only is None or any(args.only in name for name in names)
+
+    benchmarks = []
+    if wanted('read_table', 'Ioniz', 'Vacancy', 'NoVacancy', 'EnergyToRecoils', 'Phonons', 'Range',
+              'Transmit', 'Backscat', 'Sputter', 'Range3D', 'EXYZ', 'SRResults', 'Results'):
+        benchmarks += table_benchmarks(fixtures.tables(args.bins, args.particles))
+    if wanted('collision'):
+        for size in collision_sizes:
+            benchmarks += collision_benchmarks(fixtures.collisions(parse_size(size)))
+    if wanted('merge_results'):
+        benchmarks += merge_benchmarks(fixtures.runs(args.runs))
+    if wanted('TRIMInput'):
+        benchmarks += input_benchmarks()
+    if wanted('ElementDB'):
+        benchmarks += elementdb_benchmarks()
+
+    results = {}
+    for benchmark in benchmarks:
+        if args.only is not None and args.only not in benchmark.name:
+            continue
+        result = benchmark.run(args.repeat, not args.no_memory)
+        results[benchmark.name] = result
+        throughput = ('{:10.1f} MB/s'.format(result['mb_per_s']) if 'mb_per_s' in result else
+                      '{:10.0f} op/s'.format(result['operations_per_s']))
+        memory = '{:9.1f} MB'.format(result['peak_memory_mb']) if 'peak_memory_mb' in result else ''
+        print('{:<40s} {:10.4f} s {} {}'.format(benchmark.name, result['seconds'], throughput, memory))
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'environment': environment(), 'parameters': vars(args), 'results': results},
+                      f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, reason in regressions:
+            print('regression {}: {}'.format(name, reason))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
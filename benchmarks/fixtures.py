@@ -0,0 +1,170 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" SRIM format fixtures of controllable size for the benchmarks
+
+    python benchmarks/fixtures.py /tmp/pysrim-bench --bins 10000 --collision-sizes 100MB,1GB
+
+writes in the fixtures directory:
+
+- tables/ : a run directory with TRIM.IN, the six depth tables of
+  bins rows, TRANSMIT, BACKSCAT, SPUTTER, RANGE_3D and EXYZ files of
+  about particles rows and SR_OUTPUT.txt
+- runs/run-NNNN : runs small run directories (100 bins) to merge
+- COLLISON-<size>.txt : full cascade collision files of each size
+
+fixtures.json records the parameters of every file, files whose
+parameters did not change are not written again.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from srim import synthetic
+from srim.srim import SRIM
+from srim.input import TRIMInput
+from srim.core.ion import Ion
+from srim.core.layer import Layer
+from srim.core.target import Target
+
+
+MANIFEST_FILENAME = 'fixtures.json'
+
+size_regex = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([kMGT]?)B?\s*$', re.IGNORECASE)
+size_units = {'': 1, 'k': 10**3, 'm': 10**6, 'g': 10**9, 't': 10**12}
+
+
+def parse_size(size):
+    """ Bytes of a size such as 500kB, 100MB or 10GB (powers of 1000) """
+    match = size_regex.match(str(size))
+    if not match:
+        raise ValueError('invalid size {}'.format(size))
+    return int(float(match.group(1)) * size_units[match.group(2).lower()])
+
+
+def format_size(size):
+    for unit in ('GB', 'MB', 'kB'):
+        factor = size_units[unit[0].lower()]
+        if size >= factor and size % factor == 0:
+            return '{}{}'.format(size // factor, unit)
+    return '{}B'.format(size)
+
+
+def calculation():
+    """ SRIM calculation of all fixtures: 1 MeV He in two layers """
+    target = Target([
+        Layer.from_formula('ZrO2', 5.68, 4.0e4, name='oxide'),
+        Layer({'Zr': 1.0}, 6.5, 2.0e4, name='metal')
+    ])
+    return SRIM(target, Ion('He', 1.0e6), calculation=2, number_ions=10000, collisions=1)
+
+
+class Fixtures(object):
+    """ Fixtures directory, each file is (re)written when its parameters change
+
+    :param str directory: location of the fixtures, created if needed
+    """
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILENAME)) as f:
+                self._manifest = json.load(f)
+        except FileNotFoundError:
+            self._manifest = {}
+
+    def _fresh(self, name, parameters, paths):
+        return self._manifest.get(name) == parameters and all(os.path.exists(path) for path in paths)
+
+    def _done(self, name, parameters):
+        self._manifest[name] = parameters
+        with open(os.path.join(self.directory, MANIFEST_FILENAME), 'w') as f:
+            json.dump(self._manifest, f, indent=1, sort_keys=True)
+
+    @property
+    def tables_directory(self):
+        return os.path.join(self.directory, 'tables')
+
+    def tables(self, bins=100, particles=100000, seed=0):
+        """ Run directory with all the tables, per particle files and SR_OUTPUT.txt """
+        directory = self.tables_directory
+        parameters = {'bins': bins, 'particles': particles, 'seed': seed}
+        if self._fresh('tables', parameters, [os.path.join(directory, 'EXYZ.txt')]):
+            return directory
+
+        os.makedirs(directory, exist_ok=True)
+        srim = calculation()
+        TRIMInput(srim).write(directory)
+        synthetic.write_tables(directory, srim.ion, srim.target, srim.number_ions, 2, bins, seed)
+        for filename in synthetic.kinetics_files:
+            synthetic.write_kinetics(os.path.join(directory, filename), srim.ion, srim.target, particles, seed)
+        synthetic.write_positions(os.path.join(directory, 'RANGE_3D.txt'), srim.ion, srim.target,
+                                  particles, seed=seed)
+        synthetic.write_positions(os.path.join(directory, 'EXYZ.txt'), srim.ion, srim.target,
+                                  max(1, particles // 10), 10, seed)
+        synthetic.write_sr_output(os.path.join(directory, 'SR_OUTPUT.txt'), srim.ion,
+                                  srim.target.layers[0], points=max(100, bins))
+        self._done('tables', parameters)
+        return directory
+
+    def runs(self, count=16, seed=0):
+        """ count run directories of 100 bins, as written by the step calculations """
+        directories = [os.path.join(self.directory, 'runs', 'run-{:04d}'.format(i)) for i in range(count)]
+        parameters = {'count': count, 'seed': seed}
+        if self._fresh('runs', parameters, directories):
+            return directories
+
+        srim = calculation()
+        for i, directory in enumerate(directories):
+            os.makedirs(directory, exist_ok=True)
+            TRIMInput(srim).write(directory)
+            synthetic.write_tables(directory, srim.ion, srim.target, srim.number_ions, 2, 100, seed + i)
+        self._done('runs', parameters)
+        return directories
+
+    def collisions(self, size, distinct_ions=200, seed=0):
+        """ Full cascade COLLISON file of about size bytes """
+        size = parse_size(size)
+        name = 'COLLISON-{}.txt'.format(format_size(size))
+        path = os.path.join(self.directory, name)
+        parameters = {'size': size, 'distinct_ions': distinct_ions, 'seed': seed}
+        if self._fresh(name, parameters, [path]):
+            return path
+
+        srim = calculation()
+        synthetic.write_collisions(path, srim.ion, srim.target, seed=seed, size=size,
+                                   distinct_ions=distinct_ions)
+        # ion index sidecar of the previous file
+        if os.path.exists(path + '.idx.npz'):
+            os.remove(path + '.idx.npz')
+        self._done(name, parameters)
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write SRIM format benchmark fixtures')
+    parser.add_argument('directory', help='fixtures directory')
+    parser.add_argument('--bins', type=int, default=100, help='rows of the depth tables')
+    parser.add_argument('--particles', type=int, default=100000, help='rows of the per particle files')
+    parser.add_argument('--runs', type=int, default=16, help='run directories to merge')
+    parser.add_argument('--collision-sizes', default='100MB', help='comma separated sizes of COLLISON files')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    fixtures = Fixtures(args.directory)
+    print(fixtures.tables(args.bins, args.particles, args.seed))
+    print(os.path.dirname(fixtures.runs(args.runs, args.seed)[0]))
+    for size in filter(None, args.collision_sizes.split(',')):
+        print(fixtures.collisions(size, seed=args.seed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Run many TRIM calculations side by side
+
+Every job runs in its own sandbox (see srim.create_sandbox) so that
+several TRIM processes can share one SRIM installation.
+"""
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .srim import SRIM, SRIM_DIRECTORY
+
+
+class BatchJob(object):
+    """ Single TRIM calculation of a batch
+
+    :param Ion ion: incident ion
+    :param Target target: target of the calculation
+    :param dict settings: keyword arguments of SRIM (calculation, number_ions, SRIMSettings)
+    :param str name: name of the output directory (defaults to job index, ion and energy)
+    """
+    def __init__(self, ion, target, settings=None, name=None):
+        self.ion = ion
+        self.target = target
+        self.settings = dict(settings or {})
+        self.name = name
+
+    def __repr__(self):
+        return "<BatchJob name:{} ion:{} energy:{}>".format(
+            self.name, self.ion.symbol, self.ion.energy)
+
+
+def _run_job(job, srim_directory, output_directory, subbing, cache=None, display=None, executor=None,
+             headless=False):
+    """ Run one job in a sandbox and move its outputs to output_directory
+
+    With headless display defaults to the display of the worker process
+    (see BatchRunner headless)
+    """
+    if display is None and headless:
+        # srim.display needs fcntl (POSIX only), it is imported for headless runs only
+        from .display import worker_display
+        display = worker_display()
+    srim = SRIM(job.target, job.ion, **job.settings)
+    results = srim.run(srim_directory, subbing=subbing, sandbox=True, cache=cache,
+                       display=display, executor=executor)
+    try:
+        os.makedirs(output_directory, exist_ok=True)
+        SRIM.copy_output_files(results.directory, output_directory)
+    finally:
+        shutil.rmtree(results.directory, ignore_errors=True)
+    results.directory = output_directory
+    return results
+
+
+def _completed(pending):
+    """ Wait for futures of pending, pop and yield (index, job, results) of the completed ones """
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        i, job = pending.pop(future)
+        yield i, job, future.result()
+
+
+class BatchRunner(object):
+    """ Dispatch TRIM calculations to a bounded pool of worker processes
+
+    :param str srim_directory: SRIM installation shared by all workers
+    :param str save_directory: folder receiving one output directory per job (defaults to cwd)
+    :param int max_workers: number of concurrent TRIM processes (defaults to cpu count)
+    :param bool subbing: hide the TRIM window with xvfb-run
+    :param callable progress: called as progress(done, total, job, results) after each job
+    :param ResultCache cache: reuse outputs of identical calculations
+    :param bool headless: each worker keeps its own Xvfb display for all its jobs instead of xvfb-run per job
+    :param str wine_prefixes: folder of per worker wine prefixes (see display.claim_wine_prefix)
+    :param Executor executor: picklable launcher of TRIM.exe (see srim.executor), e.g. FakeExecutor to load test without SRIM
+
+    Results are returned in the order of the submitted jobs whatever
+    the order of completion. With max_workers=1 jobs run in the current
+    process.
+    """
+    def __init__(self, srim_directory=SRIM_DIRECTORY, save_directory=None,
+                 max_workers=None, subbing=False, progress=None, cache=None,
+                 headless=False, wine_prefixes=None, executor=None):
+        self.srim_directory = os.path.abspath(os.path.expanduser(srim_directory))
+        self.save_directory = save_directory
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.subbing = subbing
+        self.progress = progress
+        self.cache = cache
+        self.headless = headless
+        self.wine_prefixes = wine_prefixes
+        self.executor = executor
+
+    def output_directory(self, index, job):
+        """ Directory where the outputs of job are saved """
+        save_directory = self.save_directory or os.getcwd()
+        name = job.name or '{:04d}-{}-{}'.format(index, job.ion.symbol, job.ion.energy)
+        return os.path.join(save_directory, name)
+
+    def run(self, jobs):
+        """ Run all jobs and return their Results in submission order
+
+        :param list jobs: BatchJob or (ion, target, settings) tuples
+        """
+        jobs = [job if isinstance(job, BatchJob) else BatchJob(*job) for job in jobs]
+        directories = [self.output_directory(i, job) for i, job in enumerate(jobs)]
+        if len(set(directories)) != len(directories):
+            raise ValueError('jobs must have distinct output directories')
+
+        results = [None] * len(jobs)
+        for i, _, job_results in self.imap(jobs):
+            results[i] = job_results
+            self._report(results, jobs, i)
+        return results
+
+    def imap(self, jobs):
+        """ Run jobs drawn lazily from an iterable, yield (index, job, results) as jobs complete
+
+        :param jobs: iterable of BatchJob or (ion, target, settings) tuples
+
+        At most 2 * max_workers jobs are submitted ahead of the
+        completed ones so a generator of jobs is expanded while the
+        pool progresses. Distinct output directories are up to the
+        caller.
+        """
+        jobs = ((i, job if isinstance(job, BatchJob) else BatchJob(*job)) for i, job in enumerate(jobs))
+        if self.max_workers == 1:
+            display = None
+            if self.headless:
+                from .display import HeadlessDisplay
+                display = HeadlessDisplay.for_worker(self.wine_prefixes).start()
+            try:
+                for i, job in jobs:
+                    yield i, job, _run_job(job, self.srim_directory, self.output_directory(i, job),
+                                           self.subbing, self.cache, display, self.executor)
+            finally:
+                if display is not None:
+                    display.stop()
+            return
+
+        pool_args = {}
+        if self.headless:
+            from .display import start_worker_display
+            pool_args = {'initializer': start_worker_display, 'initargs': (self.wine_prefixes,)}
+        with ProcessPoolExecutor(max_workers=self.max_workers, **pool_args) as pool:
+            pending = {}
+            for i, job in jobs:
+                future = pool.submit(_run_job, job, self.srim_directory, self.output_directory(i, job),
+                                     self.subbing, self.cache, None, self.executor, self.headless)
+                pending[future] = (i, job)
+                if len(pending) >= 2 * self.max_workers:
+                    yield from _completed(pending)
+            while pending:
+                yield from _completed(pending)
+
+    def _report(self, results, jobs, i):
+        if self.progress:
+            done = sum(result is not None for result in results)
+            self.progress(done, len(jobs), jobs[i], results[i])
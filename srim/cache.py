@@ -0,0 +1,230 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" On disk cache of TRIM outputs keyed on the generated TRIM.IN
+
+A calculation is identified by the sha256 of the exact TRIM.IN bytes and
+its random seed. Entries are directories of output files, the
+modification time of an entry is its last use for LRU eviction.
+
+Old or excess entries can be pruned from the command line:
+
+    python -m srim.cache --max-age 30d --max-size 20G [directory]
+"""
+import os
+import re
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+from .input import TRIMInput
+from .srim import SRIM
+
+
+# Tables written by every complete TRIM run, outputs without them are never cached
+REQUIRED_OUTPUTS = ('RANGE.txt',)
+
+
+def has_outputs(directory):
+    """ True if directory (or its SRIM Outputs folder) holds REQUIRED_OUTPUTS """
+    return all(
+        os.path.isfile(os.path.join(directory, filename)) or
+        os.path.isfile(os.path.join(directory, 'SRIM Outputs', filename))
+        for filename in REQUIRED_OUTPUTS
+    )
+
+
+def default_cache_directory(name='trim'):
+    """ $XDG_CACHE_HOME/pysrim/name (defaults to ~/.cache/pysrim/name) """
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'pysrim', name)
+
+
+class ResultCache(object):
+    """ Content addressed cache of TRIM output directories
+
+    :param str directory: cache location (defaults to default_cache_directory())
+    :param int max_size: maximum total size [bytes] kept after each store
+    :param float max_age: entries unused for more than max_age [s] are evicted
+
+    store keeps a running total of the cache size and walks the cache
+    only when max_size is exceeded or an age sweep is due (at most once
+    per sweep_interval seconds). Entries stored by other processes are
+    counted at the next walk.
+    """
+    sweep_interval = 3600.0
+
+    def __init__(self, directory=None, max_size=None, max_age=None):
+        self.directory = directory or default_cache_directory()
+        self.max_size = max_size
+        self.max_age = max_age
+        self._size = None
+        self._swept = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(srim):
+        """ Hash of the TRIM.IN written for srim and of its random seed """
+        digest = hashlib.sha256(TRIMInput(srim).to_bytes())
+        digest.update('seed={}'.format(srim.settings.random_seed).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def __contains__(self, srim):
+        return os.path.isdir(self._entry(self.key(srim)))
+
+    def restore(self, srim, directory):
+        """ Copy cached outputs of srim into directory
+
+        Returns False on a cache miss. An entry without the output
+        tables (stored by an older version) is removed and missed.
+        """
+        entry = self._entry(self.key(srim))
+        try:
+            filenames = os.listdir(entry)
+            if not has_outputs(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+                self._size = None
+                return False
+            for filename in filenames:
+                shutil.copy(os.path.join(entry, filename), directory)
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, srim, directory):
+        """ Store outputs of srim found in directory then evict old entries
+
+        All the output files are stored, COLLISON.txt and EXYZ.txt
+        included. Returns the entry, or None without storing when the
+        run wrote no tables (crashed or killed TRIM).
+        """
+        if not has_outputs(directory):
+            return None
+        entry = self._entry(self.key(srim))
+        if not os.path.isdir(entry):
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix='.tmp-')
+            try:
+                SRIM.copy_output_files(directory, staging)
+                size = self._entry_size(staging)
+                os.rename(staging, entry)
+                if self._size is not None:
+                    self._size += size
+            except OSError:
+                # another process stored the same entry first
+                shutil.rmtree(staging, ignore_errors=True)
+        if self._eviction_due():
+            self.evict()
+        return entry
+
+    def _eviction_due(self):
+        if self.max_size is None and self.max_age is None:
+            return False
+        if self._size is None or self._swept is None:
+            return True
+        if self.max_size is not None and self._size > self.max_size:
+            return True
+        return (self.max_age is not None and
+                time.time() - self._swept > min(self.sweep_interval, self.max_age))
+
+    @staticmethod
+    def _entry_size(entry):
+        return sum(os.path.getsize(os.path.join(entry, filename)) for filename in os.listdir(entry))
+
+    def entries(self):
+        """ List of (path, last use, size [bytes]) of cached entries """
+        entries = []
+        for prefix in os.listdir(self.directory):
+            prefix_directory = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_directory):
+                continue
+            for key in os.listdir(prefix_directory):
+                entry = os.path.join(prefix_directory, key)
+                if key.startswith('.tmp-') or not os.path.isdir(entry):
+                    continue
+                try:
+                    entries.append((entry, os.path.getmtime(entry), self._entry_size(entry)))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def evict(self, max_size=None, max_age=None):
+        """ Remove entries older than max_age then least recently used ones above max_size
+
+        Defaults to the limits given to the cache. Returns the number of
+        removed entries.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        max_age = self.max_age if max_age is None else max_age
+
+        entries = sorted(self.entries(), key=lambda entry: entry[1], reverse=True)
+        removed = []
+        if max_age is not None:
+            oldest = time.time() - max_age
+            removed += [entry for entry in entries if entry[1] < oldest]
+            entries = [entry for entry in entries if entry[1] >= oldest]
+        if max_size is not None:
+            total_size = 0
+            for entry in entries:
+                total_size += entry[2]
+                if total_size > max_size:
+                    removed.append(entry)
+
+        for path, _, _ in removed:
+            shutil.rmtree(path, ignore_errors=True)
+        removed_paths = {path for path, _, _ in removed}
+        self._size = sum(size for path, _, size in entries if path not in removed_paths)
+        self._swept = time.time()
+        return len(removed)
+
+    def clear(self):
+        """ Remove all entries """
+        entries = self.entries()
+        for path, _, _ in entries:
+            shutil.rmtree(path, ignore_errors=True)
+        self._size = 0
+        return len(entries)
+
+
+def _parse_quantity(value, units):
+    match = re.match(r'^\s*(\d+(?:\.\d*)?)\s*([a-zA-Z]?)\s*$', value)
+    if not match or match.group(2).lower() not in units:
+        raise argparse.ArgumentTypeError('invalid value {}'.format(value))
+    return float(match.group(1)) * units[match.group(2).lower()]
+
+
+def parse_age(value):
+    """ Age like 3600, 90m, 12h or 30d in seconds """
+    return _parse_quantity(value, {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400})
+
+
+def parse_size(value):
+    """ Size like 1024, 500M or 20G in bytes """
+    return int(_parse_quantity(value, {'': 1, 'b': 1, 'k': 2**10, 'm': 2**20, 'g': 2**30, 't': 2**40}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prune the TRIM result cache')
+    parser.add_argument('directory', nargs='?', default=None, help='cache directory')
+    parser.add_argument('--max-age', type=parse_age, default=None, help='e.g. 30d, 12h')
+    parser.add_argument('--max-size', type=parse_size, default=None, help='e.g. 20G, 500M')
+    parser.add_argument('--clear', action='store_true', help='remove all entries')
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.directory)
+    if args.clear:
+        removed = cache.clear()
+    else:
+        removed = cache.evict(args.max_size, args.max_age)
+    print('removed {} entries from {}'.format(removed, cache.directory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" SQLite catalog of TRIM run directories
+
+The header of an output table (ion, energy, target layers, number of
+ions) and the settings of TRIM.IN are stored for each run directory, so
+runs can be found without opening their outputs::
+
+    catalog = Catalog('runs.sqlite')
+    catalog.update('~/calculations')
+    catalog.query(ion='He', energy=(1.0e6, 5.0e6), elements='ZrO2', num_ions=(50000, None))
+
+update only reads the directories that are new or changed since the
+previous update.
+"""
+import os
+import re
+import json
+import sqlite3
+
+from .output import read_header, header_filenames, TrimIn, SRIMOutputParseError
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    directory TEXT UNIQUE NOT NULL,
+    signature TEXT NOT NULL,
+    ion TEXT NOT NULL,
+    atomic_number INTEGER NOT NULL,
+    mass REAL,
+    energy REAL NOT NULL,
+    num_ions INTEGER NOT NULL,
+    width REAL NOT NULL,
+    calculation INTEGER,
+    random_seed INTEGER,
+    angle REAL,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS layers (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    width REAL NOT NULL,
+    density REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS layer_elements (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    fraction REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_ion_energy ON runs (ion, energy);
+CREATE INDEX IF NOT EXISTS layers_run ON layers (run_id);
+CREATE INDEX IF NOT EXISTS layer_elements_symbol ON layer_elements (symbol, run_id);
+"""
+
+formula_symbol_regex = re.compile('[A-Z][a-z]?')
+
+
+def _signature(directory):
+    """ Size and modification time of the files read for a run directory """
+    signature = []
+    for filename in header_filenames + ('TRIM.IN',):
+        try:
+            stat = os.stat(os.path.join(directory, filename))
+            signature.append([filename, stat.st_size, stat.st_mtime_ns])
+        except FileNotFoundError:
+            continue
+    return json.dumps(signature)
+
+
+def _is_run_directory(filenames):
+    return any(filename in filenames for filename in header_filenames)
+
+
+class Catalog(object):
+    """ Persistent index of run directories
+
+    :param str path: SQLite database file (':memory:' for a temporary catalog)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def update(self, root=None, directories=None, prune=True):
+        """ Add new or changed run directories and remove vanished ones
+
+        :param str root: folder walked for run directories (defaults to cwd when directories is None)
+        :param list directories: run directories to catalog instead of walking root
+        :param bool prune: remove catalogued directories below root that no longer exist
+
+        Returns the (added or updated, removed) counts. Directories whose
+        header cannot be parsed are skipped.
+        """
+        if directories is None:
+            root = os.path.abspath(os.path.expanduser(root or os.getcwd()))
+            directories = [directory for directory, _, filenames in os.walk(root)
+                           if _is_run_directory(filenames)]
+        directories = [os.path.abspath(directory) for directory in directories]
+
+        known = dict(self._connection.execute('SELECT directory, signature FROM runs'))
+        updated = 0
+        with self._connection:
+            for directory in directories:
+                signature = _signature(directory)
+                if known.get(directory) == signature:
+                    continue
+                try:
+                    self._insert(directory, signature)
+                    updated += 1
+                except (SRIMOutputParseError, FileNotFoundError):
+                    continue
+
+            removed = 0
+            if prune and root is not None:
+                present = set(directories)
+                prefix = os.path.join(root, '')
+                for directory in known:
+                    if (directory == root or directory.startswith(prefix)) and directory not in present:
+                        self._connection.execute('DELETE FROM runs WHERE directory = ?', (directory,))
+                        removed += 1
+        return updated, removed
+
+    def _insert(self, directory, signature):
+        header = read_header(directory)
+        ion = header['ion']
+        target = header['target']
+        try:
+            trim_in = TrimIn(directory)
+            calculation = trim_in.calculation
+            random_seed = trim_in.random_seed
+            settings = trim_in.settings
+            angle = settings['angle_ions']
+            mass = trim_in.ion.mass
+        except (FileNotFoundError, SRIMOutputParseError):
+            calculation = random_seed = angle = settings = None
+            mass = ion.mass
+
+        self._connection.execute('DELETE FROM runs WHERE directory = ?', (directory,))
+        run_id = self._connection.execute(
+            'INSERT INTO runs (directory, signature, ion, atomic_number, mass, energy, num_ions, '
+            'width, calculation, random_seed, angle, settings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (directory, signature, ion.symbol, ion.atomic_number, mass, ion.energy,
+             header['num_ions'], target.width, calculation, random_seed, angle,
+             None if settings is None else json.dumps(settings))
+        ).lastrowid
+        for position, layer in enumerate(target.layers):
+            self._connection.execute(
+                'INSERT INTO layers (run_id, position, name, width, density) VALUES (?, ?, ?, ?, ?)',
+                (run_id, position, layer.name, layer.width, layer.density))
+            self._connection.executemany(
+                'INSERT INTO layer_elements (run_id, position, symbol, fraction) VALUES (?, ?, ?, ?)',
+                [(run_id, position, element.symbol, values['stoich'])
+                 for element, values in layer.elements.items()])
+
+    @staticmethod
+    def _range(column, value, conditions, parameters):
+        """ SQL condition of column equal to value or within a (min, max) tuple (None is open) """
+        if value is None:
+            return
+        if isinstance(value, (tuple, list)):
+            minimum, maximum = value
+            if minimum is not None:
+                conditions.append('{} >= ?'.format(column))
+                parameters.append(minimum)
+            if maximum is not None:
+                conditions.append('{} <= ?'.format(column))
+                parameters.append(maximum)
+        else:
+            conditions.append('{} = ?'.format(column))
+            parameters.append(value)
+
+    def query(self, ion=None, energy=None, num_ions=None, width=None, calculation=None,
+              angle=None, elements=None, exact=False, layer=None):
+        """ Runs matching all the given conditions
+
+        :param str ion: symbol of the ion
+        :param energy: energy [eV], or (min, max) tuple where None is an open bound
+        :param num_ions: number of ions, or (min, max) tuple
+        :param width: total target width [Ang], or (min, max) tuple
+        :param int calculation: type of calculation of TRIM.IN
+        :param angle: incidence angle [degrees], or (min, max) tuple
+        :param elements: symbols or formula (e.g. 'ZrO2') of elements present in the target
+        :param bool exact: the target has no other elements than elements
+        :param str layer: SQL LIKE pattern of a layer name
+
+        Returns a list of dicts with the run columns and its layers.
+        """
+        conditions = []
+        parameters = []
+        if ion is not None:
+            conditions.append('ion = ?')
+            parameters.append(ion)
+        self._range('energy', energy, conditions, parameters)
+        self._range('num_ions', num_ions, conditions, parameters)
+        self._range('width', width, conditions, parameters)
+        self._range('calculation', calculation, conditions, parameters)
+        self._range('angle', angle, conditions, parameters)
+        if elements is not None:
+            if isinstance(elements, str):
+                elements = formula_symbol_regex.findall(elements)
+            symbols = sorted(set(elements))
+            conditions.append(
+                'id IN (SELECT run_id FROM layer_elements WHERE symbol IN ({}) '
+                'GROUP BY run_id HAVING COUNT(DISTINCT symbol) = ?)'.format(', '.join('?' * len(symbols))))
+            parameters += symbols + [len(symbols)]
+            if exact:
+                conditions.append(
+                    'id NOT IN (SELECT run_id FROM layer_elements WHERE symbol NOT IN ({}))'.format(
+                        ', '.join('?' * len(symbols))))
+                parameters += symbols
+        if layer is not None:
+            conditions.append('id IN (SELECT run_id FROM layers WHERE name LIKE ?)')
+            parameters.append(layer)
+
+        sql = 'SELECT * FROM runs'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ion, energy, directory'
+        runs = [dict(row) for row in self._connection.execute(sql, parameters)]
+        for run in runs:
+            run['settings'] = None if run['settings'] is None else json.loads(run['settings'])
+            run['layers'] = self._layers(run['id'])
+        return runs
+
+    def _layers(self, run_id):
+        layers = [dict(row) for row in self._connection.execute(
+            'SELECT position, name, width, density FROM layers WHERE run_id = ? ORDER BY position', (run_id,))]
+        for row in self._connection.execute(
+                'SELECT position, symbol, fraction FROM layer_elements WHERE run_id = ?', (run_id,)):
+            layers[row['position']].setdefault('elements', {})[row['symbol']] = row['fraction']
+        return layers
@@ -3,48 +3,80 @@
 ### Modified by : Victor Garric : victor.garric@gmail.com, 2018
 
 
+from weakref import WeakValueDictionary
+
 from .elementdb import ElementDB
 
 class Element(object):
     """ Element from periodic table
 
+    Elements are immutable and interned: creating an element equal to
+    an existing one returns the existing instance.
     """
-    def __init__(self, identifier, unique_name=None, mass=None):
+    __slots__ = ('_symbol', '_name', '_atomic_number', '_mass', '_unique_name', '__weakref__')
+    _fields = ('_symbol', '_name', '_atomic_number', '_mass', '_unique_name')
+    _instances = WeakValueDictionary()
+
+    def __new__(cls, identifier, unique_name=None, mass=None):
         """ Initializes element from identifier and mass
 
         :param str or int identifier: Symbol, Name, or Atomic Number of element
+        :param str unique_name: Name distinguishing identical elements
         :param float mass: Mass [amu] of element
         """
         element = ElementDB.lookup(identifier)
+        return cls._intern(
+            element['symbol'], element['name'], element['z'],
+            mass if mass else element['mass'],
+            '' if unique_name is None else unique_name)
+
+    @classmethod
+    def _intern(cls, *values):
+        """ Instance of cls with values of _fields, shared with equal instances """
+        key = (cls,) + values + tuple(type(value) for value in values)
+        instance = cls._instances.get(key)
+        if instance is None:
+            instance = object.__new__(cls)
+            for field, value in zip(cls._fields, values):
+                object.__setattr__(instance, field, value)
+            instance = cls._instances.setdefault(key, instance)
+        return instance
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def __reduce__(self):
+        return (self.__class__._intern, self._values())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{} is immutable'.format(self.__class__.__name__))
 
-        self._symbol = element['symbol']
-        self._name = element['name']
-        self._atomic_number = element['z']
-        if unique_name==None :
-            self.unique_name=''
-        else :
-            self.unique_name=unique_name
-        if mass:
-            self._mass = mass
-        else:
-            self._mass = element['mass']
-            
     def __eq__(self, element):
-        if (self.symbol == element.symbol and
-            self.name == element.name and
-            self.atomic_number == element.atomic_number and
-            self.mass == element.mass):
+        if self is element:
             return True
-        return False
+        if not isinstance(element, Element):
+            return NotImplemented
+        return self._values() == element._values()
+
+    def __ne__(self, element):
+        result = self.__eq__(element)
+        return result if result is NotImplemented else not result
 
     def __repr__(self):
         return "<Element symbol:{} name:{} mass:{:2.2f}>".format(
             self.symbol, self.name, self.mass)
 
     def __hash__(self):
-        return sum(hash(item) for item in [
-            self._mass, self._symbol, self._name, self.atomic_number
-        ])
+        return hash(self._values())
 
     @property
     def symbol(self):
@@ -62,3 +94,6 @@ class Element(object):
     def mass(self):
         return self._mass
 
+    @property
+    def unique_name(self):
+        return self._unique_name
@@ -3,20 +3,86 @@
 ### Modified by : Victor Garric : victor.garric@gmail.com, 2018
 
 
-import yaml
 import os
 import re
+import pickle
+import tempfile
+
+import numpy as np
 
 import srim
 
 
+symbol_regex = re.compile("^[A-Z][a-z]?$")
+name_regex = re.compile("^[A-Z][a-z]*$")
+
+element_dtype = np.dtype([('z', np.int64), ('symbol', 'U2'), ('mass', np.float64)])
+
+
+def _cache_path():
+    """ Pickle of the parsed element database in $XDG_CACHE_HOME/pysrim """
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'pysrim', 'elements.pickle')
+
+
 def create_elementdb():
     dbpath = os.path.join(srim.__path__[0], 'data', 'elements.yaml')
-    return yaml.safe_load(open(dbpath, "r"))
+    import yaml
+    with open(dbpath, "r") as f:
+        return yaml.safe_load(f)
+
+
+def load_elementdb():
+    """ Parsed elements.yaml, cached as a pickle keyed on the yaml size and mtime """
+    dbpath = os.path.join(srim.__path__[0], 'data', 'elements.yaml')
+    stat = os.stat(dbpath)
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    cache_path = _cache_path()
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_signature, db = pickle.load(f)
+        if cached_signature == signature:
+            return db
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+
+    db = create_elementdb()
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(cache_path), delete=False) as f:
+            pickle.dump((signature, db), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, cache_path)
+    except OSError:
+        pass
+    return db
 
 
 class ElementDB(object):
-    _db = create_elementdb()
+    """ Periodic table loaded on first use """
+    _db = None
+    _names = None
+    _atomic_numbers = None
+    _table = None
+
+    @classmethod
+    def _load(cls):
+        """ Load the element database and build the name and Z indexes """
+        db = load_elementdb()
+        cls._names = {element['name']: element for element in db.values()}
+        cls._atomic_numbers = {element['z']: element for element in db.values()}
+
+        table = np.zeros(max(cls._atomic_numbers) + 1, dtype=element_dtype)
+        for z, element in cls._atomic_numbers.items():
+            table[z] = (z, element['symbol'], element['mass'])
+        cls._table = table
+        cls._db = db
+        return db
+
+    @classmethod
+    def database(cls):
+        """ Element database as a dict of element properties by symbol """
+        return cls._db if cls._db is not None else cls._load()
 
     @classmethod
     def lookup(cls, identifier):
@@ -24,23 +90,25 @@ class ElementDB(object):
 
         :param str or int identifier: Unique symbol, name, or atomic number of element
         """
-        if isinstance(identifier, (bytes, str)):
-            if re.match("^[A-Z][a-z]?$", identifier):   # Symbol
+        if isinstance(identifier, bytes):
+            identifier = identifier.decode('utf-8')
+        if isinstance(identifier, str):
+            if symbol_regex.match(identifier):   # Symbol
                 return cls._lookup_symbol(identifier)
-            elif re.match("^[A-Z][a-z]*$", identifier): # Name
+            elif name_regex.match(identifier): # Name
                 return cls._lookup_name(identifier)
-        elif isinstance(identifier, int):               # Atomic Number
-            return cls._lookup_atomic_number(identifier)
+        elif isinstance(identifier, (int, np.integer)): # Atomic Number
+            return cls._lookup_atomic_number(int(identifier))
         raise ValueError('identifier of type:{} value:{} not value see doc'.format(
             type(identifier), identifier))
 
     @classmethod
     def _lookup_symbol(cls, symbol):
-        """ Looks up symbol in element database 
+        """ Looks up symbol in element database
 
         :param str symbol: Symbol of atomic element
         """
-        return cls._db[symbol]
+        return cls.database()[symbol]
 
     @classmethod
     def _lookup_name(cls, name):
@@ -48,10 +116,11 @@ class ElementDB(object):
 
         :param str name: (Full) Name of atomic element (British spelling)
         """
-        for symbol in cls._db:
-            if cls._db[symbol]['name'] == name:
-                return cls._db[symbol]
-        raise KeyError('name:{} does not exist'.format(name))
+        cls.database()
+        try:
+            return cls._names[name]
+        except KeyError:
+            raise KeyError('name:{} does not exist'.format(name))
 
     @classmethod
     def _lookup_atomic_number(cls, atomic_number):
@@ -59,7 +128,28 @@ class ElementDB(object):
 
         :param int atomic_number: Atomic number of atomic element
         """
-        for symbol in cls._db:
-            if cls._db[symbol]['z'] == atomic_number:
-                return cls._db[symbol]
-        raise IndexError('atomic number:{} does not exist'.format(atomic_number))
+        cls.database()
+        try:
+            return cls._atomic_numbers[atomic_number]
+        except KeyError:
+            raise IndexError('atomic number:{} does not exist'.format(atomic_number))
+
+    @classmethod
+    def table(cls):
+        """ Structured array (z, symbol, mass) of the elements indexed by atomic number
+
+        Row 0 is empty (z=0).
+        """
+        cls.database()
+        return cls._table
+
+    @classmethod
+    def masses(cls, atomic_numbers):
+        """ Masses [amu] of an array of atomic numbers """
+        return cls.table()['mass'][np.asarray(atomic_numbers)]
+
+    @classmethod
+    def atomic_numbers(cls, symbols):
+        """ Atomic numbers of a sequence of symbols """
+        return np.array([cls.database()[symbol]['z'] for symbol in symbols], dtype=np.int64)
+
@@ -4,15 +4,21 @@
 
 
 from math import sqrt
+from weakref import WeakValueDictionary
 
 from . import units
 from .element import Element
+from .elementdb import ElementDB
 
 class Ion(Element):
     """ Ion traveling through medium
 
     """
-    def __init__(self, identifier, energy, mass=None):
+    __slots__ = ('_energy',)
+    _fields = Element._fields + ('_energy',)
+    _instances = WeakValueDictionary()
+
+    def __new__(cls, identifier, energy, mass=None):
         """Initialize Ion
 
         :param int or str symbol: Atomic symbol of element
@@ -22,8 +28,10 @@ class Ion(Element):
         if energy <= 0.0:
             raise ValueError('energy {} cannot be 0.0 or less'.format(energy))
 
-        self._energy = energy
-        super(Ion, self).__init__(identifier, mass)
+        element = ElementDB.lookup(identifier)
+        return cls._intern(
+            element['symbol'], element['name'], element['z'],
+            mass if mass else element['mass'], '', energy)
 
     def __repr__(self):
         return "<Ion element:{} mass:{} energy:{} keV>".format(
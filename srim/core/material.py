@@ -5,6 +5,8 @@
 
 import re
 
+import numpy as np
+
 from .utils import (
     check_input, 
     is_positive, is_greater_than_zero,
@@ -12,6 +14,12 @@ from .utils import (
 )
 from .element import Element
 
+
+composition_dtype = np.dtype([
+    ('z', np.int64), ('mass', np.float64), ('stoich', np.float64),
+    ('E_d', np.float64), ('lattice', np.float64), ('surface', np.float64)
+])
+
 class Material(object):
     """ Material Representation """
     def __init__(self, elements, density, phase=0):
@@ -47,6 +55,9 @@ class Material(object):
           - {'Cu': {'stoich': 1.0}}
           - {Element('Cu'): {'stoich': 1.0, 'E_d': 25.0, 'lattice': 0.0, 'surface': 3.0}
 
+        elements can also be a structured array with the dtype of
+        Material.composition (z, mass, stoich, E_d, lattice, surface).
+
         All stoichiometries will be normalized to 1.0
 
         Eventually the materials will have better defaults that come from databases.
@@ -55,6 +66,14 @@ class Material(object):
         self.density = density
         self.elements = {}
 
+        if isinstance(elements, np.ndarray):
+            elements = {
+                Element(int(row['z']), mass=float(row['mass'])): {
+                    'stoich': row['stoich'], 'E_d': row['E_d'],
+                    'lattice': row['lattice'], 'surface': row['surface']
+                } for row in elements
+            }
+
         stoich_sum = 0.0
         for element in elements:
             values = elements[element]
@@ -66,11 +85,12 @@ class Material(object):
                 surface = values.get('surface', 3.0)
                 unique_name = values.get('unique_name','default')
             elif isinstance(values, list):
-                default_values = [0.0, 25.0, 0.0, 3.0,'default']
+                default_values = [0.0, 25.0, 0.0, 3.0]
                 if len(values) == 0 or len(values) > 4:
                     raise ValueError('list must be 0 < length < 5')
                 values = values + default_values[len(values):]
                 stoich, e_disp, lattice, surface = values
+                unique_name = 'default'
             elif isinstance(values, (int, float)):
                 stoich = values
                 e_disp = 25.0
@@ -162,7 +182,20 @@ class Material(object):
             
     @property
     def chemical_formula(self):
-        return ' '.join('{} {:1.2f}'.format(element.symbol, self.elements[element]) for element in self.elements)
+        return ' '.join('{} {:1.2f}'.format(element.symbol, self.elements[element]['stoich']) for element in self.elements)
+
+    @property
+    def composition(self):
+        """ Structured array (z, mass, stoich, E_d, lattice, surface) with one row per element
+
+        Rows follow the order of elements.
+        """
+        composition = np.empty(len(self.elements), dtype=composition_dtype)
+        for i, (element, values) in enumerate(self.elements.items()):
+            composition[i] = (
+                element.atomic_number, element.mass, values['stoich'],
+                values['E_d'], values['lattice'], values['surface'])
+        return composition
 
     def __repr__(self):
         material_str = "<Material formula:{} density:{:2.3f}>"
@@ -178,7 +211,11 @@ class Material(object):
         for element in self.elements:
             if not element in material.elements:
                 return False
-            for prop in self.elements[element]:
-                if abs(self.elements[element][prop] - material.elements[element][prop]) > 1e-6:
+            values = self.elements[element]
+            other_values = material.elements[element]
+            if values['unique_name'] != other_values['unique_name']:
+                return False
+            for prop in ('stoich', 'E_d', 'lattice', 'surface'):
+                if abs(values[prop] - other_values[prop]) > 1e-6:
                     return False
         return True
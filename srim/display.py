@@ -0,0 +1,233 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Long-lived virtual displays for headless TRIM runs
+
+xvfb-run starts and stops an X server for every calculation. A
+HeadlessDisplay keeps one Xvfb server (and optionally a persistent
+wineserver) alive for many runs, its environment() gives the DISPLAY
+and WINEPREFIX of the runs without changing os.environ.
+
+    with HeadlessDisplay() as display:
+        for srim in calculations:
+            srim.run(srim_directory, sandbox=True, display=display)
+
+BatchRunner(headless=True) starts one display per worker process, and
+DisplayPool shares a fixed set of displays between threads.
+"""
+import os
+import queue
+import shutil
+import select
+import fcntl
+import subprocess
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+
+
+def default_wine_prefixes_directory():
+    """ $XDG_CACHE_HOME/pysrim/wine (defaults to ~/.cache/pysrim/wine) """
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'pysrim', 'wine')
+
+
+def claim_wine_prefix(directory, template=None):
+    """ Lock a free worker-N wine prefix in directory for this process
+
+    :param str directory: folder of the worker prefixes
+    :param str template: prefix copied to create a missing worker prefix (defaults to $WINEPREFIX or ~/.wine)
+
+    Returns (path, lock file). The prefix stays reserved while the lock
+    file is open, prefixes are kept between sessions so they are only
+    copied (and initialized by wine) once.
+    """
+    template = template or os.environ.get('WINEPREFIX', os.path.join(os.path.expanduser('~'), '.wine'))
+    os.makedirs(directory, exist_ok=True)
+    index = 0
+    while True:
+        path = os.path.join(directory, 'worker-{}'.format(index))
+        lock = open(path + '.lock', 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            index += 1
+            continue
+        if not os.path.isdir(path) and os.path.isdir(template):
+            shutil.copytree(template, path, symlinks=True)
+        return path, lock
+
+
+class HeadlessDisplay(object):
+    """ Xvfb server kept running for many TRIM runs
+
+    :param str screen: screen geometry and depth of Xvfb
+    :param str wine_prefix: WINEPREFIX of the runs (defaults to the inherited one)
+    :param bool warm: keep a persistent wineserver running for wine_prefix until stop
+    :param float timeout: seconds to wait for Xvfb to start
+    """
+    def __init__(self, screen='1024x768x16', wine_prefix=None, warm=True, timeout=10.0):
+        self.screen = screen
+        self.wine_prefix = wine_prefix
+        self.warm = warm
+        self.timeout = timeout
+        self.number = None
+        self._process = None
+        self._lock = None
+        self._wineserver = False
+
+    @classmethod
+    def for_worker(cls, wine_prefixes=None, **args):
+        """ Display using a wine prefix claimed in wine_prefixes, released by stop
+
+        See claim_wine_prefix, without wine_prefixes the inherited prefix is shared.
+        """
+        wine_prefix, lock = claim_wine_prefix(wine_prefixes) if wine_prefixes else (None, None)
+        display = cls(wine_prefix=wine_prefix, **args)
+        display._lock = lock
+        return display
+
+    def start(self):
+        """ Start Xvfb on a free display number chosen by the server
+
+        On failure (Xvfb or wine missing, wineserver error) everything
+        already started is stopped and the claimed prefix released.
+        """
+        if self._process is not None:
+            return self
+        try:
+            self._start_xvfb()
+            if self.warm:
+                # keeps wine from starting a wineserver for every run
+                subprocess.call(['wineserver', '-p'], env=self.environment(),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self._wineserver = True
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def _start_xvfb(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            self._process = subprocess.Popen(
+                ['Xvfb', '-displayfd', str(write_fd), '-screen', '0', self.screen, '-nolisten', 'tcp'],
+                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True)
+            os.close(write_fd)
+            write_fd = None
+            ready, _, _ = select.select([read_fd], [], [], self.timeout)
+            number = os.read(read_fd, 64).strip() if ready else b''
+            if not number:
+                raise RuntimeError('Xvfb did not start within {} s'.format(self.timeout))
+            self.number = int(number)
+        finally:
+            os.close(read_fd)
+            if write_fd is not None:
+                os.close(write_fd)
+
+    def stop(self):
+        """ Stop Xvfb and the persistent wineserver started by start """
+        if self._wineserver:
+            # a persistent wineserver never exits by itself
+            subprocess.call(['wineserver', '-k'], env=self.environment(),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._wineserver = False
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(self.timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        self._process = None
+        self.number = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    @property
+    def display(self):
+        """ DISPLAY value of the server """
+        if self.number is None:
+            raise RuntimeError('display is not started')
+        return ':{}'.format(self.number)
+
+    def environment(self, environment=None):
+        """ Copy of environment (defaults to os.environ) with DISPLAY and WINEPREFIX set """
+        environment = dict(os.environ if environment is None else environment)
+        environment['DISPLAY'] = self.display
+        environment['WINEDEBUG'] = '-all'
+        if self.wine_prefix:
+            environment['WINEPREFIX'] = self.wine_prefix
+        return environment
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __repr__(self):
+        return '<HeadlessDisplay display:{} wine_prefix:{}>'.format(self.number, self.wine_prefix)
+
+
+class DisplayPool(object):
+    """ Fixed set of HeadlessDisplays shared by threads
+
+    :param int size: number of displays
+    :param str wine_prefixes: folder of per display wine prefixes (see claim_wine_prefix), None shares the inherited prefix
+
+    Remaining keyword arguments are passed to HeadlessDisplay.
+    """
+    def __init__(self, size, wine_prefixes=None, **args):
+        self.size = size
+        self.wine_prefixes = wine_prefixes
+        self.args = args
+        self._displays = []
+        self._available = queue.Queue()
+
+    def start(self):
+        for _ in range(self.size):
+            display = HeadlessDisplay.for_worker(self.wine_prefixes, **self.args).start()
+            self._displays.append(display)
+            self._available.put(display)
+        return self
+
+    def stop(self):
+        for display in self._displays:
+            display.stop()
+        self._displays = []
+        self._available = queue.Queue()
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """ Borrow a display, waiting until one is free """
+        display = self._available.get(timeout=timeout)
+        try:
+            yield display
+        finally:
+            self._available.put(display)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+_worker_display = None
+
+
+def start_worker_display(wine_prefixes=None, **args):
+    """ ProcessPoolExecutor initializer starting the display of a worker process """
+    global _worker_display
+    _worker_display = HeadlessDisplay.for_worker(wine_prefixes, **args).start()
+    # pool workers leave with os._exit, atexit handlers would not run
+    Finalize(None, _worker_display.stop, exitpriority=10)
+
+
+def worker_display():
+    """ Display started by start_worker_display in this process (or None) """
+    return _worker_display
@@ -0,0 +1,187 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Executors launching the SRIM programs (TRIM.exe, SRModule.exe)
+
+An executor runs a program in the run directory where its input files
+were written, SRIM.run and SR.run accept any of them:
+
+    srim.run(srim_directory, sandbox=True, executor=NativeExecutor())
+    BatchRunner(srim_directory, executor=FakeExecutor(delay=0.5)).run(jobs)
+
+WineExecutor, XvfbExecutor and DisplayExecutor are the launchers used
+by default (subbing and display parameters), NativeExecutor runs the
+program directly (Windows, binfmt registered wine), CommandExecutor
+runs any command line such as ssh or docker on a host sharing the run
+directory. FakeExecutor writes synthetic outputs (see srim.synthetic)
+without launching anything, to test and benchmark the pipeline.
+
+Executors passed to BatchRunner must be picklable, DisplayExecutor is
+not (BatchRunner headless starts the displays of its workers).
+"""
+import os
+import time
+import signal
+import subprocess
+
+from . import synthetic
+
+
+def _kill_process_group(process):
+    """ Kill process and all of its children (it leads its own session) """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class Executor(object):
+    """ Launches a SRIM program in a run directory and waits for it """
+    def command(self, program, directory):
+        """ Command line (list of arguments) running program from directory """
+        raise NotImplementedError()
+
+    def environment(self):
+        """ Environment of the process """
+        return dict(os.environ, WINEDEBUG='-all')
+
+    def stderr(self):
+        """ stderr of the process (None inherits it) """
+        return None
+
+    def run(self, program, directory):
+        """ Run program in directory, returns its exit status """
+        return subprocess.call(self.command(program, directory), cwd=directory,
+                               env=self.environment(), stderr=self.stderr())
+
+    async def run_async(self, program, directory, timeout=None):
+        """ Run program in directory, killing its process tree on timeout or cancellation """
+        # asyncio is imported on first use to keep import srim fast
+        import asyncio
+        process = await asyncio.create_subprocess_exec(
+            *self.command(program, directory), cwd=directory, env=self.environment(),
+            stderr=self.stderr(), start_new_session=True)
+        try:
+            return await asyncio.wait_for(process.wait(), timeout)
+        except BaseException:
+            _kill_process_group(process)
+            await asyncio.shield(process.wait())
+            raise
+
+    def __repr__(self):
+        return '<{}>'.format(self.__class__.__name__)
+
+
+class WineExecutor(Executor):
+    """ wine ./program, the SRIM window shows on the current display """
+    def command(self, program, directory):
+        return ['wine', os.path.join('.', program)]
+
+
+class XvfbExecutor(Executor):
+    """ xvfb-run -a ./program, hides the SRIM window in a new Xvfb server """
+    def command(self, program, directory):
+        return ['xvfb-run', '-a', os.path.join('.', program)]
+
+    def stderr(self):
+        return subprocess.DEVNULL
+
+
+class DisplayExecutor(WineExecutor):
+    """ wine on a running HeadlessDisplay (see srim.display)
+
+    :param HeadlessDisplay display: started display (and wine prefix) of the runs
+    """
+    def __init__(self, display):
+        self.display = display
+
+    def environment(self):
+        return self.display.environment()
+
+    def stderr(self):
+        return subprocess.DEVNULL
+
+
+class NativeExecutor(Executor):
+    """ ./program run directly, on Windows or where wine is registered with binfmt_misc """
+    def command(self, program, directory):
+        return [os.path.join('.', program)]
+
+    def environment(self):
+        return dict(os.environ)
+
+
+class CommandExecutor(Executor):
+    """ Any command line, for remote or containerized installations
+
+    :param list arguments: command line where {program} and {directory} are replaced
+    :param dict environment: variables added to the environment
+    :param bool quiet: drop stderr
+
+    The run directory must be reachable at the same path by the
+    command, for instance:
+
+        CommandExecutor(['ssh', 'node1', 'cd "{directory}" && wine "{program}"'])
+        CommandExecutor(['docker', 'run', '--rm', '-v', '{directory}:/srim', '-w', '/srim',
+                         'wine-srim', 'wine', '{program}'])
+    """
+    def __init__(self, arguments, environment=None, quiet=False):
+        self.arguments = list(arguments)
+        self.extra_environment = dict(environment or {})
+        self.quiet = quiet
+
+    def command(self, program, directory):
+        directory = os.path.abspath(directory)
+        return [argument.format(program=program, directory=directory) for argument in self.arguments]
+
+    def environment(self):
+        return dict(os.environ, **self.extra_environment)
+
+    def stderr(self):
+        return subprocess.DEVNULL if self.quiet else None
+
+    def __repr__(self):
+        return '<CommandExecutor {}>'.format(' '.join(self.arguments))
+
+
+class FakeExecutor(Executor):
+    """ Writes synthetic outputs instead of running SRIM
+
+    :param int bins: depth bins of the tables
+    :param int collisions_per_ion: mean number of collisions per ion of COLLISON.txt
+    :param int recoils_per_cascade: maximum number of recoils of a cascade
+    :param int sr_points: rows of SR_OUTPUT.txt
+    :param float delay: seconds slept per run, to mimic the duration of a calculation
+    :param int seed: seed of the values (defaults to the random seed of TRIM.IN)
+
+    TRIM.exe reads TRIM.IN of the run directory and writes the tables
+    (and COLLISON.txt when collision details are requested),
+    SRModule.exe reads SR.IN and writes its output table.
+    """
+    def __init__(self, bins=100, collisions_per_ion=50, recoils_per_cascade=10,
+                 sr_points=100, delay=0.0, seed=None):
+        self.bins = bins
+        self.collisions_per_ion = collisions_per_ion
+        self.recoils_per_cascade = recoils_per_cascade
+        self.sr_points = sr_points
+        self.delay = delay
+        self.seed = seed
+
+    def run(self, program, directory):
+        if self.delay:
+            time.sleep(self.delay)
+        if program == 'SRModule.exe':
+            synthetic.write_sr_outputs(directory, self.sr_points)
+        elif program == 'TRIM.exe':
+            synthetic.write_trim_outputs(directory, self.bins, self.collisions_per_ion,
+                                         self.recoils_per_cascade, self.seed)
+        else:
+            raise ValueError('FakeExecutor cannot run {}'.format(program))
+        return 0
+
+    async def run_async(self, program, directory, timeout=None):
+        """ run in the default executor, a timeout leaves the thread finishing its files """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(None, self.run, program, directory), timeout)
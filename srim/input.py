@@ -6,6 +6,8 @@
 """ Write Inputfile for SRIM calculations
 
 """
+import os
+from weakref import WeakKeyDictionary
 
 
 class AutoTRIM(object):
@@ -20,14 +22,38 @@ class AutoTRIM(object):
     def __init__(self, mode=1, restart_directroy=None):
         self._mode = mode
 
-    def write(self):
-        """ write AUTOTRIM in current directory """
-        with open('TRIMAUTO', 'w') as f:
+    def write(self, directory='.'):
+        """ write AUTOTRIM in directory (default current directory) """
+        with open(os.path.join(directory, 'TRIMAUTO'), 'w') as f:
             f.write('{}'.format(self._mode))
 
 
+# Target dependent part of TRIM.IN by Target, see TRIMInput._write_target_blocks
+_target_blocks = WeakKeyDictionary()
+
+
+def _target_signature(target):
+    """ Fingerprint of target used to detect changes of its layers
+
+    Element properties (stoich, E_d, lattice, surface) are part of it so
+    layers edited in place are serialized again.
+    """
+    return tuple(
+        (id(layer), layer.name, layer.width, layer.density, layer.phase,
+         tuple((element, tuple(sorted(values.items()))) for element, values in layer.elements.items()))
+        for layer in target.layers
+    )
+
+
 class TRIMInput(object):
-    """ Input File representation of TRIM run """
+    """ Input File representation of TRIM run
+
+    The target blocks of TRIM.IN (elements, layers, phases and binding
+    energies) are serialized once per Target and reused, so that sweeps
+    over ion energy or angle only format the ion and settings lines.
+    Layers and their element properties may be edited in place, the
+    blocks are rebuilt when they change.
+    """
     newline = '\r\n'
 
     def __init__(self, srim):
@@ -201,30 +227,51 @@ class TRIMInput(object):
             'Stopping Power Version (1=2011, 0=2011)'
         ) + self.newline + '{}'.format(self._srim.settings.version) + self.newline
 
-    def write(self):
-        with open('TRIM.IN', 'wb') as f:
+    def _write_target_blocks(self):
+        """ Target dependent blocks of TRIM.IN, cached per Target """
+        target = self._srim.target
+        signature = _target_signature(target)
+        cached = _target_blocks.get(target)
+        if cached is None or cached[0] != signature:
             methods = [
-                self._write_title,
-                self._write_ion,
-                self._write_cascade_options,
-                self._write_plot_on_off,
-                self._write_target,
-                self._write_plot_options,
                 self._write_elements,
                 self._write_layer,
                 self._write_solid_gas,
                 self._write_bragg_correction,
                 self._write_displacement_energies,
                 self._write_lattice_binding,
-                self._write_surface_binding,
-                self._write_version
+                self._write_surface_binding
             ]
-
-            input_str = ''
-            for method in methods:
-                input_str += method.__call__()
-
-            f.write(input_str.encode('utf-8'))
+            cached = (signature, ''.join(method() for method in methods), list(self.element_position))
+            _target_blocks[target] = cached
+        self.element_position = list(cached[2])
+        return cached[1]
+
+    def to_bytes(self):
+        """ Content of TRIM.IN """
+        methods = [
+            self._write_title,
+            self._write_ion,
+            self._write_cascade_options,
+            self._write_plot_on_off,
+            self._write_target,
+            self._write_plot_options,
+            self._write_target_blocks,
+            self._write_version
+        ]
+        return ''.join(method() for method in methods).encode('utf-8')
+
+    def save(self, destination):
+        """ Write TRIM.IN content to a file path or a binary file object """
+        if hasattr(destination, 'write'):
+            destination.write(self.to_bytes())
+        else:
+            with open(destination, 'wb') as f:
+                f.write(self.to_bytes())
+
+    def write(self, directory='.'):
+        """ write TRIM.IN in directory (default current directory) """
+        self.save(os.path.join(directory, 'TRIM.IN'))
 
 
 class SRInput(object):
@@ -294,19 +341,23 @@ class SRInput(object):
             self._sr.ion.energy / 1.0e3
         ) + self.newline
 
-    def write(self):
-        with open('SR.IN', 'wb') as f:
-            methods = [
-                self._write_filename,
-                self._write_ion,
-                self._write_layer_info,
-                self._write_elements,
-                self._write_output_options,
-                self._write_ion_energy_range
-            ]
-
-            input_str = ''
-            for method in methods:
-                input_str += method.__call__()
-
-            f.write(input_str.encode('utf-8'))
+    def to_bytes(self):
+        """ Content of SR.IN """
+        methods = [
+            self._write_filename,
+            self._write_ion,
+            self._write_layer_info,
+            self._write_elements,
+            self._write_output_options,
+            self._write_ion_energy_range
+        ]
+
+        input_str = ''
+        for method in methods:
+            input_str += method.__call__()
+        return input_str.encode('utf-8')
+
+    def write(self, directory='.'):
+        """ write SR.IN in directory (default current directory) """
+        with open(os.path.join(directory, 'SR.IN'), 'wb') as f:
+            f.write(self.to_bytes())
@@ -9,23 +9,65 @@ TODO: Read header information
 """
 import os
 import re
+import mmap
+import warnings
 from io import BytesIO
 
 import numpy as np
 
 from .core.ion import Ion
+from .core.layer import Layer
+from .core.target import Target
 
 # Valid double_regex [4, 4.0, 4.0e100
 double_regex = r'[-+]?\d+\.?\d*(?:[eE][-+]?\d+)?'
 symbol_regex = r'[A-Z][a-z]?'
 int_regex = '[+-]?\d+'
 
+target_regex = re.compile(rb'TARGET MATERIAL =+\r?\n(.*?)\r?\n\s*=====', re.DOTALL)
+target_layer_regex = re.compile((
+    r'Layer\s+(?P<i>\d+)\s+:(?P<name>[^\r\n]*)\r?\n'
+    r'Layer Width\s+=\s+(?P<width>{0})\s+A\s+;\r?\n'
+    r'\s+Layer #\s+(?P=i)- Density = {0} atoms/cm3 = (?P<density>{0}) g/cm3\r?\n'
+    r'(?P<elements>(?:\s+Layer #\s+(?P=i)-\s+{1}\s+=\s+{0}\s+Atomic Percent = {0}\s+Mass Percent\r?\n?)+)'
+).format(double_regex, symbol_regex).encode('utf-8'))
+target_element_regex = re.compile(
+    r'Layer #\s+\d+-\s+({1})\s+=\s+({0})\s+Atomic Percent'.format(double_regex, symbol_regex).encode('utf-8'))
+
 
 class SRIMOutputParseError(Exception):
     pass
 
 
 class SRIM_Output(object):
+    @classmethod
+    def merge(cls, outputs):
+        """ Combine outputs of independent runs of the same calculation
+
+        Tables are normalized per ion so they are averaged with the
+        number of ions of each run as weight. The result looks like a
+        single run of sum(num_ions) ions.
+        """
+        outputs = list(outputs)
+        if not outputs:
+            raise ValueError('outputs must not be empty')
+
+        first = outputs[0]
+        for output in outputs[1:]:
+            if not isinstance(output, cls) or output._depth.shape != first._depth.shape or \
+               not np.allclose(output._depth, first._depth):
+                raise ValueError('outputs must be {} tables with the same depth bins'.format(cls.__name__))
+
+        weights = np.array([output._num_ions for output in outputs], dtype=float)
+        merged = cls.__new__(cls)
+        merged.__dict__.update(first.__dict__)
+        merged._num_ions = int(weights.sum())
+        for key, value in first.__dict__.items():
+            if isinstance(value, np.ndarray) and key != '_depth':
+                stacked = np.stack([output.__dict__[key] for output in outputs])
+                setattr(merged, key, np.tensordot(weights, stacked, axes=1) / weights.sum())
+        return merged
+
     def _read_name(self, output):
         raise NotImplementedError()
 
@@ -40,32 +82,22 @@ class SRIM_Output(object):
         raise SRIMOutputParseError("unable to extract ion from file")
 
     def _read_target(self, output):
-        match_target = re.search(b'(?<=====\r\n)Layer\s+\d+\s+:.*?(?=====)', output, re.DOTALL)
+        """ Target of the header, Layers have the atomic percents as stoich """
+        match_target = target_regex.search(output)
         if match_target:
-            print(match_target.group(0))
-            layer_regex = (
-                'Layer\s+(?P<i>\d+)\s+:\s+(.+)\r\n'
-                'Layer Width\s+=\s+({0})\s+A\s+;\r\n'
-                '\s+Layer #\s+(?P=i)- Density = ({0}) atoms/cm3 = ({0}) g/cm3\r\n'
-                '((?:\s+Layer #\s+(?P=i)-\s+{1}\s+=\s+{0}\s+Atomic Percent = {0}\s+Mass Percent\r\n)+)'
-            ).format(double_regex, symbol_regex)
-            layers = re.findall(layer_regex.encode('utf-8'), match_target.group(0))
+            layers = []
+            for layer in target_layer_regex.finditer(match_target.group(0)):
+                elements = {
+                    symbol.decode('utf-8'): {'stoich': float(atomic_percent)}
+                    for symbol, atomic_percent in target_element_regex.findall(layer.group('elements'))
+                }
+                if not elements:
+                    break
+                layers.append(Layer(
+                    elements, float(layer.group('density')), float(layer.group('width')),
+                    name=layer.group('name').decode('utf-8').strip()))
             if layers:
-                element_regex = (
-                    '\s+Layer #\s+(\d+)-\s+({1})\s+=\s+({0})\s+Atomic Percent = ({0})\s+Mass Percent\r\n'
-                ).format(double_regex, symbol_regex)
-                element_regex = element_regex.encode()
-
-                layers_elements = []
-                for layer in layers:
-                    # We know that elements will match
-                    layers_elements.append(re.findall(element_regex, layer[5]))
-
-                raise NotImpementedError()
-
-                import pytest
-                pytest.set_trace()
-
+                return Target(layers)
         raise SRIMOutputParseError("unable to extract total target from file")
 
     def _read_num_ions(self, output):
@@ -80,39 +112,232 @@ class SRIM_Output(object):
         raise SRIMOutputParseError("unable to extract total ions from file")
 
     def _read_table(self, output):
-        match = re.search((
-            b'=+(.*)'
-            b'-+(?:\s+-+)+'
-        ), output, re.DOTALL)
-        # Read Data from table
+        """ Read the numeric table ending the file
 
-        if match:
-            # Headers TODO: name the columns in table
-            header = None
+        Column headers are stored in columns
+        """
+        self._columns, data = read_table(output)
+        return data
 
-            # Data
-            data = np.genfromtxt(BytesIO(output[match.end():]), max_rows=100)
-            return data
+    @property
+    def columns(self):
+        """ Headers of the table columns """
+        return self._columns
+
+
+table_regex = re.compile((
+    b'=+(.*)'
+    b'-+(?:\\s+-+)+'
+), re.DOTALL)
+dashes_regex = re.compile(b'[ \\t]*-+(?:[ \\t]+-+)+[ \\t]*\\r?$', re.MULTILINE)
+table_rows_regex = re.compile(b'(?:[ \\t]*[-+.\\d][^\\r\\n]*\\r?\\n?)+')
+
+
+def _find_dashes(output):
+    """ Start and end of the last line of dashes (table header separator) """
+    # Fast path: the separator is usually the last '--' of the file
+    position = output.rfind(b'--')
+    start = output.rfind(b'\n', 0, position) + 1
+    match = dashes_regex.match(output, start)
+    if position >= 0 and match:
+        return start, match.end()
+
+    match = table_regex.search(output)
+    if not match:
         raise SRIMOutputParseError("unable to extract table from file")
+    return output.rfind(b'\n', 0, match.end()) + 1, match.end()
+
+
+def read_table(output):
+    """ Read the fixed format table of a SRIM output file
+
+    :param bytes output: content of the output file
+
+    The table starts after the last line of dashes and ends at the
+    first line that does not start with a number. Returns the column
+    headers, read above the line of dashes, and a (rows, columns)
+    float array.
+    """
+    dashes_start, dashes_end = _find_dashes(output)
+
+    # Headers are between the last ===== line and the line of dashes
+    header_start = output.find(b'\n', output.rfind(b'=', 0, dashes_start)) + 1
+    columns = _read_columns(output[header_start:dashes_start], output[dashes_start:dashes_end])
+
+    # Data
+    data_start = output.find(b'\n', dashes_end) + 1
+    rows = table_rows_regex.match(output, data_start) if data_start else None
+    if not rows or rows.end() == rows.start():
+        raise SRIMOutputParseError("unable to extract table from file")
+
+    block = rows.group(0)
+    num_rows = block.count(b'\n') + (not block.endswith(b'\n'))
+    tokens = block.split()
+    num_columns = len(tokens) // num_rows
+    if num_columns * num_rows != len(tokens):
+        raise SRIMOutputParseError("table rows have different number of columns")
+
+    try:
+        data = np.fromiter(map(float, tokens), dtype=np.float64, count=len(tokens))
+    except ValueError:
+        # Some values are not plain floats, let numpy mark them as nan
+        data = np.genfromtxt(BytesIO(block))
+    return columns, data.reshape(num_rows, num_columns)
+
+
+def _read_columns(header, dashes):
+    """ Name of each column from the header lines above a line of dashes
+
+    Each word of the header goes to the column whose dashes are the
+    closest to the center of the word.
+    """
+    spans = [match.span() for match in re.finditer(b'-+', dashes)]
+    columns = [[] for _ in spans]
+    for line in header.splitlines():
+        for word in re.finditer(b'\\S+', line):
+            center = (word.start() + word.end()) / 2.0
+            distances = [max(start - center, center - end, 0) for start, end in spans]
+            columns[distances.index(min(distances))].append(word.group(0))
+    return [b' '.join(words).decode('latin-1') for words in columns]
+
+
+header_filenames = ('RANGE.txt', 'VACANCY.txt', 'IONIZ.txt', 'PHONON.txt', 'E2RECOIL.txt', 'NOVAC.txt')
+
+
+def read_header(directory, filename=None, size=2**14):
+    """ Ion, target and number of ions from the header of an output table
+
+    :param str filename: table to read (defaults to the first of header_filenames found)
+    :param int size: number of bytes read at the start of the file
+
+    Returns a dict with keys ion, target and num_ions, the table itself
+    is not read.
+    """
+    filenames = [filename] if filename else header_filenames
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename), 'rb') as f:
+                header = f.read(size)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        raise FileNotFoundError('no output table in {}'.format(directory))
+
+    output = SRIM_Output()
+    return {
+        'ion': output._read_ion(header),
+        'target': output._read_target(header),
+        'num_ions': output._read_num_ions(header)
+    }
 
 
 class Results(object):
-    """ Gathers all results from folder """
-    def __init__(self, directory):
+    """ Gathers all results from folder
+
+    Tables are read from their files on first access and cached.
+    """
+    tables = ('ioniz', 'vacancy', 'novac', 'etorecoils', 'phonons', 'range')
+
+    def __init__(self, directory, tables=None, strict=False):
         """ Retrives all the calculation files in a given folder
 
+        :param str directory: folder of the calculation files
+        :param list tables: names of tables read immediately (see Results.tables)
+        :param bool strict: raise instead of returning None for missing files
+
+        Tables that are not listed are read when first accessed, from
+        the directory at that time. A missing file gives None (or
+        raises FileNotFoundError with strict=True). novac is None
+        for Kinchin-Pease calculations.
         """
-        self.ioniz = Ioniz(directory)
-        self.vacancy = Vacancy(directory)
+        self.directory = directory
+        self.strict = strict
+        self._tables = {}
+        if tables:
+            self.load(*tables)
+
+    @staticmethod
+    def _table_type(name):
+        return {
+            'ioniz': Ioniz,
+            'vacancy': Vacancy,
+            'novac': NoVacancy,
+            'etorecoils': EnergyToRecoils,
+            'phonons': Phonons,
+            'range': Range
+        }[name]
+
+    def load(self, *names):
+        """ Read the named tables now (all tables if no name given) """
+        for name in names or self.tables:
+            self._get(name)
+        return self
+
+    def _get(self, name):
+        if name not in self._tables:
+            try:
+                self._tables[name] = self._table_type(name)(self.directory)
+            except FileNotFoundError:
+                if self.strict:
+                    raise
+                self._tables[name] = None
+            except ValueError:
+                # NOVAC has no data for Kinchin-Pease calculations
+                if name != 'novac':
+                    raise
+                self._tables[name] = None
+        return self._tables[name]
 
-        try:
-            self.novac = NoVacancy(directory)
-        except ValueError:
-            self.novac = None
+    @property
+    def ioniz(self):
+        """ Ionization table (IONIZ.txt) """
+        return self._get('ioniz')
+
+    @property
+    def vacancy(self):
+        """ Vacancy table (VACANCY.txt) """
+        return self._get('vacancy')
+
+    @property
+    def novac(self):
+        """ Replacement collisions table (NOVAC.txt) """
+        return self._get('novac')
+
+    @property
+    def etorecoils(self):
+        """ Energy to recoils table (E2RECOIL.txt) """
+        return self._get('etorecoils')
 
-        self.etorecoils = EnergyToRecoils(directory)
-        self.phonons = Phonons(directory)
-        self.range = Range(directory)
+    @property
+    def phonons(self):
+        """ Phonons table (PHONON.txt) """
+        return self._get('phonons')
+
+    @property
+    def range(self):
+        """ Final distribution of ions and recoils table (RANGE.txt) """
+        return self._get('range')
+
+    @classmethod
+    def merge(cls, results, directory=None):
+        """ Combine Results of runs that only differ by their random seed
+
+        :param list results: Results to combine
+        :param str directory: directory attribute of the combined Results
+
+        See SRIM_Output.merge
+        """
+        results = list(results)
+        merged = cls(directory)
+        for name in cls.tables:
+            outputs = [getattr(result, name) for result in results]
+            if any(output is None for output in outputs):
+                merged._tables[name] = None
+            else:
+                output_type = type(outputs[0])
+                merged._tables[name] = output_type.merge(outputs)
+        return merged
 
 
 class Ioniz(SRIM_Output):
@@ -398,35 +623,562 @@ class Range(SRIM_Output):
 
 
 
-class Backscat(object):
+# Numbers of the per particle files may be glued together (-1.2E+02-3.4E+01)
+# or start with the decimal point (.9986E+06)
+kinetics_number_regex = re.compile(b'[-+]?(?:\\d+\\.?\\d*|\\.\\d+)(?:[eE][-+]?\\d+)?')
+
+
+class Kinetics(SRIM_Output):
+    """ Per particle kinetics (energy, location and direction) files
+
+    Each particle is a line starting with prefix followed by nine
+    numbers: ion number, atomic number, energy [eV], x, y, z [Ang]
+    and direction cosines. They are loaded in a contiguous (N, 9)
+    float array.
+    """
+    prefix = None
+    num_columns = 9
+
+    def __init__(self, directory, filename=None, chunk_size=2**24):
+        path = os.path.join(directory, filename)
+        chunks = list(self.iter_chunks(path, chunk_size))
+        if chunks:
+            self._data = np.concatenate(chunks)
+        else:
+            self._data = np.empty((0, self.num_columns))
+
+    @classmethod
+    def _read_particles(cls, output):
+        """ (N, 9) array of the particle lines in output """
+        lines = re.findall(b'^' + cls.prefix + b'[ \\t]([^\\r\\n]*)', output, re.MULTILINE)
+        tokens = kinetics_number_regex.findall(b' '.join(lines).replace(b',', b'.'))
+        if len(tokens) != len(lines) * cls.num_columns:
+            raise SRIMOutputParseError('particle lines must have {} numbers'.format(cls.num_columns))
+        data = np.fromiter(map(float, tokens), dtype=np.float64, count=len(tokens))
+        return data.reshape(len(lines), cls.num_columns)
+
+    @classmethod
+    def iter_chunks(cls, path, chunk_size=2**24):
+        """ Stream a particle file as (n, 9) arrays
+
+        :param str path: path to the file
+        :param int chunk_size: bytes read at once
+
+        Only complete lines are parsed, memory is bounded by
+        chunk_size.
+        """
+        with open(path, 'rb') as f:
+            pending = b''
+            while True:
+                chunk = f.read(chunk_size)
+                data = pending + chunk
+                end = data.rfind(b'\n') + 1 if chunk else len(data)
+                pending = data[end:]
+                particles = cls._read_particles(data[:end])
+                if len(particles):
+                    yield particles
+                if not chunk:
+                    return
+
+    @classmethod
+    def merge(cls, outputs):
+        """ Concatenate particles of independent runs """
+        merged = cls.__new__(cls)
+        merged._data = np.concatenate([output._data for output in outputs])
+        return merged
+
+    @property
+    def data(self):
+        """ (N, 9) array of all particles """
+        return self._data
+
+    @property
+    def ion_numbers(self):
+        """ Number of the ion of each particle """
+        return self._data[:, 0].astype(np.int64)
+
+    @property
+    def atoms(self):
+        """ Atomic number of each particle """
+        return self._data[:, 1].astype(np.int64)
+
+    @property
+    def energy(self):
+        """ Energy [eV] of each particle """
+        return self._data[:, 2]
+
+    @property
+    def position(self):
+        """ (N, 3) position [Ang] of each particle """
+        return self._data[:, 3:6]
+
+    @property
+    def direction(self):
+        """ (N, 3) direction cosines of each particle """
+        return self._data[:, 6:9]
+
+    @property
+    def polar_angle(self):
+        """ Angle [degrees] between each particle direction and the target normal """
+        return polar_angle(self._data)
+
+    def energy_spectrum(self, bins=100, range=None):
+        """ Histogram of particle energies, see energy_spectrum """
+        return energy_spectrum(self._data, bins, range)
+
+    def angular_distribution(self, bins=90, range=(0.0, 90.0), solid_angle=False):
+        """ Histogram of polar angles, see angular_distribution """
+        return angular_distribution(self._data, bins, range, solid_angle)
+
+
+def polar_angle(data):
+    """ Angle [degrees] from the target normal of (N, 9) particles """
+    return np.degrees(np.arccos(np.clip(np.abs(data[:, 6]), 0.0, 1.0)))
+
+
+def energy_spectrum(data, bins=100, range=None):
+    """ Energy histogram (counts, edges [eV]) of (N, 9) particles
+
+    Pass explicit bin edges to accumulate counts over chunks.
+    """
+    return np.histogram(data[:, 2], bins=bins, range=range)
+
+
+def angular_distribution(data, bins=90, range=(0.0, 90.0), solid_angle=False):
+    """ Polar angle histogram (counts, edges [degrees]) of (N, 9) particles
+
+    With solid_angle=True counts are divided by the solid angle [sr]
+    of each bin.
+    """
+    counts, edges = np.histogram(polar_angle(data), bins=bins, range=range)
+    if solid_angle:
+        cosines = np.cos(np.radians(edges))
+        counts = counts / (2.0 * np.pi * (cosines[:-1] - cosines[1:]))
+    return counts, edges
+
+
+class Backscat(Kinetics):
     """ The kinetics of all backscattered ions (energy, location and trajectory)
     """
-    pass
+    prefix = b'B'
+
+    def __init__(self, directory, filename='BACKSCAT.txt', chunk_size=2**24):
+        super(Backscat, self).__init__(directory, filename, chunk_size)
 
 
-class Transmit(object):
+class Transmit(Kinetics):
     """ The kinetics of all transmitted ions (energy, location and trajectory)
     """
-    pass
+    prefix = b'T'
 
+    def __init__(self, directory, filename='TRANSMIT.txt', chunk_size=2**24):
+        super(Transmit, self).__init__(directory, filename, chunk_size)
 
-class Sputter(object):
+
+class Sputter(Kinetics):
     """ The kinetics of all target atoms sputtered from the target.
     """
-    pass
+    prefix = b'S'
+
+    def __init__(self, directory, filename='SPUTTER.txt', chunk_size=2**24):
+        super(Sputter, self).__init__(directory, filename, chunk_size)
+
+
+class PositionTable(SRIM_Output):
+    """ Large per ion numeric tables (RANGE_3D.txt, EXYZ.txt)
+
+    The file is memory mapped and the rows after the header line of
+    dashes are parsed in chunks into a (N, num_columns) float array.
+    """
+    num_columns = None
+    position_columns = None
+    header_size = 2**16
+
+    def __init__(self, directory, filename=None, chunk_size=2**24):
+        path = os.path.join(directory, filename)
+        chunks = list(self.iter_chunks(path, chunk_size))
+        if chunks:
+            self._data = np.concatenate(chunks)
+        else:
+            self._data = np.empty((0, self.num_columns))
+
+    @classmethod
+    def _parse_rows(cls, block):
+        tokens = kinetics_number_regex.findall(block.replace(b',', b'.'))
+        if len(tokens) % cls.num_columns:
+            raise SRIMOutputParseError('rows must have {} numbers'.format(cls.num_columns))
+        data = np.fromiter(map(float, tokens), dtype=np.float64, count=len(tokens))
+        return data.reshape(-1, cls.num_columns)
+
+    @classmethod
+    def iter_chunks(cls, path, chunk_size=2**24):
+        """ Stream the rows of a file as (n, num_columns) arrays
+
+        :param str path: path to the file
+        :param int chunk_size: bytes of the memory map parsed at once
+        """
+        if not os.path.getsize(path):
+            return
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            _, dashes_end = _find_dashes(buffer[:cls.header_size])
+            start = buffer.find(b'\n', dashes_end) + 1 or len(buffer)
+            while start < len(buffer):
+                # extend each chunk to the end of its last line
+                end = min(start + chunk_size, len(buffer))
+                if end < len(buffer):
+                    end = buffer.find(b'\n', end) + 1 or len(buffer)
+                rows = cls._parse_rows(buffer[start:end])
+                if len(rows):
+                    yield rows
+                start = end
+        finally:
+            buffer.close()
+
+    @classmethod
+    def histogram_file(cls, path, bins, weights_column=None, chunk_size=2**24):
+        """ 3-D histogram of the positions of a file, streamed in chunks
+
+        :param list bins: bin edges [Ang], see bin_positions
+        :param int weights_column: column used as weight (counts if None)
+
+        Returns (histogram, edges) like numpy.histogramdd
+        """
+        histogram, edges = bin_positions(np.empty((0, 3)), bins)
+        histogram = histogram.astype(np.float64)
+        for chunk in cls.iter_chunks(path, chunk_size):
+            weights = None if weights_column is None else chunk[:, weights_column]
+            histogram += bin_positions(chunk[:, cls.position_columns], bins, weights)[0]
+        return histogram, edges
+
+    @property
+    def data(self):
+        """ (N, num_columns) array of all rows """
+        return self._data
+
+    @property
+    def ion_numbers(self):
+        """ Number of the ion of each row """
+        return self._data[:, 0].astype(np.int64)
+
+    @property
+    def position(self):
+        """ (N, 3) position [Ang] depth (x), lateral y and lateral z """
+        return self._data[:, self.position_columns]
+
+    def histogram(self, bins, weights=None):
+        """ 3-D histogram of positions, see bin_positions """
+        return bin_positions(self.position, bins, weights)
+
+
+def bin_positions(positions, bins, weights=None):
+    """ Histogram (N, 3) positions into a depth/lateral grid
+
+    :param list bins: three arrays of bin edges [Ang] (depth, y, z)
+        or a single array of depth edges (lateral positions summed)
+    :param array weights: weight of each position (counts if None)
+
+    Returns (histogram, edges) like numpy.histogramdd
+    """
+    if len(bins) and np.ndim(bins[0]) == 0:
+        counts, edges = np.histogram(positions[:, 0], bins=bins, weights=weights)
+        return counts, [edges]
+    return np.histogramdd(positions, bins=bins, weights=weights)
+
+
+class Range3D(PositionTable):
+    """ Final position of every ion (RANGE_3D.txt) """
+    num_columns = 4
+    position_columns = [1, 2, 3]
+
+    def __init__(self, directory, filename='RANGE_3D.txt', chunk_size=2**24):
+        super(Range3D, self).__init__(directory, filename, chunk_size)
+
+
+class EXYZ(PositionTable):
+    """ Ion energy along the trajectories (EXYZ.txt) """
+    num_columns = 7
+    position_columns = [2, 3, 4]
+
+    def __init__(self, directory, filename='EXYZ.txt', chunk_size=2**24):
+        super(EXYZ, self).__init__(directory, filename, chunk_size)
+
+    @property
+    def energy(self):
+        """ Energy [eV] of the ion at each point """
+        return 1000.0 * self._data[:, 1]
+
+    @property
+    def electronic_stopping(self):
+        """ Electronic stopping [eV/Ang] at each point """
+        return self._data[:, 5]
+
+    @property
+    def recoil_energy(self):
+        """ Energy [eV] lost to the last recoil """
+        return self._data[:, 6]
+
+
+sr_energy_units = {'eV': 1.0, 'keV': 1.0e3, 'MeV': 1.0e6, 'GeV': 1.0e9}
+sr_length_units = {'A': 1.0, 'um': 1.0e4, 'mm': 1.0e7, 'm': 1.0e10, 'km': 1.0e13}
+sr_row_regex = re.compile((
+    r'^\s*({0})\s*(eV|keV|MeV|GeV)\s+({0})\s+({0})'
+    r'\s+({0})\s*(A|um|mm|m|km)\s+({0})\s*(A|um|mm|m|km)\s+({0})\s*(A|um|mm|m|km)\s*$'
+).format(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'), re.MULTILINE)
+
+
+class SRResults(object):
+    """ Stopping and range table of the SR Module (SR_OUTPUT.txt)
+
+    Columns are numpy arrays normalized to eV and Angstrom whatever
+    the output units chosen in SRSettings.
+    """
+    def __init__(self, directory, filename='SR_OUTPUT.txt'):
+        with open(os.path.join(directory, filename), 'rb') as f:
+            # Decimal commas are written by some Windows locales
+            output = re.sub(r'(\d),(\d)', r'\1.\2', f.read().decode('latin-1'))
+
+        self._ion = self._read_ion(output)
+        self._stopping_units, self._conversions = self._read_units(output)
+        data = self._read_table(output)
+        self._ion_energy = data[:, 0]
+        self._electronic = data[:, 1]
+        self._nuclear = data[:, 2]
+        self._projected_range = data[:, 3]
+        self._longitudinal_straggling = data[:, 4]
+        self._lateral_straggling = data[:, 5]
+
+        # Stopping [output units] -> [eV/Ang]
+        factor = self._conversions.get('eV / Angstrom')
+        if factor is None:
+            raise SRIMOutputParseError('unable to extract stopping units conversion from file')
+        self._electronic = self._electronic * factor
+        self._nuclear = self._nuclear * factor
+
+    @staticmethod
+    def _read_ion(output):
+        match = re.search(r'Ion\s+=\s+([A-Za-z]+)\s+\[(\d+)\]\s*,\s*Mass\s+=\s+({})\s+amu'.format(double_regex), output)
+        if match:
+            return {'name': match.group(1), 'atomic_number': int(match.group(2)),
+                    'mass': float(match.group(3))}
+        raise SRIMOutputParseError("unable to extract ion from file")
+
+    @staticmethod
+    def _read_units(output):
+        match = re.search(r'Stopping Units\s+=\s+(.*?)\s*$', output, re.MULTILINE)
+        if not match:
+            raise SRIMOutputParseError("unable to extract stopping units from file")
+        conversions = {}
+        for factor, units in re.findall(r'^\s*({})\s+(\S.*?)\s*$'.format(double_regex),
+                                        output[output.find('Multiply Stopping by'):], re.MULTILINE):
+            conversions[' '.join(units.split())] = float(factor)
+        return ' '.join(match.group(1).split()), conversions
+
+    @staticmethod
+    def _read_table(output):
+        rows = sr_row_regex.findall(output)
+        if not rows:
+            raise SRIMOutputParseError("unable to extract table from file")
+        return np.array([(
+            float(energy) * sr_energy_units[energy_unit],
+            float(electronic), float(nuclear),
+            float(projected) * sr_length_units[projected_unit],
+            float(longitudinal) * sr_length_units[longitudinal_unit],
+            float(lateral) * sr_length_units[lateral_unit]
+        ) for (energy, energy_unit, electronic, nuclear, projected, projected_unit,
+               longitudinal, longitudinal_unit, lateral, lateral_unit) in rows])
+
+    @property
+    def ion(self):
+        """ Ion name, atomic number and mass [amu] """
+        return self._ion
+
+    @property
+    def stopping_units(self):
+        """ Stopping units of SR_OUTPUT.txt (columns are converted to eV/Ang) """
+        return self._stopping_units
+
+    @property
+    def conversions(self):
+        """ Factors converting the stopping of the file to other units """
+        return self._conversions
+
+    @property
+    def energy(self):
+        """ Ion energy [eV] """
+        return self._ion_energy
+
+    @property
+    def electronic(self):
+        """ Electronic stopping [eV/Ang] """
+        return self._electronic
+
+    @property
+    def nuclear(self):
+        """ Nuclear stopping [eV/Ang] """
+        return self._nuclear
+
+    @property
+    def stopping(self):
+        """ Total stopping [eV/Ang] """
+        return self._electronic + self._nuclear
+
+    @property
+    def projected_range(self):
+        """ Projected range [Ang] """
+        return self._projected_range
+
+    @property
+    def longitudinal_straggling(self):
+        """ Longitudinal straggling [Ang] """
+        return self._longitudinal_straggling
+
+    @property
+    def lateral_straggling(self):
+        """ Lateral straggling [Ang] """
+        return self._lateral_straggling
+
+
+# Columnar representation of COLLISON.txt
+collision_ion_dtype = np.dtype([
+    ('ion_number', np.int64),
+    ('displacements', np.float64), ('avg_displacements', np.float64),
+    ('replacements', np.float64), ('avg_replacements', np.float64),
+    ('vacancies', np.float64), ('avg_vacancies', np.float64),
+    ('interstitials', np.float64), ('avg_interstitials', np.float64),
+    ('sputtered_atoms', np.float64), ('avg_sputtered_atoms', np.float64),
+    ('transmitted_atoms', np.float64), ('avg_transmitted_atoms', np.float64)
+])
+
+collision_dtype = np.dtype([
+    ('ion_number', np.int64),
+    ('kinetic_energy', np.float64),
+    ('depth', np.float64),
+    ('lat_y_dist', np.float64),
+    ('lat_z_dist', np.float64),
+    ('stopping_energy', np.float64),
+    ('atom', 'U2'),
+    ('recoil_energy', np.float64),
+    ('target_disp', np.float64),
+    ('target_vac', np.float64),
+    ('target_replac', np.float64),
+    ('target_inter', np.float64)
+])
+
+cascade_dtype = np.dtype([
+    ('ion_number', np.int64),
+    ('collision', np.int64),
+    ('recoil', np.int64),
+    ('atom', np.int64),
+    ('recoil_energy', np.float64),
+    ('position', np.float64, (3,)),
+    ('vac', np.int64),
+    ('repl', np.int64)
+])
+
+_nan = float('nan')
+_column_separator = chr(179)
 
 
 class Collision:
     """Reads the SRIM Collisions.txt file
 
+    Ions can be read as dictionaries (Collision[i]) or as structured
+    numpy arrays (read_arrays, to_arrays) which is much faster and
+    lighter for full cascade files.
     """
-    def __init__(self, filename):
+    ion_marker = b"  Ion    Energy"
+
+    def __init__(self, filename, index_file=True):
+        """ Open COLLISON.txt and index the start of each ion
+
+        :param str filename: path to COLLISON.txt
+        :param bool or str index_file: sidecar file storing the ion index
+            (True: filename + '.idx.npz', False: do not use a sidecar)
+
+        The sidecar is reused when the size and modification time of
+        filename did not change.
+        """
         self.filename = filename
+        self._mmap = None
 
         with open(filename, "r", encoding="latin-1") as f:
             self._read_header(f)
 
-        self._ion_index = buffered_findall(filename, b"  Ion    Energy")
+        if index_file is True:
+            index_file = filename + '.idx.npz'
+        self.index_file = index_file or None
+
+        self._ion_index = self._load_index()
+        if self._ion_index is None:
+            self._ion_index = self._build_index()
+            self._save_index()
+
+    def _file_signature(self):
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _build_index(self):
+        """ Offsets of each ion with a single search over the mapped file
+
+        The file size is appended so that ion i spans
+        [index[i], index[i+1])
+        """
+        buffer = self._buffer
+        if buffer is None:
+            positions = []
+        else:
+            positions = [match.start() for match in re.finditer(re.escape(self.ion_marker), buffer)]
+        positions.append(os.path.getsize(self.filename))
+        return np.array(positions, dtype=np.int64)
+
+    def _load_index(self):
+        if self.index_file is None:
+            return None
+        try:
+            with np.load(self.index_file) as data:
+                if tuple(data['signature']) != self._file_signature():
+                    return None
+                return data['index']
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save_index(self):
+        if self.index_file is None:
+            return
+        try:
+            with open(self.index_file, 'wb') as f:
+                np.savez(f, index=self._ion_index,
+                         signature=np.array(self._file_signature(), dtype=np.int64))
+        except OSError:
+            # read only location, index is rebuilt next time
+            pass
+
+    @property
+    def _buffer(self):
+        """ Read only memory map of the file (None for an empty file) """
+        if self._mmap is None and os.path.getsize(self.filename):
+            with open(self.filename, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self):
+        """ Release the memory map of the file """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_mmap'] = None
+        return state
 
     def _read_header(self, f):
         """Read Header of COLLISIONS.TXT
@@ -553,7 +1305,6 @@ class Collision:
                 break
             tokens = line.split()[1:-1]
 
-            print(tokens)
             cascade.append({
                 'recoil': int(tokens[0]),
                 'atom': int(tokens[1]),
@@ -585,44 +1336,345 @@ class Collision:
 
         return target_disp, target_vac, target_replac, target_inter, cascade
 
-    def __getitem__(self, i):
-        start = self._ion_index[i]
+    def _read_ion_columns(self, ion_str):
+        """ Parse an ion into rows of the columnar dtypes
 
-        if i == len(self._ion_index):
-            end = os.path.getsize(self.filename)
-        else:
-            end = self._ion_index[i+1]
+        Returns the ion summary tuple, the collision tuples and the
+        cascade tuples (collision is the index of the collision row
+        within the ion). Same layout as _read_ion without per line
+        regular expressions.
+        """
+        lines = ion_str.split('\n')
+        num_lines = len(lines)
+
+        # Skip Ion Header
+        i = 0
+        while i < num_lines and not (lines[i].startswith('-') and lines[i].strip('-\r') == ''):
+            i += 1
+        i += 1
 
-        with open(self.filename, "rb") as f:
-            f.seek(start)
-            # We assume that ion_str will fit in RAM
-            ion_str = f.read(end - start)
-            return self._read_ion(ion_str.decode('latin-1'))
+        collisions = []
+        cascades = []
+
+        # Reads collisions for an ion
+        while i < num_lines:
+            line = lines[i]
+            i += 1
+            if line.startswith('='):
+                break
+
+            tokens = line.split(_column_separator)[1:-1]
+            if not tokens:
+                continue
+
+            if 'Start of New Cascade' in tokens[-1]:
+                # skip ===== and cascade header lines
+                i += 2
+                collision = len(collisions)
+                ion_number = int(tokens[0])
+                while i < num_lines:
+                    line = lines[i]
+                    i += 1
+                    if line.startswith('='):
+                        break
+                    recoil = line.split()[1:-1]
+                    cascades.append((
+                        ion_number, collision, int(recoil[0]), int(recoil[1]), float(recoil[2]),
+                        (float(recoil[3]), float(recoil[4]), float(recoil[5])),
+                        int(recoil[6]), int(recoil[7])
+                    ))
+
+                summary = []
+                if line.count('=') <= 100 and i < num_lines:
+                    summary = lines[i].split(_column_separator)[1:-1]
+                    i += 1
+                if summary:
+                    target = (float(summary[2]), float(summary[3]),
+                              float(summary[4]), float(summary[5]))
+                else:
+                    target = (_nan, _nan, _nan, _nan)
+            else:
+                target = (float(tokens[8]), 0.0, 0.0, 0.0)
+
+            collisions.append((
+                int(tokens[0]), float(tokens[1]), float(tokens[2]),
+                float(tokens[3]), float(tokens[4]), float(tokens[5]),
+                tokens[6].strip(), float(tokens[7])) + target)
+
+            # Handles weird case where no summary of cascade
+            if target[0] != target[0]:
+                break
+
+        # Reads ion footer
+        ion_number = int(re.search(int_regex, lines[i]).group(0))
+        i += 1
+        footer_end = i
+        while footer_end < num_lines and not lines[footer_end].startswith('='):
+            footer_end += 1
+        matches = re.findall(double_regex, ''.join(lines[i:footer_end]))
+
+        summary = (ion_number,) + tuple(float(match) for match in matches[:12])
+        return summary, collisions, cascades
+
+    def _read_ion_string(self, i):
+        """ Text of ion i decoded from a view of the memory map """
+        i = range(len(self))[i]
+        start, end = self._ion_index[i], self._ion_index[i+1]
+        return str(memoryview(self._buffer)[start:end], 'latin-1')
+
+    def read_arrays(self, i):
+        """ Ion i as structured numpy arrays
+
+        Returns (ion, collisions, cascades) with dtypes
+        collision_ion_dtype (a single record), collision_dtype and
+        cascade_dtype. Missing cascade summaries are nan.
+        """
+        summary, collisions, cascades = self._read_ion_columns(self._read_ion_string(i))
+        return (np.array(summary, dtype=collision_ion_dtype),
+                np.array(collisions, dtype=collision_dtype),
+                np.array(cascades, dtype=cascade_dtype))
+
+    def to_arrays(self, ions=None):
+        """ Several ions as three record arrays
+
+        :param iterable ions: indices of ions to read (defaults to all ions)
+
+        Returns (ions, collisions, cascades), rows of all ions are
+        concatenated. ion_number links the arrays and the collision
+        field of cascades indexes the collisions array.
+        """
+        if ions is None:
+            ions = range(len(self))
+        return self._stack_columns(self._read_ion_columns(self._read_ion_string(i)) for i in ions)
+
+    @staticmethod
+    def _stack_columns(parsed_ions):
+        """ Concatenate _read_ion_columns outputs into record arrays """
+        summaries, collisions, cascades = [], [], []
+        for summary, ion_collisions, ion_cascades in parsed_ions:
+            offset = len(collisions)
+            summaries.append(summary)
+            collisions.extend(ion_collisions)
+            cascades.extend(cascade[:1] + (cascade[1] + offset,) + cascade[2:] for cascade in ion_cascades)
+
+        return (np.array(summaries, dtype=collision_ion_dtype),
+                np.array(collisions, dtype=collision_dtype),
+                np.array(cascades, dtype=cascade_dtype))
+
+    def _iter_ion_strings(self, chunk_size):
+        """ Text of each ion from one sequential pass over the file """
+        marker = re.compile(re.escape(self.ion_marker))
+        overlap = len(self.ion_marker) - 1
+        started = False
+        pending = b''
+        with open(self.filename, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                data = pending + chunk
+                if started:
+                    # pending starts with the marker of the current ion
+                    positions = [0] + [match.start() for match in
+                                       marker.finditer(data, max(len(pending) - overlap, 1))]
+                else:
+                    positions = [match.start() for match in marker.finditer(data)]
+
+                if not positions:
+                    # still in the header
+                    if not chunk:
+                        return
+                    pending = data[-overlap:]
+                    continue
+
+                started = True
+                for start, end in zip(positions[:-1], positions[1:]):
+                    yield data[start:end].decode('latin-1')
+                pending = data[positions[-1]:]
+
+                if not chunk:
+                    yield pending.decode('latin-1')
+                    return
+
+    def iter_ions(self, chunk_size=2**24, batch_size=None, arrays=False):
+        """ Walk through all ions in one sequential pass
+
+        :param int chunk_size: bytes read from the file at once
+        :param int batch_size: yield lists (or stacked arrays) of batch_size ions
+        :param bool arrays: yield read_arrays like tuples instead of dictionaries
+
+        Does not use the ion index. Memory is bounded by chunk_size,
+        the largest ion and one batch, so reductions over very large
+        files run on small workers.
+        """
+        parse = self._read_ion_columns if arrays else self._read_ion
+
+        batch = []
+        for ion_str in self._iter_ion_strings(chunk_size):
+            ion = parse(ion_str)
+            if batch_size is None:
+                yield self._stack_columns([ion]) if arrays else ion
+                continue
+
+            batch.append(ion)
+            if len(batch) == batch_size:
+                yield self._stack_columns(batch) if arrays else batch
+                batch = []
+
+        if batch:
+            yield self._stack_columns(batch) if arrays else batch
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        return self._read_ion(self._read_ion_string(i))
 
     def __len__(self):
         return len(self._ion_index) - 1
 
 
 def buffered_findall(filename, string, start=0):
-    with open(filename, 'rb') as f:
-        filesize = os.path.getsize(filename)
-        BUFFERSIZE = 4096
-        overlap = len(string) - 1
-        buffer = None
-        positions = []
-
-        if start > 0:
-            f.seek(start)
-
-        while True:
-            if (f.tell() >= overlap and f.tell() < filesize):
-                f.seek(f.tell() - overlap)
-            buffer = f.read(BUFFERSIZE)
-            if buffer:
-                buffer_positions = [m.start() for m in re.finditer(string, buffer)]
-
-                for position in buffer_positions:
-                    if position >= 0:
-                        positions.append(f.tell() - len(buffer) + position)
-            else:
-                return positions
+    """ Offsets of the matches of regex string in filename from start
+
+    Deprecated, Collision now indexes COLLISON.txt over an mmap (see
+    Collision._build_index). Kept for code calling it directly.
+    """
+    warnings.warn('buffered_findall is deprecated, use Collision', DeprecationWarning, stacklevel=2)
+    if os.path.getsize(filename) == 0:
+        return []
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return [match.start() for match in re.compile(string).finditer(mapped, start)]
+
+
+trim_in_description_regex = re.compile(r'^"(.*)"\s+(\d+)\s+(\d+)\s*$')
+trim_in_layer_regex = re.compile(r'^(\d+)\s+"(.*)"\s+(.*)$')
+trim_in_atom_regex = re.compile(r'^Atom\s+\d+\s+=\s+(\S+)\s+=\s+(\d+)\s+(\S+)\s*$')
+
+
+class TrimIn(object):
+    """ Ion, settings and target read back from a TRIM.IN written by pysrim
+
+    Layer stoichiometries are kept as the values written on each layer
+    line, in the column order of TRIM.IN.
+    """
+    def __init__(self, directory, filename='TRIM.IN'):
+        with open(os.path.join(directory, filename)) as f:
+            lines = [line.rstrip('\r\n') for line in f]
+        try:
+            self._read(lines)
+        except (IndexError, ValueError, AttributeError):
+            raise SRIMOutputParseError('unable to read {}'.format(os.path.join(directory, filename)))
+
+    @staticmethod
+    def _values(line, types):
+        return [value_type(value) for value_type, value in zip(types, line.split())]
+
+    def _read(self, lines):
+        z, mass, energy, angle, number_ions, bragg, autosave = self._values(
+            lines[2], (int, float, float, float, int, float, int))
+        calculation, random_seed, reminders = self._values(lines[4], (int, int, int))
+        ranges, backscattered, transmit, sputtered, collisions, exyz = self._values(lines[6], (int,) * 6)
+        description, num_elements, num_layers = trim_in_description_regex.match(lines[8]).groups()
+        num_elements, num_layers = int(num_elements), int(num_layers)
+        plot_mode, plot_xmin, plot_xmax = self._values(lines[10], (int, float, float))
+
+        self._ion = Ion(z, 1000.0 * energy, mass) # keV -> eV
+        self._number_ions = number_ions
+        self._calculation = calculation
+        self._settings = {
+            'description': description, 'reminders': reminders, 'autosave': autosave,
+            'plot_mode': plot_mode, 'plot_xmin': plot_xmin, 'plot_xmax': plot_xmax,
+            'ranges': ranges, 'backscattered': backscattered, 'transmit': transmit,
+            'sputtered': sputtered, 'collisions': collisions, 'exyz': exyz,
+            'angle_ions': angle, 'bragg_correction': bragg, 'random_seed': random_seed
+        }
+
+        start = lines.index('Target Elements:    Z   Mass [amu]') + 1
+        self._atoms = []
+        for line in lines[start:start + num_elements]:
+            symbol, atomic_number, atom_mass = trim_in_atom_regex.match(line).groups()
+            self._atoms.append((symbol, int(atomic_number), float(atom_mass)))
+
+        start += num_elements + 2
+        self._layers = []
+        for line in lines[start:start + num_layers]:
+            _, name, values = trim_in_layer_regex.match(line).groups()
+            values = [float(value) for value in values.split()]
+            self._layers.append({
+                'name': name, 'width': values[0], 'density': values[1], 'stoich': values[2:]
+            })
+
+        start = next(i for i, line in enumerate(lines) if line.endswith('Target layer phases (0=Solid, 1=Gas)'))
+        for layer, phase in zip(self._layers, lines[start + 1].split()):
+            layer['phase'] = int(phase)
+
+        def per_atom(header):
+            start = lines.index(header) + 1
+            return [float(line) for line in lines[start:start + num_elements]]
+
+        self._displacement = per_atom('Individual target atom displacement energies (eV)')
+        self._lattice = per_atom('Individual target atom lattice binding energies (eV)')
+        self._surface = per_atom('Individual target atom surface binding energies (eV)')
+        self._settings['version'] = int(lines[lines.index('Stopping Power Version (1=2011, 0=2011)') + 1])
+
+    @property
+    def ion(self):
+        """ Incident ion (energy in eV) """
+        return self._ion
+
+    @property
+    def number_ions(self):
+        """ Number of ions requested """
+        return self._number_ions
+
+    @property
+    def calculation(self):
+        """ Type of calculation (1=Kinchin-Pease, 2=Full-Cascade, ...) """
+        return self._calculation
+
+    @property
+    def random_seed(self):
+        """ Random number seed """
+        return self._settings['random_seed']
+
+    @property
+    def settings(self):
+        """ SRIMSettings keyword arguments """
+        return dict(self._settings)
+
+    @property
+    def atoms(self):
+        """ (symbol, atomic number, mass) of each target atom """
+        return list(self._atoms)
+
+    @property
+    def layers(self):
+        """ name, width [Ang], density [g/cm3], stoich and phase of each layer """
+        return [dict(layer) for layer in self._layers]
+
+    @property
+    def displacement_energies(self):
+        """ Displacement energy [eV] of each target atom """
+        return list(self._displacement)
+
+    @property
+    def lattice_energies(self):
+        """ Lattice binding energy [eV] of each target atom """
+        return list(self._lattice)
+
+    @property
+    def surface_energies(self):
+        """ Surface binding energy [eV] of each target atom """
+        return list(self._surface)
+
+    def to_dict(self):
+        """ Plain (json serializable) dict of the TRIM.IN content """
+        return {
+            'ion': {'symbol': self._ion.symbol, 'energy': self._ion.energy, 'mass': self._ion.mass},
+            'number_ions': self._number_ions,
+            'calculation': self._calculation,
+            'settings': self.settings,
+            'atoms': [list(atom) for atom in self._atoms],
+            'layers': self.layers,
+            'displacement_energies': self.displacement_energies,
+            'lattice_energies': self.lattice_energies,
+            'surface_energies': self.surface_energies
+        }
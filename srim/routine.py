@@ -3,12 +3,13 @@
 ### Modified by : Victor Garric : victor.garric@gmail.com, 2018
 
 import os
+import glob
 from collections import Counter
 from itertools import count
-from scipy.stats import gaussian_kde
 from random import randint
-from scipy.stats import gaussian_kde
+import numpy as np
 from .srim import SRIM
+from .batch import BatchJob, BatchRunner
 from .core.target import Target
 from .core.layer import Layer
 from .core.ion import Ion
@@ -22,78 +23,173 @@ from pathlib import Path
 import datetime
 import sys
 
+def _calculation_settings(num_ions, calculation, plot_limits=None, angle_ions=0):
+    """ SRIM keyword arguments used by the automated routines """
+    settings = {
+        'number_ions': num_ions,
+        'calculation': calculation,
+        'collisions': 2,
+        'random_seed': randint(0, 100000),
+        'angle_ions': angle_ions
+    }
+    if plot_limits is not None:
+        settings['plot_xmin'] = plot_limits[0]
+        settings['plot_xmax'] = plot_limits[1]
+    return settings
+
+
+def _calculation_name(ion, plot_limits=None, angle_ions=0):
+    """ Name of the directory where a calculation is saved """
+    name = '%s-%s' % (ion.symbol, ion.energy)
+    if plot_limits is not None:
+        name += '-%s-%s' % (plot_limits[0], plot_limits[1])
+    if angle_ions:
+        name += '-%s' % angle_ions
+    return name
+
+
+def _print_saved(done, total, job, results):
+    print('\t%s\t\t Results saved to %s (%d/%d)' % (datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S'), results.directory, done, total))
+
+
 def run_calculation(ion, target, num_ions, calculation=2, save_directory=None, SRIM_dir='~/SRIM', subbing=False, plot_limits=None, angle_ions=0):
     print('\t%s\t%s\t%s\t\t%d\t\t%s\t\t%s' % (datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S'), ion.symbol, ion.energy,num_ions,plot_limits,angle_ions))
-    if plot_limits==None :
-        srim = SRIM(target, ion, number_ions=num_ions, calculation=calculation, collisions=2, random_seed=randint(0, 100000),angle_ions=angle_ions)
-    else :
-        srim = SRIM(target, ion, number_ions=num_ions, calculation=calculation, collisions=2, random_seed=randint(0, 100000),plot_xmin=plot_limits[0],plot_xmax=plot_limits[1],angle_ions=angle_ions)
+    settings = _calculation_settings(num_ions, calculation, plot_limits, angle_ions)
+    srim = SRIM(target, ion, **settings)
     results = srim.run(SRIM_dir,subbing=subbing)
     if save_directory==None :
         save_directory = os.getcwd()
-    local_dir=os.path.join(save_directory,('%s-%s-%s'%(ion.symbol,ion.energy,str(plot_limits[0])+'-'+str(plot_limits[1]))))
+    local_dir=os.path.join(save_directory, _calculation_name(ion, plot_limits, angle_ions))
     os.makedirs(local_dir, exist_ok=True)
     SRIM.copy_output_files(SRIM_dir, local_dir)
     print('\t%s\t\t Results saved to %s' % (datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S'),local_dir))
 
 
-def auto_steps(ions,target,num_ions,calculation,save_directory,SRIM_dir,subbing,steps,angle_ions):
+def run_batch(jobs, num_ions, calculation=2, save_directory=None, SRIM_dir='~/SRIM', subbing=False, max_workers=None):
+    """ Run calculations in parallel with a BatchRunner
+
+    :param list jobs: (ion, target, plot_limits, angle_ions, name) tuples
+    :param int max_workers: number of concurrent TRIM runs (defaults to cpu count)
+
+    Outputs are saved in save_directory/name, results are returned in
+    the order of jobs.
+    """
+    batch = []
+    for ion, target, plot_limits, angle_ions, name in jobs:
+        print('\t%s\t%s\t%s\t\t%d\t\t%s\t\t%s' % (datetime.datetime.now().strftime('%d-%m-%Y %H:%M:%S'), ion.symbol, ion.energy,num_ions,plot_limits,angle_ions))
+        settings = _calculation_settings(num_ions, calculation, plot_limits, angle_ions)
+        batch.append(BatchJob(ion, target, settings, name=name))
+    runner = BatchRunner(os.path.expanduser(SRIM_dir), save_directory, max_workers=max_workers, subbing=subbing, progress=_print_saved)
+    return runner.run(batch)
+
+
+def auto_steps(ions,target,num_ions,calculation,save_directory,SRIM_dir,subbing,steps,angle_ions,max_workers=1):
     print('*** Automated SRIM on Python : Starting ***')
     print('\n')
     print('\t%s\t\t\t%s\t%s\t%s\t%s\t\t%s' % ('Date','Symbole', 'Energie (eV)','Ions calculés','Step','Angle'))
-    for step in steps :
-        run_calculation(Ion(**ions), target, num_ions, calculation=calculation, save_directory=save_directory, SRIM_dir=SRIM_dir, subbing=subbing, plot_limits=step, angle_ions=angle_ions)
+    if max_workers == 1:
+        for step in steps :
+            run_calculation(Ion(**ions), target, num_ions, calculation=calculation, save_directory=save_directory, SRIM_dir=SRIM_dir, subbing=subbing, plot_limits=step, angle_ions=angle_ions)
+    else:
+        jobs = [(Ion(**ions), target, step, angle_ions, _calculation_name(Ion(**ions), step)) for step in steps]
+        run_batch(jobs, num_ions, calculation, save_directory, SRIM_dir, subbing, max_workers)
     print('*** Automated SRIM on Python : End ***')
 
-def auto_ions(ions,target,num_ions,calculation,save_directory,SRIM_dir,subbing,steps,angle_ions):
+def auto_ions(ions,target,num_ions,calculation,save_directory,SRIM_dir,subbing,steps,angle_ions,max_workers=1):
     print('*** Automated SRIM on Python : Starting ***')
     print('\n')
     print('\t%s\t\t\t%s\t%s\t%s\t%s\t\t%s' % ('Date','Symbole', 'Energie (eV)','Ions calculés','Step','Angle'))
-    for ion in ions :
-        run_calculation(Ion(**ion), target, num_ions, calculation=calculation, save_directory=save_directory, SRIM_dir=SRIM_dir, subbing=subbing, angle_ions=angle_ions)
+    if max_workers == 1:
+        for ion in ions :
+            run_calculation(Ion(**ion), target, num_ions, calculation=calculation, save_directory=save_directory, SRIM_dir=SRIM_dir, subbing=subbing, angle_ions=angle_ions)
+    else:
+        jobs = [(Ion(**ion), target, None, angle_ions, _calculation_name(Ion(**ion))) for ion in ions]
+        run_batch(jobs, num_ions, calculation, save_directory, SRIM_dir, subbing, max_workers)
     print('*** Automated SRIM on Python : End ***')
 
-def auto_angle(ions, target, num_ions, calculation, save_directory, SRIM_dir, subbing, steps, angle_ions):
+def auto_angle(ions, target, num_ions, calculation, save_directory, SRIM_dir, subbing, steps, angle_ions, max_workers=1):
     print('*** Automated SRIM on Python : Starting ***')
     print('\n')
     print('\t%s\t\t\t%s\t%s\t%s\t%s\t\t%s' % ('Date', 'Symbole', 'Energie (eV)', 'Ions calculés', 'Step', 'Angle'))
-    for angle in angle_ions:
-        run_calculation(Ion(**ions), target, num_ions, calculation=calculation, save_directory=save_directory,
-                        SRIM_dir=SRIM_dir, subbing=subbing, angle_ions=angle_ions)
+    if max_workers == 1:
+        for angle in angle_ions:
+            run_calculation(Ion(**ions), target, num_ions, calculation=calculation, save_directory=save_directory,
+                            SRIM_dir=SRIM_dir, subbing=subbing, angle_ions=angle)
+    else:
+        jobs = [(Ion(**ions), target, None, angle, _calculation_name(Ion(**ions), angle_ions=angle)) for angle in angle_ions]
+        run_batch(jobs, num_ions, calculation, save_directory, SRIM_dir, subbing, max_workers)
     print('*** Automated SRIM on Python : End ***')
 
-def merge_results() :
-    dirs=[x[0] for x in os.walk(os.getcwd())]
-    dirs.pop(0)
-    for item in dirs :
-        if item.endswith('__pycache__') :
-            dirs.remove(item)
-    
-    dirs.sort()
-    total_range=''
-    total_vacancy=''
-    
-    for directory in dirs :
-        local_range=open(directory+'/RANGE.txt','r').readlines()
-        local_vacancy=open(directory+'/VACANCY.txt','r').readlines()
-        for line in local_range :
-            if line.startswith('-----------  ') :
-                range_start=local_range.index(line)+1
-        range_end=len(local_range)
-        for line in local_vacancy :
-            if line.startswith('-----------  ') :
-                vacancy_start=local_vacancy.index(line)+1
-        vacancy_end=len(local_vacancy)-1
-
-        for i in range(range_start,range_end) :
-            total_range+=(local_range[i])
-        for i in range(vacancy_start,vacancy_end) :
-            total_vacancy+=(local_vacancy[i])
-    
-    file_range=open('total_range.txt','w')
-    file_range.write(total_range)
-    file_range.close()
-    
-    file_vacancy=open('total_vacancy.txt','w')
-    file_vacancy.write(total_vacancy)
-    file_vacancy.close()
+def _run_directories(directories=None):
+    """ Sorted directories holding both RANGE.txt and VACANCY.txt
+
+    :param directories: list of directories, glob pattern or None to walk the current directory
+    """
+    if directories is None:
+        directories = [x[0] for x in os.walk(os.getcwd())]
+    elif isinstance(directories, str):
+        directories = glob.glob(directories)
+    return sorted(
+        directory for directory in directories
+        if os.path.isfile(os.path.join(directory, 'RANGE.txt')) and
+        os.path.isfile(os.path.join(directory, 'VACANCY.txt'))
+    )
+
+
+def _read_plot_xmin(directory):
+    """ Plot depth Xmin [Ang] written in TRIM.IN of directory """
+    with open(os.path.join(directory, 'TRIM.IN')) as f:
+        for line in f:
+            if line.startswith('PlotType'):
+                return float(next(f).split()[1])
+    raise ValueError('no plot depths in {}'.format(os.path.join(directory, 'TRIM.IN')))
+
+
+def merge_results(directories=None, offsets=None, save_directory=None):
+    """ Concatenate the RANGE.txt and VACANCY.txt tables of step calculations
+
+    :param directories: run directories, glob pattern or None for all run directories below cwd
+    :param offsets: depth offset [Ang] added to each directory, 'plot_xmin' to read it from TRIM.IN or None
+    :param str save_directory: where total_range.txt, total_vacancy.txt and total.npz are written (defaults to cwd)
+
+    Rows of the merged tables are sorted by depth, the first column is
+    the depth. Returns the (total_range, total_vacancy) arrays.
+    """
+    directories = _run_directories(directories)
+    if not directories:
+        raise ValueError('no run directories to merge')
+    if offsets is None:
+        offsets = [0.0] * len(directories)
+    elif offsets == 'plot_xmin':
+        offsets = [_read_plot_xmin(directory) for directory in directories]
+    elif len(offsets) != len(directories):
+        raise ValueError('offsets must have one value per directory')
+
+    range_tables, vacancy_tables = [], []
+    for directory, offset in zip(directories, offsets):
+        local_range = Range(directory)
+        local_vacancy = Vacancy(directory)
+        range_tables.append(np.column_stack([
+            local_range.depth + offset, local_range.ions, local_range.elements]))
+        vacancy_tables.append(np.column_stack([
+            local_vacancy.depth + offset, local_vacancy.knock_ons, local_vacancy.vacancies]))
+
+    if (len({table.shape[1] for table in range_tables}) != 1 or
+            len({table.shape[1] for table in vacancy_tables}) != 1):
+        raise ValueError('directories have tables with different columns')
+
+    total_range = np.concatenate(range_tables)
+    total_range = total_range[np.argsort(total_range[:, 0], kind='stable')]
+    total_vacancy = np.concatenate(vacancy_tables)
+    total_vacancy = total_vacancy[np.argsort(total_vacancy[:, 0], kind='stable')]
+
+    if save_directory is None:
+        save_directory = os.getcwd()
+    np.savetxt(os.path.join(save_directory, 'total_range.txt'), total_range,
+               fmt='%.4E', header='  '.join(local_range.columns))
+    np.savetxt(os.path.join(save_directory, 'total_vacancy.txt'), total_vacancy,
+               fmt='%.4E', header='  '.join(local_vacancy.columns))
+    np.savez(os.path.join(save_directory, 'total.npz'),
+             range=total_range, vacancy=total_vacancy,
+             directories=np.array(directories), offsets=np.array(offsets, dtype=np.float64))
+    return total_range, total_vacancy
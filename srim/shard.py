@@ -0,0 +1,69 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Split a large TRIM calculation into independent seed shards
+
+Each ion of a TRIM calculation is independent, so a run of N ions can be
+replaced by K runs of about N/K ions with distinct random seeds. The
+tables of the shards are merged with Results.merge.
+"""
+import os
+import random
+
+from .srim import SRIM_DIRECTORY
+from .batch import BatchJob, BatchRunner
+from .output import Results
+
+
+def split_ions(number_ions, shards):
+    """ Split number_ions into shards sizes differing by at most one ion """
+    if shards < 1 or shards > number_ions:
+        raise ValueError('shards must be between 1 and number_ions')
+    size, remainder = divmod(number_ions, shards)
+    return [size + 1 if i < remainder else size for i in range(shards)]
+
+
+def shard_seeds(random_seed, shards):
+    """ Distinct random seeds of the shards, reproducible from random_seed """
+    return random.Random(random_seed).sample(range(100000), shards)
+
+
+def shard_jobs(srim, shards):
+    """ BatchJobs running the calculation of srim in shards
+
+    :param SRIM srim: calculation to split
+    :param int shards: number of sub-runs
+    """
+    jobs = []
+    sizes = split_ions(srim.number_ions, shards)
+    seeds = shard_seeds(srim.settings.random_seed, shards)
+    for i, (number_ions, seed) in enumerate(zip(sizes, seeds)):
+        settings = dict(srim.settings._settings)
+        settings.update({
+            'calculation': srim.calculation,
+            'number_ions': number_ions,
+            'random_seed': seed
+        })
+        jobs.append(BatchJob(srim.ion, srim.target, settings, name='shard-{:03d}'.format(i)))
+    return jobs
+
+
+def run_sharded(srim, shards, srim_directory=SRIM_DIRECTORY, save_directory=None,
+                max_workers=None, subbing=False, progress=None, executor=None):
+    """ Run srim as parallel shards and merge their tables
+
+    :param SRIM srim: calculation to run
+    :param int shards: number of sub-runs (defaults max_workers to shards)
+    :param str save_directory: folder receiving one shard-NNN directory per shard
+    :param Executor executor: picklable launcher of TRIM.exe passed to BatchRunner
+
+    Returns the merged Results, whose num_ions is the total number of
+    ions of all shards.
+    """
+    save_directory = save_directory or os.getcwd()
+    runner = BatchRunner(srim_directory, save_directory,
+                         max_workers=max_workers or shards,
+                         subbing=subbing, progress=progress, executor=executor)
+    results = runner.run(shard_jobs(srim, shards))
+    return Results.merge(results, directory=save_directory)
@@ -6,8 +6,9 @@
 
 """
 import os
-import subprocess
 import shutil
+import tempfile
+import warnings
 
 from .core.utils import (
     check_input,
@@ -17,12 +18,118 @@ from .core.utils import (
     is_quoteless
 )
 
-from .output import Results
+from .output import Results, SRResults
 from .input import AutoTRIM, TRIMInput, SRInput
+from .executor import WineExecutor, XvfbExecutor, DisplayExecutor
 
 
 SRIM_DIRECTORY = os.path.join(os.sep, 'tmp', 'srim')
 
+# Files and folders that SRIM writes during a run. These are never shared
+# between a sandbox and the SRIM installation it overlays.
+SANDBOX_PRIVATE_FILES = {
+    'TRIM.IN', 'TRIMAUTO', 'TRIM.DAT', 'SR.IN', 'SR_OUTPUT.txt',
+    'PHONON.txt', 'E2RECOIL.txt', 'IONIZ.txt', 'LATERAL.txt', 'NOVAC.txt',
+    'RANGE.txt', 'VACANCY.txt', 'BACKSCAT.txt', 'SPUTTER.txt', 'RANGE_3D.txt',
+    'TRANSMIT.txt', 'TRIMOUT.txt', 'COLLISON.txt', 'EXYZ.txt'
+}
+SANDBOX_PRIVATE_DIRECTORIES = {'SRIM Outputs', 'SRIM Restore'}
+
+
+def create_sandbox(srim_directory, sandbox_directory=None, link=True):
+    """ Create a private working directory for a single SRIM run
+
+    The SRIM installation is mirrored into the sandbox so that several
+    calculations can run side by side without sharing TRIM.IN, TRIMAUTO
+    or any of the output files.
+
+    :param str srim_directory: SRIM installation to overlay
+    :param str sandbox_directory: directory to create (defaults to new temporary directory)
+    :param bool link: symlink installation files (True) or copy them (False)
+
+    Files listed in SANDBOX_PRIVATE_FILES are never mirrored and the
+    folders in SANDBOX_PRIVATE_DIRECTORIES are created empty. Use
+    link=False if your SRIM version rewrites other files of its
+    installation while running.
+    """
+    if not os.path.isdir(srim_directory):
+        raise ValueError('srim_directory must be path')
+
+    srim_directory = os.path.abspath(srim_directory)
+    if sandbox_directory is None:
+        sandbox_directory = tempfile.mkdtemp(prefix='srim-')
+    else:
+        os.makedirs(sandbox_directory, exist_ok=True)
+
+    for root, directories, filenames in os.walk(srim_directory):
+        relative_root = os.path.relpath(root, srim_directory)
+        destination_root = os.path.normpath(os.path.join(sandbox_directory, relative_root))
+
+        for directory in list(directories):
+            os.makedirs(os.path.join(destination_root, directory), exist_ok=True)
+            if directory in SANDBOX_PRIVATE_DIRECTORIES:
+                directories.remove(directory)
+
+        for filename in filenames:
+            if filename in SANDBOX_PRIVATE_FILES:
+                continue
+            source = os.path.join(root, filename)
+            destination = os.path.join(destination_root, filename)
+            if os.path.lexists(destination):
+                continue
+            if link:
+                os.symlink(source, destination)
+            else:
+                shutil.copy2(source, destination)
+    return sandbox_directory
+
+
+def _run_directory(srim_directory, sandbox):
+    """ Directory where SRIM is launched: srim_directory or a new sandbox """
+    if sandbox:
+        if sandbox is True:
+            sandbox = None
+        return create_sandbox(srim_directory, sandbox)
+    return srim_directory
+
+
+def _executor(subbing, display=None, executor=None):
+    """ Executor of a run: executor, else wine on display, xvfb-run or plain wine """
+    if executor is not None:
+        return executor
+    if display is not None:
+        return DisplayExecutor(display)
+    if subbing:
+        return XvfbExecutor()
+    return WineExecutor()
+
+
+def _results(run_directory, sandbox):
+    """ Results of a run, read at once when run_directory is shared """
+    results = Results(run_directory)
+    if not sandbox:
+        results.load()
+    return results
+
+
+class SRIMRunError(Exception):
+    """ A SRIM program exited with a non zero status """
+    pass
+
+
+def _store(cache, srim, run_directory, status):
+    """ Store outputs of a successful TRIM run in cache, warn when the run failed """
+    if status == 0 and cache.store(srim, run_directory) is not None:
+        return
+    warnings.warn('TRIM failed in {} (exit status {}) or wrote no tables, '
+                  'outputs are not cached'.format(run_directory, status), RuntimeWarning)
+
+
+def _check_status(program, run_directory, status):
+    """ Raise SRIMRunError for a non zero exit status of program """
+    if status != 0:
+        raise SRIMRunError('{} exited with status {} in {}'.format(program, status, run_directory))
+
 
 class SRIMSettings(object):
     """ SRIM Settings
@@ -72,14 +179,14 @@ class SRIM(object):
         self.ion = ion
 
 
-    def _write_input_files(self):
+    def _write_input_files(self, directory='.'):
         """ Write necissary TRIM input files for calculation """
-        AutoTRIM().write()
-        TRIMInput(self).write()
+        AutoTRIM().write(directory)
+        TRIMInput(self).write(directory)
 
     @staticmethod
     def copy_output_files(src_directory, dest_directory, check_srim_output=True):
-        known_files = {'TRIM.IN', 'PHONON.txt', 'E2RECOIL.txt', 'IONIZ.txt','LATERAL.txt', 'NOVAC.txt', 'RANGE.txt', 'VACANCY.txt', 'BACKSCAT.txt', 'SPUTTER.txt', 'RANGE_3D.txt', 'TRANSMIT.txt', 'TRIMOUT.txt'}
+        known_files = {'TRIM.IN', 'PHONON.txt', 'E2RECOIL.txt', 'IONIZ.txt','LATERAL.txt', 'NOVAC.txt', 'RANGE.txt', 'VACANCY.txt', 'BACKSCAT.txt', 'SPUTTER.txt', 'RANGE_3D.txt', 'TRANSMIT.txt', 'TRIMOUT.txt', 'COLLISON.txt', 'EXYZ.txt'}
 
         if not os.path.isdir(src_directory):
             raise ValueError('src_directory must be path')
@@ -96,23 +203,65 @@ class SRIM(object):
                 shutil.copy(os.path.join(
                     src_directory, 'SRIM Outputs', known_file), dest_directory)
 
-    def run(self, srim_directory=SRIM_DIRECTORY, subbing=False):
-        current_directory = os.getcwd()
-        os.chdir(srim_directory)
-        self._write_input_files()
-        # Make sure compatible with Windows, OSX, and Linux
-        absolute_path=str(os.path.join('.', 'TRIM.exe'))
-        if subbing==False :
-            os.environ['WINEDEBUG']='-all'
-            subprocess.call(['wine',absolute_path])
-            #os.system('WINEDEBUG=-all wine %s'% str(os.path.join('.', 'TRIM.exe')))
-        if subbing==True :
-            os.environ['WINEDEBUG']='-all'
-            subprocess.call(['xvfb-run','-a',absolute_path,'2>/dev/null'])
-            #os.system('WINEDEBUG=-all xvfb-run %s'% str(os.path.join('.', 'TRIM.exe')))
-        os.chdir(current_directory)
-
-        return Results(srim_directory)
+    def _prepare_run(self, srim_directory, sandbox):
+        """ Create the run directory and write the input files in it """
+        run_directory = _run_directory(srim_directory, sandbox)
+        self._write_input_files(run_directory)
+        return run_directory
+
+    def run(self, srim_directory=SRIM_DIRECTORY, subbing=False, sandbox=False, cache=None, display=None, executor=None):
+        """ Run TRIM calculation
+
+        :param str srim_directory: SRIM installation directory
+        :param bool subbing: hide the TRIM window with xvfb-run
+        :param HeadlessDisplay display: run wine on this running display instead of xvfb-run
+        :param bool or str sandbox: run in a private copy of srim_directory
+        :param ResultCache cache: reuse outputs of identical calculations
+        :param Executor executor: launcher of TRIM.exe (see srim.executor), overrides subbing and display
+
+        With sandbox=True a new temporary directory is created for the
+        run, a string is used as the sandbox path. The returned
+        Results.directory holds the outputs, removing it is up to the
+        caller. The current working directory is never changed so runs
+        can be launched concurrently from threads.
+
+        On a cache hit the cached outputs are copied in the run
+        directory and TRIM is not launched. Outputs are only cached
+        when TRIM exits with status 0 and writes its tables, otherwise
+        a RuntimeWarning is issued. Without sandbox the tables
+        are read before returning since the next run overwrites them.
+        """
+        run_directory = self._prepare_run(srim_directory, sandbox)
+        if cache is None or not cache.restore(self, run_directory):
+            status = _executor(subbing, display, executor).run('TRIM.exe', run_directory)
+            if cache is not None:
+                _store(cache, self, run_directory, status)
+        return _results(run_directory, sandbox)
+
+    async def run_async(self, srim_directory=SRIM_DIRECTORY, subbing=False, sandbox=False, timeout=None, cache=None, display=None, executor=None):
+        """ Run TRIM calculation without blocking the event loop
+
+        :param float timeout: seconds before TRIM is killed and asyncio.TimeoutError raised
+
+        Cancelling the coroutine kills the whole wine/xvfb process
+        tree and removes a sandbox created for the run. Cache copies
+        and table reads run in the default executor. See SRIM.run for
+        the other parameters.
+        """
+        import asyncio
+        run_directory = self._prepare_run(srim_directory, sandbox)
+        loop = asyncio.get_running_loop()
+        if cache is not None and await loop.run_in_executor(None, cache.restore, self, run_directory):
+            return await loop.run_in_executor(None, _results, run_directory, sandbox)
+        try:
+            status = await _executor(subbing, display, executor).run_async('TRIM.exe', run_directory, timeout)
+        except BaseException:
+            if sandbox is True:
+                shutil.rmtree(run_directory, ignore_errors=True)
+            raise
+        if cache is not None:
+            await loop.run_in_executor(None, _store, cache, self, run_directory, status)
+        return await loop.run_in_executor(None, _results, run_directory, sandbox)
 
 
 class SRSettings(object):
@@ -136,22 +285,85 @@ class SR(object):
         self.layer = layer
         self.ion = ion
 
-    def  _write_input_file(self):
+    def  _write_input_file(self, directory='.'):
         """ Write necissary SR input file for calculation """
-        SRInput(self).write()
-
-    def run(self, srim_directory=SRIM_DIRECTORY):
-        current_directory = os.getcwd()
-        os.chdir(os.path.join(srim_directory, 'SR Module'))
-        self._write_input_file()
-        # Make sure compatible with Windows, OSX, and Linux
-        absolute_path=str(os.path.join('.', 'SRModule.exe'))
-        if subbing==False :
-            os.environ['WINEDEBUG']='-all'
-            subprocess.call(['wine',absolute_path])
-            #os.system('WINEDEBUG=-all wine %s'% str(os.path.join('.', 'SRModule.exe')))
-        if subbing==True :
-            os.environ['WINEDEBUG']='-all'
-            subprocess.call(['xvfb-run','-a',absolute_path,'2>/dev/null'])
-            #os.system('WINEDEBUG=-all xvfb-run %s'% str(os.path.join('.', 'SRModule.exe')))
-        os.chdir(current_directory)
+        SRInput(self).write(directory)
+
+    def _prepare_run(self, srim_directory, sandbox):
+        """ Create the run directory and write the input file in it """
+        run_directory = os.path.join(_run_directory(srim_directory, sandbox), 'SR Module')
+        self._write_input_file(run_directory)
+        return run_directory
+
+    def run(self, srim_directory=SRIM_DIRECTORY, subbing=False, sandbox=False, display=None, executor=None):
+        """ Run SR Module calculation and return its SRResults
+
+        See SRIM.run for the meaning of subbing, sandbox, display and executor. The table
+        is read at once so a sandbox created with sandbox=True is
+        removed before returning. SRIMRunError is raised when
+        SRModule.exe exits with a non zero status.
+        """
+        run_directory = self._prepare_run(srim_directory, sandbox)
+        try:
+            status = _executor(subbing, display, executor).run('SRModule.exe', run_directory)
+            _check_status('SRModule.exe', run_directory, status)
+            return SRResults(run_directory, self.settings.output_filename)
+        finally:
+            if sandbox is True:
+                shutil.rmtree(os.path.dirname(run_directory), ignore_errors=True)
+
+    async def run_async(self, srim_directory=SRIM_DIRECTORY, subbing=False, sandbox=False, timeout=None, display=None, executor=None):
+        """ Run SR Module calculation without blocking the event loop
+
+        See SRIM.run_async for the meaning of timeout
+        """
+        import asyncio
+        run_directory = self._prepare_run(srim_directory, sandbox)
+        try:
+            status = await _executor(subbing, display, executor).run_async('SRModule.exe', run_directory, timeout)
+            _check_status('SRModule.exe', run_directory, status)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, SRResults, run_directory, self.settings.output_filename)
+        finally:
+            if sandbox is True:
+                shutil.rmtree(os.path.dirname(run_directory), ignore_errors=True)
+
+
+def run_sr_batch(calculations, srim_directory=SRIM_DIRECTORY, subbing=False, executor=None):
+    """ Run many SR calculations one after the other in a single sandbox
+
+    :param list calculations: SR objects (or (layer, ion) tuples)
+
+    SRModule.exe reads one ion and one target per SR.IN, so each pair
+    still needs its own launch. The sandbox is created once and removed
+    at the end. Returns the SRResults in the order of calculations.
+    """
+    calculations = [calculation if isinstance(calculation, SR) else SR(*calculation)
+                    for calculation in calculations]
+    sandbox = _run_directory(srim_directory, True)
+    try:
+        return [calculation.run(sandbox, subbing=subbing, executor=executor) for calculation in calculations]
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+
+async def run_many_async(calculations, limit=None, **args):
+    """ Run SRIM or SR calculations concurrently from one event loop
+
+    :param list calculations: SRIM or SR objects
+    :param int limit: maximum number of calculations running at once (defaults to cpu count)
+
+    Remaining keyword arguments are passed to run_async, sandbox
+    defaults to True so that calculations do not share files. Results
+    are returned in the order of calculations.
+    """
+    import asyncio
+    args.setdefault('sandbox', True)
+    semaphore = asyncio.Semaphore(limit or os.cpu_count() or 1)
+
+    async def run(calculation):
+        async with semaphore:
+            return await calculation.run_async(**args)
+
+    return await asyncio.gather(*(run(calculation) for calculation in calculations))
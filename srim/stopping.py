@@ -0,0 +1,190 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Stopping power tables interpolated in Python
+
+SR Module is run once per ion and layer over its whole energy range,
+stopping and range queries are then log-log interpolations of that table.
+Tables are saved as .npz files and reused across processes.
+"""
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from .core.ion import Ion
+from .input import SRInput
+from .srim import SR, SRIM_DIRECTORY
+from .cache import default_cache_directory
+
+
+class StoppingTable(object):
+    """ Stopping and range of one ion in one layer
+
+    :param array energy: increasing ion energies [eV]
+    :param array electronic: electronic stopping [eV/Ang]
+    :param array nuclear: nuclear stopping [eV/Ang]
+    :param array projected_range: projected range [Ang]
+    :param dict metadata: description of the ion and layer
+
+    Queries outside of the energy range are clamped to the first or
+    last value of the table.
+    """
+    def __init__(self, energy, electronic, nuclear, projected_range, metadata=None):
+        self._energy = np.asarray(energy, dtype=np.float64)
+        self._electronic = np.asarray(electronic, dtype=np.float64)
+        self._nuclear = np.asarray(nuclear, dtype=np.float64)
+        self._projected_range = np.asarray(projected_range, dtype=np.float64)
+        self.metadata = dict(metadata or {})
+
+        if np.any(np.diff(self._energy) <= 0.0):
+            raise ValueError('energy must be strictly increasing')
+
+        self._log_energy = np.log(self._energy)
+        self._log_electronic = np.log(np.maximum(self._electronic, 1e-300))
+        self._log_nuclear = np.log(np.maximum(self._nuclear, 1e-300))
+        self._log_range = np.log(np.maximum(self._projected_range, 1e-300))
+
+        # Path length (continuous slowing down) from the trapezoidal rule
+        # of 1/S(E), the first energy is assumed stopped at E/S(E)
+        inverse = 1.0 / (self._electronic + self._nuclear)
+        path = np.concatenate([
+            [self._energy[0] * inverse[0]],
+            0.5 * np.diff(self._energy) * (inverse[1:] + inverse[:-1])
+        ])
+        self._path_length = np.cumsum(path)
+
+    @classmethod
+    def from_sr(cls, results, metadata=None):
+        """ Table from the SRResults of a SR Module run """
+        return cls(results.energy, results.electronic, results.nuclear,
+                   results.projected_range, metadata)
+
+    @classmethod
+    def compute(cls, ion, layer, energy_min=1.0e3, energy_max=None,
+                srim_directory=SRIM_DIRECTORY, subbing=False, cache_directory=None, executor=None):
+        """ Run SR Module once for ion in layer, or load the table from disk
+
+        :param Ion ion: ion (its energy is the maximum energy unless energy_max is given)
+        :param Layer layer: layer of the target
+        :param float energy_min: lowest energy [eV] of the table
+        :param str cache_directory: folder of saved tables (defaults to ~/.cache/pysrim/stopping, False disables it)
+        :param Executor executor: launcher of SRModule.exe (see srim.executor)
+
+        Tables are saved under the sha256 of the SR.IN input and of the
+        executor, after a successful run only. With an executor the
+        default cache is disabled, so fake or test tables never end up
+        next to the real SR Module ones.
+        """
+        if energy_max is not None:
+            ion = Ion(ion.symbol, energy_max, ion.mass)
+        sr = SR(layer, ion, energy_min=energy_min)
+
+        if cache_directory is None:
+            cache_directory = default_cache_directory('stopping') if executor is None else False
+        path = None
+        if cache_directory:
+            digest = hashlib.sha256(SRInput(sr).to_bytes())
+            if executor is not None:
+                digest.update('executor={!r}'.format(executor).encode('utf-8'))
+            key = digest.hexdigest()
+            path = os.path.join(cache_directory, key + '.npz')
+            if os.path.isfile(path):
+                return cls.load(path)
+
+        metadata = {
+            'ion': ion.symbol, 'mass': ion.mass,
+            'energy_min': energy_min, 'energy_max': ion.energy,
+            'layer': layer.name, 'density': layer.density,
+            'elements': {element.symbol: values['stoich'] for element, values in layer.elements.items()}
+        }
+        table = cls.from_sr(sr.run(srim_directory, subbing=subbing, sandbox=True, executor=executor), metadata)
+        if path:
+            os.makedirs(cache_directory, exist_ok=True)
+            table.save(path)
+        return table
+
+    def save(self, path):
+        """ Save table to a .npz file """
+        with open(path, 'wb') as f:
+            np.savez(f, energy=self._energy, electronic=self._electronic,
+                     nuclear=self._nuclear, projected_range=self._projected_range,
+                     metadata=np.array(json.dumps(self.metadata)))
+
+    @classmethod
+    def load(cls, path):
+        """ Load table saved with save """
+        with np.load(path) as data:
+            return cls(data['energy'], data['electronic'], data['nuclear'],
+                       data['projected_range'], json.loads(str(data['metadata'])))
+
+    def _interpolate(self, log_values, energy):
+        log_energy = np.log(np.asarray(energy, dtype=np.float64))
+        return np.exp(np.interp(log_energy, self._log_energy, log_values))
+
+    @property
+    def energy(self):
+        """ Energies [eV] of the table """
+        return self._energy
+
+    def electronic(self, energy):
+        """ Electronic stopping [eV/Ang] at energy [eV] """
+        return self._interpolate(self._log_electronic, energy)
+
+    def nuclear(self, energy):
+        """ Nuclear stopping [eV/Ang] at energy [eV] """
+        return self._interpolate(self._log_nuclear, energy)
+
+    def stopping(self, energy):
+        """ Total stopping dE/dx [eV/Ang] at energy [eV] """
+        return self.electronic(energy) + self.nuclear(energy)
+
+    def range(self, energy):
+        """ Projected range [Ang] at energy [eV] """
+        return self._interpolate(self._log_range, energy)
+
+    def path_length(self, energy):
+        """ Path length [Ang] travelled before stopping from energy [eV] """
+        return self._interpolate(np.log(self._path_length), energy)
+
+    def energy_after(self, energy, thickness):
+        """ Energy [eV] left after a straight path of thickness [Ang]
+
+        Ions that stop inside the layer have 0.0 energy.
+        """
+        remaining = self.path_length(energy) - np.asarray(thickness, dtype=np.float64)
+        stopped = remaining <= 0.0
+        log_remaining = np.log(np.where(stopped, self._path_length[0], remaining))
+        energy_out = np.exp(np.interp(log_remaining, np.log(self._path_length), self._log_energy))
+        return np.where(stopped, 0.0, energy_out)
+
+
+def target_tables(ion, target, **args):
+    """ StoppingTable of ion in each layer of target, see StoppingTable.compute """
+    return [StoppingTable.compute(ion, layer, **args) for layer in target.layers]
+
+
+def energy_through_target(tables, target, energy, angle=0.0):
+    """ Ion energy [eV] at the exit of each layer
+
+    :param list tables: StoppingTable of each layer (see target_tables)
+    :param Target target: target crossed by the ion
+    :param array energy: incident energies [eV]
+    :param float angle: incidence angle [degrees] from the target normal
+
+    Returns an array of shape (layers,) + energy.shape, ions stopped in
+    a layer have 0.0 energy from that layer on.
+    """
+    if len(tables) != len(target.layers):
+        raise ValueError('tables must have one StoppingTable per layer')
+
+    energy = np.asarray(energy, dtype=np.float64)
+    scale = 1.0 / np.cos(np.radians(angle))
+    energies = []
+    for table, layer in zip(tables, target.layers):
+        moving = energy > 0.0
+        energy = np.where(moving, table.energy_after(np.where(moving, energy, table.energy[0]), layer.width * scale), 0.0)
+        energies.append(energy)
+    return np.array(energies)
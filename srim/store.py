@@ -0,0 +1,200 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Binary archive of TRIM results
+
+export_results writes the tables of a Results and the run metadata
+(ion, settings, seed, target layers read from TRIM.IN) to a single .npz
+file, load_results gives back a Results without parsing any text.
+ResultStore keeps many such files keyed by the run parameters.
+"""
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+
+from .core.ion import Ion
+from .output import Results, TrimIn
+
+
+def _table_metadata(table):
+    """ Non array attributes of a SRIM_Output table """
+    ion = table.__dict__.get('_ion')
+    return {
+        'ion': None if ion is None else {'symbol': ion.symbol, 'energy': ion.energy, 'mass': ion.mass},
+        'num_ions': table.__dict__.get('_num_ions'),
+        'columns': table.__dict__.get('_columns')
+    }
+
+
+def export_results(results, path, metadata=None, compressed=False):
+    """ Write results tables and metadata to a .npz file
+
+    :param Results results: results to export (its TRIM.IN is read for metadata when present)
+    :param str path: file path or binary file object
+    :param dict metadata: json serializable values stored with the tables
+    :param bool compressed: use np.savez_compressed
+    """
+    # all arrays are packed in one float64 buffer, reading one zip
+    # member is much faster than reading one per array
+    arrays = []
+    tables = {}
+    offset = 0
+    for name in Results.tables:
+        table = getattr(results, name)
+        if table is None:
+            continue
+        tables[name] = _table_metadata(table)
+        tables[name]['arrays'] = {}
+        for key, value in table.__dict__.items():
+            if isinstance(value, np.ndarray):
+                tables[name]['arrays'][key] = (offset, value.shape)
+                arrays.append(np.ravel(value).astype(np.float64))
+                offset += value.size
+
+    run = {}
+    if results.directory and os.path.isfile(os.path.join(results.directory, 'TRIM.IN')):
+        run = TrimIn(results.directory).to_dict()
+    run.update(metadata or {})
+
+    save = np.savez_compressed if compressed else np.savez
+    save(path, data=np.concatenate(arrays) if arrays else np.empty(0),
+         metadata=np.array(json.dumps({'tables': tables, 'run': run})))
+
+
+def load_results(path, directory=None):
+    """ Results and run metadata saved by export_results
+
+    :param str directory: directory attribute of the returned Results
+
+    Returns (results, metadata), tables missing from the file are None.
+    """
+    with np.load(path) as data:
+        metadata = json.loads(str(data['metadata']))
+        buffer = data['data']
+
+    results = Results(directory)
+    for name in Results.tables:
+        table_metadata = metadata['tables'].get(name)
+        if table_metadata is None:
+            results._tables[name] = None
+            continue
+        table_type = Results._table_type(name)
+        table = table_type.__new__(table_type)
+        ion = table_metadata['ion']
+        table._ion = None if ion is None else Ion(ion['symbol'], ion['energy'], ion['mass'])
+        table._num_ions = table_metadata['num_ions']
+        if table_metadata['columns'] is not None:
+            table._columns = table_metadata['columns']
+        for key, (offset, shape) in table_metadata['arrays'].items():
+            size = int(np.prod(shape))
+            setattr(table, key, buffer[offset:offset + size].reshape(shape))
+        results._tables[name] = table
+    return results, metadata['run']
+
+
+class ResultStore(object):
+    """ Directory of exported runs indexed by their parameters
+
+    :param str directory: location of the store, created if needed
+
+    Each run is a <key>.npz file where key is the hash of its parameters
+    (any json serializable dict), index.json maps keys to parameters.
+    """
+    index_filename = 'index.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(os.path.join(directory, self.index_filename)) as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {}
+
+    @staticmethod
+    def key(parameters):
+        """ Hash of json serializable parameters """
+        return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, parameters):
+        return self.key(parameters) in self._index
+
+    def __iter__(self):
+        """ Iterate over the parameters of the stored runs """
+        return iter(self._index.values())
+
+    def add(self, results, parameters, metadata=None, flush=True):
+        """ Export results under parameters
+
+        With flush=False index.json is only written by flush(), which
+        is much faster when adding many runs.
+        """
+        key = self.key(parameters)
+        export_results(results, self._path(key), dict(metadata or {}, parameters=parameters))
+        self._index[key] = parameters
+        if flush:
+            self.flush()
+        return key
+
+    def flush(self):
+        """ Write index.json """
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False) as f:
+            json.dump(self._index, f)
+        os.replace(f.name, os.path.join(self.directory, self.index_filename))
+
+    def load(self, parameters):
+        """ (Results, metadata) of the run stored under parameters """
+        return load_results(self._path(self.key(parameters)))
+
+    def find(self, **conditions):
+        """ Parameters of the runs whose parameters contain all conditions """
+        return [parameters for parameters in self._index.values()
+                if all(parameters.get(name) == value for name, value in conditions.items())]
+
+    def load_all(self, **conditions):
+        """ List of (parameters, Results, metadata) of the runs matching conditions """
+        return [(parameters,) + self.load(parameters) for parameters in self.find(**conditions)]
+
+    @classmethod
+    def from_sweep(cls, save_directory, directory=None):
+        """ Store of the runs of a Sweep (see srim.sweep)
+
+        :param str save_directory: directory of the sweep (holding index.json)
+        :param str directory: location of the store (defaults to save_directory/store)
+
+        The parameters of a run are its varied fields and the base
+        calculation it was run with (under 'base'), both read from the
+        parameters.json of its directory, so sweeps over different
+        bases can share a store. Runs whose recorded specification is
+        not the one of index.json (computed under another base or
+        without parameters.json) are skipped. Runs already in the store
+        are not exported again.
+        """
+        from .sweep import INDEX_FILENAME, Sweep, load_index, load_parameters
+
+        with open(os.path.join(save_directory, INDEX_FILENAME)) as f:
+            sweep = Sweep(json.load(f)['base'], [])
+        store = cls(directory or os.path.join(save_directory, 'store'))
+        for run in load_index(save_directory):
+            try:
+                record = load_parameters(run['directory'])
+            except FileNotFoundError:
+                continue
+            if record.get('specification') != sweep.specification(run['parameters']):
+                continue
+            parameters = dict(record['parameters'], base=record['base'])
+            if parameters in store:
+                continue
+            store.add(Results(run['directory']), parameters, {'name': run['name']}, flush=False)
+        store.flush()
+        return store
@@ -0,0 +1,216 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Declarative sweeps over ion, layer and settings fields
+
+A sweep is a base calculation written as plain data and a set of field
+paths to vary::
+
+    base = {
+        'ion': {'identifier': 'Ne', 'energy': 1.0e6},
+        'layers': [{'elements': {'Zr': 1.0, 'O': 2.0}, 'density': 5.68, 'width': 1.0e4}],
+        'settings': {'number_ions': 1000, 'calculation': 2}
+    }
+    sweep = Sweep(base, {
+        'ion.energy': [1.0e6, 2.0e6],
+        'layers.0.width': [1.0e4, 2.0e4],
+        'layers.0.elements.O': [1.5, 2.0]
+    })
+    index = sweep.run('~/SRIM', 'zro2-scan', max_workers=4)
+
+Field paths are dot separated keys of base, integers index lists. Each
+configuration is saved in a directory named by the hash of its full
+specification (base with the fields applied) with a parameters.json
+file recording the base, the varied fields and the specification.
+Configurations whose parameters.json exists are skipped, a change of
+the base gives new directories. index.json lists all the
+configurations of the sweep. Jobs are expanded while the runs progress.
+"""
+import os
+import json
+import copy
+import hashlib
+import itertools
+
+from .srim import SRIM_DIRECTORY
+from .batch import BatchJob, BatchRunner
+from .core.ion import Ion
+from .core.layer import Layer
+from .core.target import Target
+
+
+PARAMETERS_FILENAME = 'parameters.json'
+INDEX_FILENAME = 'index.json'
+
+
+def set_field(data, path, value):
+    """ Set the field of nested dicts and lists data at dot separated path """
+    keys = path.split('.')
+    for key in keys[:-1]:
+        data = data[int(key)] if isinstance(data, list) else data.setdefault(key, {})
+    if isinstance(data, list):
+        data[int(keys[-1])] = value
+    else:
+        data[keys[-1]] = value
+
+
+def _layer(spec):
+    """ Layer from a dict of Layer arguments, 'formula' selects Layer.from_formula """
+    spec = dict(spec)
+    formula = spec.pop('formula', None)
+    if formula is not None:
+        return Layer.from_formula(formula, **spec)
+    return Layer(**spec)
+
+
+class Sweep(object):
+    """ Cartesian, zipped or explicit sweep over a base calculation
+
+    :param dict base: 'ion' (Ion arguments), 'layers' (list of Layer arguments) and 'settings' (SRIM arguments)
+    :param parameters: dict of field path to list of values, or list of {field path: value} dicts
+    :param str mode: 'product' (all combinations) or 'zip' (values taken together) for dict parameters
+    :param str prefix: prefix of the configuration directories
+    """
+    def __init__(self, base, parameters, mode='product', prefix='run'):
+        if mode not in {'product', 'zip'}:
+            raise ValueError('mode must be product or zip')
+        if mode == 'zip' and isinstance(parameters, dict):
+            if len({len(values) for values in parameters.values()}) > 1:
+                raise ValueError('zipped parameters must have the same number of values')
+        self.base = base
+        self.parameters = parameters
+        self.mode = mode
+        self.prefix = prefix
+
+    def __len__(self):
+        if not isinstance(self.parameters, dict):
+            return len(self.parameters)
+        lengths = [len(values) for values in self.parameters.values()]
+        if self.mode == 'zip':
+            return lengths[0] if lengths else 1
+        size = 1
+        for length in lengths:
+            size *= length
+        return size
+
+    def configurations(self):
+        """ Iterate over {field path: value} dicts of the sweep """
+        if not isinstance(self.parameters, dict):
+            return iter(self.parameters)
+        paths = list(self.parameters)
+        values = [self.parameters[path] for path in paths]
+        combine = itertools.product if self.mode == 'product' else zip
+        return (dict(zip(paths, combination)) for combination in combine(*values))
+
+    def name(self, configuration):
+        """ Directory name of a configuration, the hash of its specification
+
+        The name does not depend on the position of the configuration
+        so adding or reordering values keeps completed runs, and
+        changes with the base calculation.
+        """
+        specification = json.dumps(self.specification(configuration), sort_keys=True)
+        digest = hashlib.sha1(specification.encode('utf-8'))
+        return '{}-{}'.format(self.prefix, digest.hexdigest()[:12])
+
+    def record(self, configuration):
+        """ Content of the parameters.json of a configuration """
+        return {
+            'base': self.base,
+            'parameters': configuration,
+            'specification': self.specification(configuration)
+        }
+
+    def specification(self, configuration):
+        """ Base specification with the fields of configuration applied """
+        specification = copy.deepcopy(self.base)
+        for path, value in configuration.items():
+            set_field(specification, path, value)
+        return specification
+
+    def job(self, configuration):
+        """ BatchJob of a configuration """
+        specification = self.specification(configuration)
+        ion = Ion(**specification['ion'])
+        target = Target([_layer(layer) for layer in specification['layers']])
+        return BatchJob(ion, target, specification.get('settings'), name=self.name(configuration))
+
+    def _pending(self, save_directory=None):
+        """ Iterate over (index, configuration) not completed in save_directory, without repeats """
+        names = set()
+        for index, configuration in enumerate(self.configurations()):
+            name = self.name(configuration)
+            if name in names or (save_directory and
+                                 os.path.isfile(os.path.join(save_directory, name, PARAMETERS_FILENAME))):
+                continue
+            names.add(name)
+            yield index, configuration
+
+    def jobs(self, save_directory=None):
+        """ Iterate over (index, configuration, BatchJob) not completed in save_directory
+
+        Repeated configurations are yielded once.
+        """
+        for index, configuration in self._pending(save_directory):
+            yield index, configuration, self.job(configuration)
+
+    def run(self, srim_directory=SRIM_DIRECTORY, save_directory=None, max_workers=None,
+            subbing=False, progress=None, cache=None, executor=None):
+        """ Run the configurations not yet completed and write index.json
+
+        :param str save_directory: folder of the configuration directories (defaults to cwd)
+        :param callable progress: called as progress(done, total, job, results) after each job
+        :param Executor executor: launcher of TRIM.exe passed to BatchRunner
+
+        total counts distinct configurations, repeated ones run once.
+
+        Returns the index: one {'name', 'directory', 'parameters'} dict
+        per configuration of the sweep.
+        """
+        save_directory = os.path.abspath(save_directory or os.getcwd())
+        os.makedirs(save_directory, exist_ok=True)
+
+        # only names are computed to count the completed configurations,
+        # repeated configurations run (and count) once
+        total = len({self.name(configuration) for configuration in self.configurations()})
+        done = total - sum(1 for _ in self._pending(save_directory))
+        configurations = {}
+
+        def pending():
+            for _, configuration, job in self.jobs(save_directory):
+                configurations[job.name] = configuration
+                yield job
+
+        runner = BatchRunner(srim_directory, save_directory, max_workers=max_workers,
+                             subbing=subbing, cache=cache, executor=executor)
+        for _, job, results in runner.imap(pending()):
+            with open(os.path.join(results.directory, PARAMETERS_FILENAME), 'w') as f:
+                json.dump(self.record(configurations.pop(job.name)), f, sort_keys=True)
+            done += 1
+            if progress:
+                progress(done, total, job, results)
+
+        index = [{
+            'name': self.name(configuration),
+            'directory': self.name(configuration),
+            'parameters': configuration
+        } for configuration in self.configurations()]
+        with open(os.path.join(save_directory, INDEX_FILENAME), 'w') as f:
+            json.dump({'base': self.base, 'mode': self.mode, 'runs': index}, f, indent=1)
+        return index
+
+
+def load_parameters(directory):
+    """ parameters.json of a configuration directory (see Sweep.record) """
+    with open(os.path.join(directory, PARAMETERS_FILENAME)) as f:
+        return json.load(f)
+
+
+def load_index(save_directory):
+    """ Runs of index.json written by Sweep.run with absolute directories """
+    with open(os.path.join(save_directory, INDEX_FILENAME)) as f:
+        runs = json.load(f)['runs']
+    for run in runs:
+        run['directory'] = os.path.join(save_directory, run['directory'])
+    return runs
@@ -0,0 +1,524 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+""" Synthetic TRIM and SR Module output files
+
+The files have the layout of the SRIM-2013 outputs read by srim.output
+(headers, column headers, number formats, COLLISON.txt separators) with
+made up but smooth values: ions stop on a gaussian profile centered at
+0.6 of the target width, the damage peaks just before it. They exercise
+the run, copy and parse pipeline without wine or a SRIM installation,
+the numbers have no physical meaning.
+
+    write_tables('run', Ion('He', 1.0e6), target, num_ions=1000)
+    write_collisions('run/COLLISON.txt', Ion('He', 1.0e6), target, num_ions=10000)
+
+write_trim_outputs and write_sr_outputs read the TRIM.IN or SR.IN of a
+run directory, see executor.FakeExecutor.
+"""
+import os
+import re
+import math
+
+import numpy as np
+
+from .core.ion import Ion
+from .core.element import Element
+from .core.layer import Layer
+from .core.target import Target
+from .output import TrimIn
+
+
+AVOGADRO = 6.02214076e23
+
+_separator = chr(179)
+_equals = ' ' + '=' * 66 + '\r\n'
+sr_in_element_regex = re.compile(r'(\d+)\s+"[^"]*"\s+(\S+)\s+(\S+)')
+
+collision_summary_names = (
+    'Target Displacements', 'Replacement Collisions', 'Vacancies',
+    'Interstitials', 'Sputtered Atoms', 'Transmitted Atoms'
+)
+
+
+def _atoms(target):
+    """ (layer index, element, atomic fraction) of each target atom in TRIM.IN order """
+    return [(i, element, values['stoich'])
+            for i, layer in enumerate(target.layers)
+            for element, values in layer.elements.items()]
+
+
+def _atomic_density(layer):
+    """ Atoms per cm3 of layer """
+    mass = sum(element.mass * values['stoich'] for element, values in layer.elements.items())
+    return layer.density * AVOGADRO / mass
+
+
+def _calculation_name(calculation):
+    return 'Kinchin-Pease' if calculation == 1 else 'Full Cascade'
+
+
+def header(ion, target, num_ions, calculation=2):
+    """ Header common to the output tables (read by SRIM_Output._read_ion and _read_target) """
+    lines = [
+        _equals,
+        ' ==============  SRIM-2013.00  ================================\r\n',
+        _equals,
+        '                      TRIM Calc. ({})\r\n'.format(_calculation_name(calculation)),
+        ' Ion = {}   Energy = {:g} keV\r\n'.format(ion.symbol, ion.energy / 1.0e3),
+        ' ============= TARGET MATERIAL ======================================\r\n'
+    ]
+    for i, layer in enumerate(target.layers, 1):
+        mass_total = sum(element.mass * values['stoich'] for element, values in layer.elements.items())
+        lines.append('Layer {:>2} : {}\r\n'.format(i, layer.name))
+        lines.append('Layer Width = {:>10.0f}.E+00 A ;\r\n'.format(layer.width))
+        lines.append('  Layer #{:>2}- Density = {:.4E} atoms/cm3 = {:g} g/cm3\r\n'.format(
+            i, _atomic_density(layer), layer.density))
+        for element, values in layer.elements.items():
+            lines.append('  Layer #{:>2}- {:<2} = {:.1f}  Atomic Percent = {:.1f}  Mass Percent\r\n'.format(
+                i, element.symbol, 100.0 * values['stoich'],
+                100.0 * element.mass * values['stoich'] / mass_total))
+    lines.append(' ' + '=' * 68 + '\r\n')
+    lines.append(' Total Ions calculated ={:09.2f}\r\n'.format(num_ions))
+    return ''.join(lines)
+
+
+def _table(column_headers, data):
+    """ Column headers, line of dashes and rows of a (rows, columns) array
+
+    column_headers holds the header lines of each column, centered
+    above its dashes.
+    """
+    num_columns = data.shape[1]
+    row_format = '%-12.2f' + '  '.join(['%.4E'] * (num_columns - 1)) + '\r\n'
+    rows = ''.join(row_format % tuple(row) for row in data.tolist())
+    lines = ['\r\n', ' ' + '=' * 49 + '\r\n']
+    for words in zip(*column_headers):
+        lines.append('  '.join('{:^11}'.format(word) for word in words).rstrip() + '\r\n')
+    lines.append('  '.join(['-----------'] * num_columns) + '\r\n')
+    return ''.join(lines) + rows
+
+
+def _profiles(target, num_ions, bins, rng):
+    """ Depth bins and normalized ion, damage and atom fraction profiles """
+    width = target.width
+    depth = width * np.arange(1, bins + 1) / bins
+    projected_range = 0.6 * width
+    straggling = 0.08 * width
+
+    stopped = np.exp(-0.5 * ((depth - projected_range) / straggling) ** 2)
+    stopped /= straggling * math.sqrt(2.0 * math.pi)
+    damage = np.exp(-0.5 * ((depth - 0.9 * projected_range) / (1.2 * straggling)) ** 2) + 0.05
+    damage /= damage.sum() * width / bins
+    slowing = np.clip(1.0 - 0.5 * depth / projected_range, 0.0, None)
+
+    # atomic fraction of each atom in every bin (0 outside its layer)
+    atoms = _atoms(target)
+    fractions = np.zeros((bins, len(atoms)))
+    boundaries = np.cumsum([layer.width for layer in target.layers])
+    layer_index = np.minimum(np.searchsorted(boundaries, depth - 1e-9 * width), len(target.layers) - 1)
+    for column, (i, _, fraction) in enumerate(atoms):
+        fractions[layer_index == i, column] = fraction
+
+    def noisy(values):
+        noise = rng.normal(1.0, 1.0 / math.sqrt(max(num_ions, 1)), values.shape)
+        return np.clip(values * noise, 0.0, None)
+
+    return depth, stopped, damage, slowing, fractions, noisy
+
+
+def write_tables(directory, ion, target, num_ions=1000, calculation=2, bins=100, seed=None):
+    """ Write IONIZ, VACANCY, NOVAC, E2RECOIL, PHONON and RANGE tables
+
+    :param str directory: folder receiving the files
+    :param Ion ion: incident ion
+    :param Target target: target of the calculation
+    :param int num_ions: number of ions of the header (scales the noise)
+    :param int calculation: 1 writes a Kinchin-Pease NOVAC.txt without table
+    :param int bins: number of depth bins (TRIM always uses 100)
+    :param int seed: seed of the noise
+
+    Returns the list of written filenames.
+    """
+    rng = np.random.default_rng(seed)
+    depth, stopped, damage, slowing, fractions, noisy = _profiles(target, num_ions, bins, rng)
+    energy = ion.energy
+    symbols = [element.symbol for _, element, _ in _atoms(target)]
+    head = header(ion, target, num_ions, calculation)
+
+    tables = {
+        'IONIZ.txt': (
+            [('TARGET', 'DEPTH', '(Ang.)'), ('IONIZ.', 'by IONS', 'eV/(Ang-Ion)'),
+             ('IONIZ.', 'by RECOILS', 'eV/(Ang-Ion)')],
+            [depth, noisy(0.9 * energy * slowing / target.width), noisy(0.04 * energy * damage)]),
+        'VACANCY.txt': (
+            [('TARGET', 'DEPTH', '(Ang.)'), ('VAC/Ang', 'by', 'IONS')] +
+            [('VAC/Ang', symbol, 'RECOILS') for symbol in symbols],
+            [depth, noisy(2.0e-4 * energy * damage / 25.0)] +
+            list(noisy(0.04 * energy * damage[:, None] * fractions / 25.0).T)),
+        'E2RECOIL.txt': (
+            [('DEPTH', '(Ang.)'), ('Energy from', 'IONS')] + [('Energy', symbol) for symbol in symbols],
+            [depth, noisy(0.05 * energy * damage)] +
+            list(noisy(0.04 * energy * damage[:, None] * fractions).T)),
+        'PHONON.txt': (
+            [('DEPTH', '(Ang.)'), ('PHONONS', 'by IONS'), ('PHONONS', 'by RECOILS')],
+            [depth, noisy(0.01 * energy * damage), noisy(0.03 * energy * damage)]),
+        'RANGE.txt': (
+            [('DEPTH', '(Ang.)'), (ion.symbol, 'Ions')] + [(symbol, 'Recoils') for symbol in symbols],
+            [depth, noisy(1.0e8 * stopped)] +
+            list(noisy(2.0e6 * damage[:, None] * fractions).T)),
+    }
+    if calculation != 1:
+        tables['NOVAC.txt'] = (
+            [('DEPTH', '(Ang.)'), ('Number', 'Replac.')],
+            [depth, noisy(4.0e-5 * energy * damage / 25.0)])
+
+    filenames = []
+    for filename, (column_headers, columns) in tables.items():
+        with open(os.path.join(directory, filename), 'w', encoding='latin-1', newline='') as f:
+            f.write(head)
+            f.write(_table(column_headers, np.column_stack(columns)))
+            if filename == 'VACANCY.txt':
+                f.write('\r\n To convert to Energy Lost - multiply by Average Binding Energy =  3 eV/Vacancy\r\n')
+        filenames.append(filename)
+
+    if calculation == 1:
+        with open(os.path.join(directory, 'NOVAC.txt'), 'w', encoding='latin-1', newline='') as f:
+            f.write(head)
+            f.write('\r\n Recoil/Damage Calculations made with Kinchin-Pease Estimates\r\n')
+        filenames.append('NOVAC.txt')
+    return filenames
+
+
+def _collision_line(label, values, end):
+    return _separator.join(['', label] + values + [end, '\r\n'])
+
+
+def _ion_collisions(number, count, ion, target, atoms, collisions, cascades, recoils, totals, rng):
+    """ Text of one ion of COLLISON.txt
+
+    number is the ion number written in the text, count the number of
+    ions so far and totals accumulates the ion summaries.
+    """
+    label = number.rjust(7, '0')
+    width = target.width
+    boundaries = np.cumsum([layer.width for layer in target.layers])
+    depth = np.sort(rng.uniform(0.0, 1.0, collisions)) * rng.normal(0.6, 0.08) * width
+    energy = ion.energy / 1.0e3 * (1.0 - depth / depth[-1] * rng.uniform(0.95, 1.0))
+    lateral = np.cumsum(rng.normal(0.0, 0.01 * width / math.sqrt(collisions), (collisions, 2)), axis=0)
+    recoil_energy = rng.exponential(200.0, collisions)
+    layers = np.minimum(np.searchsorted(boundaries, depth), len(target.layers) - 1)
+    stopping = ion.energy / max(depth[-1], 1.0)
+
+    lines = [
+        '  Ion    Energy     Depth      Lateral-Distance    Stopping   Atom Recoil Energy   Target\r\n',
+        ' Numb     (keV)       X(A)       Y(A)      Z(A)      Power     Hit     (eV)      DISP.\r\n',
+        '-' * 90 + '\r\n'
+    ]
+    summary = np.zeros(6)
+    for k in range(collisions):
+        choices = [a for a in atoms if a[0] == layers[k]] or atoms
+        atom = choices[rng.integers(len(choices))][1]
+        values = ['{:.2E}'.format(energy[k]), '{:.2E}'.format(depth[k]),
+                  '{:.2E}'.format(lateral[k, 0]), '{:.2E}'.format(lateral[k, 1]),
+                  '{:^9.2f}'.format(stopping), ' {:<2} '.format(atom.symbol),
+                  '{:.2E}'.format(recoil_energy[k])]
+        if cascades and recoil_energy[k] > 100.0:
+            num_recoils = 1 + rng.integers(recoils)
+            vacancies = rng.integers(0, 2, num_recoils)
+            replacements = (1 - vacancies) * rng.integers(0, 2, num_recoils)
+            position = np.array([depth[k], lateral[k, 0], lateral[k, 1]])
+            lines.append(_collision_line(label, values, ' <== Start of New Cascade  '))
+            lines.append('=' * 60 + '\r\n')
+            lines.append('  Recoil Atom Energy(eV)   X (A)      Y (A)      Z (A)   Vac Repl Ion Numb {}=\r\n'.format(number))
+            for r in range(num_recoils):
+                recoil_position = position + rng.normal(0.0, 20.0, 3)
+                recoil_atom = choices[rng.integers(len(choices))][1]
+                lines.append('{} {:04d}  {:>2}  {:.3E}  {:.3E}  {:.3E}  {:.3E}  {:d}  {:d} {}\r\n'.format(
+                    _separator, r + 1, recoil_atom.atomic_number,
+                    recoil_energy[k] * rng.uniform(0.0, 1.0), recoil_position[0],
+                    recoil_position[1], recoil_position[2], vacancies[r], replacements[r], _separator))
+            lines.append('=' * 60 + '\r\n')
+            counts = [num_recoils, int(vacancies.sum()), int(replacements.sum()),
+                      int(vacancies.sum())]
+            lines.append(_separator.join(['', ' Summary ', ' {} '.format(atom.symbol)] +
+                                         [' {} '.format(count) for count in counts] + ['\r\n']))
+            summary[:4] += counts[0], counts[2], counts[1], counts[3]
+        else:
+            displaced = int(recoil_energy[k] > 25.0)
+            lines.append(_collision_line(label, values, '  {:>3d}'.format(displaced)))
+            summary[0] += displaced
+            summary[2] += displaced
+
+    totals += summary
+    lines.append('=' * 120 + '\r\n')
+    lines.append(' Summary of Ion # {}\r\n'.format(number))
+    for name, total, average in zip(collision_summary_names, summary, totals / count):
+        lines.append(' Total {} = {:.0f}  Average = {:.2f}\r\n'.format(name, total, average))
+    lines.append('=' * 120 + '\r\n')
+    lines.append(' \r\n')
+    return ''.join(lines)
+
+
+def write_collisions(filename, ion, target, num_ions=1000, collisions_per_ion=50,
+                     cascades=True, recoils_per_cascade=10, seed=None, size=None, distinct_ions=None):
+    """ Write a COLLISON.txt file of num_ions ions
+
+    :param int collisions_per_ion: mean number of collisions of an ion
+    :param bool cascades: write full cascades (recoil tables) as TRIM full cascade calculations do
+    :param int recoils_per_cascade: maximum number of recoils of a cascade
+    :param int seed: seed of the generated values
+    :param int size: write ions until the file reaches size bytes instead of num_ions ions
+    :param int distinct_ions: generate only this many ions and repeat them with new ion numbers
+
+    The file grows linearly with the number of ions, about 0.5 kB per
+    collision with cascades. Generating every ion writes about 10 MB/s,
+    repeating distinct_ions ions is fast enough for multi GB files.
+    Returns the size of the file.
+    """
+    rng = np.random.default_rng(seed)
+    atoms = _atoms(target)
+    totals = np.zeros(6)
+    templates = []
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        written = f.write(''.join([
+            ' ' + '=' * 78 + '\r\n',
+            ' COLLISION DETAILS  (SRIM-2013.00) : TRIM Calc. ({})\r\n'.format(
+                _calculation_name(2 if cascades else 1)),
+            ' Ion = {}   Energy = {:g} keV\r\n'.format(ion.symbol, ion.energy / 1.0e3),
+            ' ' + '=' * 78 + '\r\n',
+            ' \r\n']))
+        ion_number = 0
+        while written < size if size is not None else ion_number < num_ions:
+            ion_number += 1
+            if distinct_ions and len(templates) == distinct_ions:
+                # ion numbers of a template are the placeholder \0 (padded with zeros in collision lines)
+                text = templates[(ion_number - 1) % distinct_ions]
+                text = text.replace('000000\0', '{:07d}'.format(ion_number)).replace('\0', str(ion_number))
+            else:
+                collisions = max(1, int(rng.poisson(collisions_per_ion)))
+                number = '\0' if distinct_ions else str(ion_number)
+                text = _ion_collisions(number, ion_number, ion, target, atoms, collisions,
+                                       cascades, recoils_per_cascade, totals, rng)
+                if distinct_ions:
+                    templates.append(text)
+                    text = text.replace('000000\0', '{:07d}'.format(ion_number)).replace('\0', str(ion_number))
+            written += f.write(text)
+    return written
+
+
+kinetics_files = {
+    'TRANSMIT.txt': ('T', 'transmitted ions or atoms'),
+    'BACKSCAT.txt': ('B', 'backscattered ions'),
+    'SPUTTER.txt': ('S', 'sputtered atoms'),
+}
+
+
+def write_kinetics(filename, ion, target, num_particles=1000, seed=None):
+    """ Write a TRANSMIT.txt, BACKSCAT.txt or SPUTTER.txt file (chosen by basename) of num_particles lines """
+    prefix, particles = kinetics_files[os.path.basename(filename)]
+    rng = np.random.default_rng(seed)
+    atoms = np.array([element.atomic_number for _, element, _ in _atoms(target)])
+    data = np.column_stack([
+        np.arange(1, num_particles + 1),
+        rng.choice(atoms, num_particles) if prefix == 'S' else np.full(num_particles, ion.atomic_number),
+        rng.uniform(0.0, ion.energy, num_particles),
+        np.full(num_particles, target.width if prefix == 'T' else 0.0),
+        rng.normal(0.0, 0.02 * target.width, (num_particles, 2)),
+        rng.uniform(0.0, 1.0, num_particles) * (1.0 if prefix == 'T' else -1.0),
+        rng.uniform(-1.0, 1.0, (num_particles, 2))
+    ])
+    # the lateral positions are glued to each other as in TRIM outputs
+    row_format = prefix + '%7d %3d %10.4E %10.4E%10.3E%10.3E %7.4f %7.4f %7.4f\r\n'
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        f.write(' ==========\r\n  SRIM-2013.00\r\n')
+        f.write('  This file tabulates the kinetics of {}.\r\n'.format(particles))
+        f.write(' Ion  Atom   Energy        Depth       Lateral-Position          Atom Direction\r\n')
+        f.write(' Numb Numb    (eV)          X(A)        Y(A)       Z(A)       Cos(X)  Cos(Y)  Cos(Z)\r\n')
+        f.write(''.join(row_format % tuple(row) for row in data.tolist()))
+
+
+def write_positions(filename, ion, target, num_ions=1000, points_per_ion=10, seed=None):
+    """ Write a RANGE_3D.txt (final positions) or EXYZ.txt (points_per_ion trajectory points) file """
+    rng = np.random.default_rng(seed)
+    width = target.width
+    if os.path.basename(filename) == 'EXYZ.txt':
+        rows = num_ions * points_per_ion
+        fraction = np.tile(np.arange(1, points_per_ion + 1) / points_per_ion, num_ions)
+        data = np.column_stack([
+            np.repeat(np.arange(1, num_ions + 1), points_per_ion),
+            ion.energy / 1.0e3 * (1.0 - fraction),
+            0.6 * width * fraction * rng.normal(1.0, 0.05, rows),
+            rng.normal(0.0, 0.02 * width, (rows, 2)) * fraction[:, None],
+            rng.uniform(5.0, 50.0, rows),
+            rng.exponential(5.0, rows)
+        ])
+        title = ' Ion     Energy       Depth (X)      Lateral Y      Lateral Z    Electronic   Energy lost to\r\n' \
+                ' Number  (keV)        (Angstrom)     (Angstrom)     (Angstrom)   Stop.(eV/A)  Last Recoil(eV)\r\n' \
+                '------- -----------  ------------  ------------  ------------  -----------  -----------\r\n'
+        row_format = '%07d %.5E  %.6E  %12.5E  %12.5E  %.4E  %.4E\r\n'
+    else:
+        data = np.column_stack([
+            np.arange(1, num_ions + 1),
+            rng.normal(0.6, 0.08, num_ions) * width,
+            rng.normal(0.0, 0.02 * width, (num_ions, 2))
+        ])
+        title = ' Ion      Depth (X)     Lateral Y     Lateral Z\r\n' \
+                'Number   (Angstrom)    (Angstrom)    (Angstrom)\r\n' \
+                '-------  -----------  -----------  -----------\r\n'
+        # negative lateral positions are glued to the previous column
+        row_format = '%07d  %.5E %11.4E%11.4E\r\n'
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        f.write(' =====\r\n {}\r\n'.format(os.path.splitext(os.path.basename(filename))[0]))
+        f.write(title)
+        f.write(''.join(row_format % tuple(row) for row in data.tolist()))
+
+
+def target_from_trim_in(trim_in):
+    """ Target described by a TrimIn """
+    atoms = trim_in.atoms
+    energies = list(zip(trim_in.displacement_energies, trim_in.lattice_energies, trim_in.surface_energies))
+    layers = []
+    for layer in trim_in.layers:
+        elements = {}
+        for (symbol, _, mass), stoich, (e_disp, lattice, surface) in zip(atoms, layer['stoich'], energies):
+            if stoich > 0.0:
+                elements[Element(symbol, mass=mass)] = {
+                    'stoich': stoich, 'E_d': e_disp, 'lattice': lattice, 'surface': surface}
+        layers.append(Layer(elements, layer['density'], layer['width'],
+                            phase=layer.get('phase', 0), name=layer['name']))
+    return Target(layers)
+
+
+def write_trim_outputs(directory, bins=100, collisions_per_ion=50, recoils_per_cascade=10, seed=None):
+    """ Write the outputs of the TRIM.IN of directory
+
+    The tables are always written, COLLISON.txt and the per particle
+    files (TRANSMIT, BACKSCAT, SPUTTER, RANGE_3D, EXYZ) when TRIM.IN
+    requests them. seed defaults to the random seed of TRIM.IN.
+    Returns the list of written filenames.
+    """
+    trim_in = TrimIn(directory)
+    target = target_from_trim_in(trim_in)
+    seed = trim_in.random_seed if seed is None else seed
+    filenames = write_tables(directory, trim_in.ion, target, trim_in.number_ions,
+                             trim_in.calculation, bins, seed)
+    if trim_in.settings['collisions']:
+        write_collisions(os.path.join(directory, 'COLLISON.txt'), trim_in.ion, target,
+                         trim_in.number_ions, collisions_per_ion,
+                         trim_in.calculation == 2, recoils_per_cascade, seed)
+        filenames.append('COLLISON.txt')
+
+    settings = trim_in.settings
+    requested = [('TRANSMIT.txt', 'transmit'), ('BACKSCAT.txt', 'backscattered'), ('SPUTTER.txt', 'sputtered')]
+    for filename, setting in requested:
+        if settings[setting]:
+            write_kinetics(os.path.join(directory, filename), trim_in.ion, target,
+                           max(1, trim_in.number_ions // 10), seed)
+            filenames.append(filename)
+    for filename, setting in [('RANGE_3D.txt', 'ranges'), ('EXYZ.txt', 'exyz')]:
+        if settings[setting]:
+            write_positions(os.path.join(directory, filename), trim_in.ion, target, trim_in.number_ions, seed=seed)
+            filenames.append(filename)
+    return filenames
+
+
+def _length(value):
+    """ Length [Ang] with the unit chosen by SR Module """
+    if value < 1.0e4:
+        return '{:.2f} A '.format(value)
+    if value < 1.0e7:
+        return '{:.2f} um'.format(value / 1.0e4)
+    return '{:.2f} mm'.format(value / 1.0e7)
+
+
+def write_sr_output(filename, ion, layer, energy_min=1.0e3, points=100):
+    """ Write a SR_OUTPUT.txt table from energy_min to the ion energy [eV]
+
+    Stopping is written in eV / Angstrom whatever the output units, the
+    conversions to the other units are listed at the bottom of the file.
+    """
+    atomic_density = _atomic_density(layer)
+    energy = np.geomspace(energy_min, max(ion.energy, energy_min), points)
+    electronic = 5.0 * ion.atomic_number ** (7.0 / 6.0) * np.sqrt(energy / 1.0e3 / ion.mass) / \
+        (1.0 + (energy / (2.0e5 * ion.mass)) ** 1.2)
+    reduced = energy / (1.0e3 * ion.mass)
+    nuclear = 2.0 * ion.atomic_number * np.log1p(1.2 * reduced) / (1.0 + reduced)
+    stopping = electronic + nuclear
+    # projected range of the continuous slowing down approximation
+    steps = np.diff(energy, prepend=0.0) / stopping
+    projected = np.cumsum(steps) * 0.8
+
+    lines = [
+        ' ==================================================================\r\n',
+        '              SRIM version ---> SRIM-2013.00\r\n',
+        ' ==================================================================\r\n\r\n',
+        ' Disk File Name = {}\r\n\r\n'.format(os.path.basename(filename)),
+        ' Ion = {} [{}] , Mass = {:.3f} amu\r\n\r\n'.format(ion.name, ion.atomic_number, ion.mass),
+        ' Target Density =  {:.4E} g/cm3 = {:.4E} atoms/cm3\r\n'.format(layer.density, atomic_density),
+        ' ======= Target  Composition ========\r\n',
+        '    Atom   Atom   Atomic    Mass     \r\n',
+        '    Name   Numb   Percent   Percent  \r\n',
+        '    ----   ----   -------   -------  \r\n'
+    ]
+    mass_total = sum(element.mass * values['stoich'] for element, values in layer.elements.items())
+    for element, values in layer.elements.items():
+        lines.append('    {:>3}    {:>3}    {:06.2f}    {:06.2f}   \r\n'.format(
+            element.symbol, element.atomic_number, 100.0 * values['stoich'],
+            100.0 * element.mass * values['stoich'] / mass_total))
+    lines += [
+        ' ====================================\r\n',
+        ' Bragg Correction = 0.00%\r\n',
+        ' Stopping Units =  eV / Angstrom \r\n',
+        ' See bottom of Table for other Stopping units \r\n\r\n',
+        '   Ion        dE/dx      dE/dx     Projected  Longitudinal   Lateral\r\n',
+        '  Energy      Elec.      Nuclear     Range     Straggling   Straggling\r\n',
+        '-----------  ---------- ---------- ----------  ----------  ----------\r\n'
+    ]
+    for e, s_e, s_n, r in zip(energy, electronic, nuclear, projected):
+        e_text = '{:.2f} keV'.format(e / 1.0e3) if e < 1.0e6 else '{:.2f} MeV'.format(e / 1.0e6)
+        lines.append('{:<10}  {:.3E}  {:.3E}  {:>10}  {:>10}  {:>10}\r\n'.format(
+            e_text, s_e, s_n, _length(r), _length(0.2 * r), _length(0.15 * r)))
+
+    per_mass = 1.0e-1 / layer.density
+    lines += [
+        '-----------------------------------------------------------\r\n',
+        ' Multiply Stopping by        for Stopping Units\r\n',
+        ' -------------------        ------------------\r\n',
+        '  {:.4E}                 eV / Angstrom \r\n'.format(1.0),
+        '  {:.4E}                keV / micron   \r\n'.format(10.0),
+        '  {:.4E}                MeV / mm       \r\n'.format(10.0),
+        '  {:.4E}                keV / (ug/cm2) \r\n'.format(per_mass),
+        '  {:.4E}                MeV / (mg/cm2) \r\n'.format(per_mass),
+        '  {:.4E}                keV / (mg/cm2) \r\n'.format(1.0e3 * per_mass),
+        '  {:.4E}                eV / (1E15 atoms/cm2) \r\n'.format(1.0e23 / atomic_density),
+        '(C) 1984,1989,1992,1998,2008 by J.P. Biersack and J.F. Ziegler\r\n'
+    ]
+    with open(filename, 'w', encoding='latin-1', newline='') as f:
+        f.write(''.join(lines))
+
+
+def read_sr_in(directory):
+    """ Ion, layer, minimum energy [eV] and output filename of the SR.IN of directory """
+    with open(os.path.join(directory, 'SR.IN')) as f:
+        lines = [line.strip() for line in f]
+    output_filename = lines[2]
+    z, mass = lines[4].split()
+    phase, density, _ = lines[6].split()
+    num_elements = int(lines[8])
+    elements = {}
+    for line in lines[10:10 + num_elements]:
+        element_z, stoich, element_mass = sr_in_element_regex.match(line).groups()
+        elements[Element(int(element_z), mass=float(element_mass))] = float(stoich)
+    energy_min, energy_max = lines[10 + num_elements + 3].split()
+    ion = Ion(int(z), 1.0e3 * float(energy_max), float(mass))
+    layer = Layer(elements, float(density), 1.0, phase=int(phase))
+    return ion, layer, 1.0e3 * float(energy_min), output_filename
+
+
+def write_sr_outputs(directory, points=100):
+    """ Write the output table of the SR.IN of directory, returns its filename """
+    ion, layer, energy_min, output_filename = read_sr_in(directory)
+    write_sr_output(os.path.join(directory, output_filename), ion, layer, energy_min, points)
+    return output_filename
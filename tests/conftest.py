@@ -0,0 +1,60 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import pytest
+
+from srim import synthetic
+from srim.srim import SRIM
+from srim.input import TRIMInput
+from srim.executor import FakeExecutor
+from srim.core.ion import Ion
+from srim.core.layer import Layer
+from srim.core.target import Target
+
+
+class CountingExecutor(FakeExecutor):
+    """ FakeExecutor counting its runs (in the current process only) """
+    def __init__(self, **args):
+        super(CountingExecutor, self).__init__(**args)
+        self.runs = 0
+
+    def run(self, program, directory):
+        self.runs += 1
+        return super(CountingExecutor, self).run(program, directory)
+
+
+@pytest.fixture
+def ion():
+    return Ion('He', 1.0e6)
+
+
+@pytest.fixture
+def target():
+    return Target([
+        Layer.from_formula('ZrO2', 5.68, 4.0e4, name='oxide'),
+        Layer({'Zr': 1.0}, 6.5, 2.0e4, name='metal')
+    ])
+
+
+@pytest.fixture
+def srim_directory(tmp_path):
+    """ Empty SRIM installation, enough for FakeExecutor runs """
+    directory = tmp_path / 'SRIM'
+    (directory / 'SR Module').mkdir(parents=True)
+    return str(directory)
+
+
+@pytest.fixture
+def executor():
+    return CountingExecutor()
+
+
+@pytest.fixture
+def run_directory(tmp_path, ion, target):
+    """ Run directory with TRIM.IN and the tables of 1000 ions """
+    directory = tmp_path / 'run'
+    directory.mkdir()
+    TRIMInput(SRIM(target, ion, calculation=2, number_ions=1000, random_seed=7)).write(str(directory))
+    synthetic.write_tables(str(directory), ion, target, num_ions=1000, bins=100, seed=7)
+    return str(directory)
@@ -0,0 +1,100 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+
+import pytest
+
+from srim.srim import SRIM, SR, run_many_async
+from srim.executor import CommandExecutor
+
+pytestmark = pytest.mark.skipif(not os.path.isdir('/proc'), reason='needs /proc to check processes')
+
+
+def _alive(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def _hanging_executor(pid_file):
+    """ TRIM stuck in a child process of the launched command """
+    return CommandExecutor(['sh', '-c', 'sleep 60 & echo $! > "{}"; wait'.format(pid_file)])
+
+
+async def _child_pid(pid_file):
+    while not os.path.isfile(pid_file) or not open(pid_file).read().strip():
+        await asyncio.sleep(0.01)
+    with open(pid_file) as f:
+        return int(f.read())
+
+
+def test_timeout_kills_process_group(tmp_path, ion, target, srim_directory):
+    pid_file = str(tmp_path / 'child.pid')
+    srim = SRIM(target, ion, number_ions=10)
+
+    async def run():
+        task = asyncio.ensure_future(srim.run_async(
+            srim_directory, sandbox=str(tmp_path / 'sandbox'), timeout=0.5,
+            executor=_hanging_executor(pid_file)))
+        pid = await _child_pid(pid_file)
+        with pytest.raises(asyncio.TimeoutError):
+            await task
+        return pid
+
+    start = time.time()
+    pid = asyncio.run(run())
+    assert time.time() - start < 10.0
+    assert not _alive(pid)
+
+
+def test_cancel_kills_process_group_and_removes_sandbox(tmp_path, monkeypatch, ion, target, srim_directory):
+    pid_file = str(tmp_path / 'child.pid')
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    srim = SRIM(target, ion, number_ions=10)
+
+    async def run():
+        task = asyncio.ensure_future(srim.run_async(
+            srim_directory, sandbox=True, executor=_hanging_executor(pid_file)))
+        pid = await _child_pid(pid_file)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pid
+
+    pid = asyncio.run(run())
+    assert not _alive(pid)
+    assert [name for name in os.listdir(str(tmp_path)) if name.startswith('srim-')] == []
+
+
+def test_sr_timeout(tmp_path, ion, target, srim_directory):
+    pid_file = str(tmp_path / 'child.pid')
+    sr = SR(target.layers[0], ion)
+
+    async def run():
+        task = asyncio.ensure_future(sr.run_async(
+            srim_directory, sandbox=True, timeout=0.5, executor=_hanging_executor(pid_file)))
+        pid = await _child_pid(pid_file)
+        with pytest.raises(asyncio.TimeoutError):
+            await task
+        return pid
+
+    assert not _alive(asyncio.run(run()))
+
+
+def test_run_many_async(ion, target, srim_directory, executor):
+    calculations = [SRIM(target, ion, number_ions=number_ions) for number_ions in (10, 20, 30)]
+    results = asyncio.run(run_many_async(calculations, limit=2, srim_directory=srim_directory,
+                                         executor=executor))
+    try:
+        assert [result.range.num_ions for result in results] == [10, 20, 30]
+    finally:
+        for result in results:
+            shutil.rmtree(result.directory)
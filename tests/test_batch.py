@@ -0,0 +1,35 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+
+from srim.srim import SRIM
+from srim.batch import BatchRunner
+from srim.shard import run_sharded
+from srim.executor import FakeExecutor
+from srim.core.ion import Ion
+
+
+def test_results_in_submission_order(tmp_path, target, srim_directory):
+    jobs = [(Ion('He', energy), target, {'number_ions': 50, 'collisions': 1})
+            for energy in (1.0e6, 2.0e6, 3.0e6, 4.0e6, 5.0e6)]
+    progress = []
+    runner = BatchRunner(srim_directory, str(tmp_path / 'runs'), max_workers=3, executor=FakeExecutor(),
+                         progress=lambda done, total, job, results: progress.append((done, total)))
+    results = runner.run(jobs)
+
+    assert [result.range.ion.energy for result in results] == [1.0e6, 2.0e6, 3.0e6, 4.0e6, 5.0e6]
+    assert sorted(progress) == [(i, 5) for i in range(1, 6)]
+    for result in results:
+        assert os.path.dirname(result.directory) == str(tmp_path / 'runs')
+        assert os.path.isfile(os.path.join(result.directory, 'COLLISON.txt'))
+    # sandboxes are removed
+    assert os.listdir(srim_directory) == ['SR Module']
+
+
+def test_run_sharded(tmp_path, ion, target, srim_directory):
+    srim = SRIM(target, ion, calculation=2, number_ions=1000, random_seed=3)
+    results = run_sharded(srim, 4, srim_directory, str(tmp_path / 'shards'), executor=FakeExecutor())
+    assert results.range.num_ions == 1000
+    assert sorted(os.listdir(str(tmp_path / 'shards'))) == ['shard-000', 'shard-001', 'shard-002', 'shard-003']
@@ -0,0 +1,119 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from srim.srim import SRIM
+from srim.cache import ResultCache
+from srim.executor import FakeExecutor
+
+
+class FailingExecutor(FakeExecutor):
+    """ TRIM crashing before writing its tables """
+    def __init__(self, status):
+        super(FailingExecutor, self).__init__()
+        self.status = status
+
+    def run(self, program, directory):
+        return self.status
+
+
+def _calculation(ion, target, seed, **args):
+    return SRIM(target, ion, calculation=2, number_ions=100, random_seed=seed, **args)
+
+
+def _run(srim, srim_directory, cache, executor):
+    results = srim.run(srim_directory, sandbox=True, cache=cache, executor=executor)
+    results.load()
+    shutil.rmtree(results.directory)
+    return results
+
+
+def test_hit_and_miss(tmp_path, ion, target, srim_directory, executor):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    srim = _calculation(ion, target, 1)
+    assert srim not in cache
+
+    first = _run(srim, srim_directory, cache, executor)
+    assert executor.runs == 1
+    assert srim in cache
+
+    # same TRIM.IN and seed: outputs are copied from the cache
+    second = _run(_calculation(ion, target, 1), srim_directory, cache, executor)
+    assert executor.runs == 1
+    np.testing.assert_array_equal(first.range.ions, second.range.ions)
+
+    # another seed or another input is a miss
+    _run(_calculation(ion, target, 2), srim_directory, cache, executor)
+    _run(_calculation(ion, target, 1, angle_ions=10.0), srim_directory, cache, executor)
+    assert executor.runs == 3
+    assert len(cache.entries()) == 3
+
+
+def test_stores_collisions_and_exyz(tmp_path, ion, target, srim_directory, executor):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    srim = _calculation(ion, target, 1, collisions=1, exyz=1)
+    _run(srim, srim_directory, cache, executor)
+
+    directory = str(tmp_path / 'restored')
+    os.makedirs(directory)
+    assert cache.restore(srim, directory)
+    assert {'COLLISON.txt', 'EXYZ.txt', 'RANGE.txt', 'TRIM.IN'} <= set(os.listdir(directory))
+
+
+@pytest.mark.parametrize('status', [1, 0])
+def test_failed_runs_are_not_stored(tmp_path, ion, target, srim_directory, executor, status):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    srim = _calculation(ion, target, 1)
+    with pytest.warns(RuntimeWarning):
+        results = _run(srim, srim_directory, cache, FailingExecutor(status))
+    assert results.range is None
+    assert srim not in cache
+
+    # the next identical run launches TRIM
+    results = _run(srim, srim_directory, cache, executor)
+    assert executor.runs == 1
+    assert results.range is not None
+    assert srim in cache
+
+
+def test_restore_skips_entries_without_tables(tmp_path, ion, target, srim_directory, executor):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    srim = _calculation(ion, target, 1)
+    entry = cache._entry(cache.key(srim))
+    os.makedirs(entry)
+    srim._write_input_files(entry)
+
+    assert not cache.restore(srim, str(tmp_path))
+    assert not os.path.isdir(entry)
+    _run(srim, srim_directory, cache, executor)
+    assert executor.runs == 1 and srim in cache
+
+
+def test_evicts_least_recently_used(tmp_path, ion, target, srim_directory, executor):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    calculations = [_calculation(ion, target, seed) for seed in (1, 2, 3)]
+    for srim in calculations:
+        _run(srim, srim_directory, cache, executor)
+    entry_size = max(size for _, _, size in cache.entries())
+
+    # the second calculation is the least recently used
+    for srim, last_use in zip(calculations, (1.0e9 + 2, 1.0e9, 1.0e9 + 1)):
+        os.utime(cache._entry(cache.key(srim)), (last_use, last_use))
+    assert cache.evict(max_size=2 * entry_size) == 1
+    assert calculations[0] in cache and calculations[2] in cache
+    assert calculations[1] not in cache
+
+    # store keeps the cache below max_size
+    cache = ResultCache(str(tmp_path / 'cache'), max_size=entry_size)
+    _run(_calculation(ion, target, 4), srim_directory, cache, executor)
+    assert len(cache.entries()) == 1
+    assert cache._size == sum(size for _, _, size in cache.entries())
+
+    assert cache.clear() == 1
+    assert cache.entries() == []
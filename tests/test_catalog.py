@@ -0,0 +1,63 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import shutil
+
+import pytest
+
+from srim.srim import SRIM
+from srim.catalog import Catalog
+from srim.batch import BatchRunner
+from srim.core.ion import Ion
+from srim.core.layer import Layer
+from srim.core.target import Target
+
+
+@pytest.fixture
+def runs(tmp_path, target, srim_directory, executor):
+    """ Run directories of He and Ne ions in ZrO2/Zr and of He in Ni """
+    nickel = Target([Layer({'Ni': 1.0}, 8.9, 5.0e3, name='nickel')])
+    jobs = [
+        (Ion('He', 1.0e6), target, {'calculation': 2, 'number_ions': 100}),
+        (Ion('He', 2.0e6), target, {'calculation': 2, 'number_ions': 100, 'angle_ions': 30.0}),
+        (Ion('Ne', 2.0e6), target, {'calculation': 1, 'number_ions': 200}),
+        (Ion('He', 3.0e6), nickel, {'calculation': 2, 'number_ions': 100}),
+    ]
+    save_directory = str(tmp_path / 'runs')
+    BatchRunner(srim_directory, save_directory, max_workers=1, executor=executor).run(jobs)
+    return save_directory
+
+
+def test_update_and_query(runs):
+    with Catalog(':memory:') as catalog:
+        assert catalog.update(runs) == (4, 0)
+        assert len(catalog) == 4
+        # unchanged directories are not read again
+        assert catalog.update(runs) == (0, 0)
+
+        assert [run['energy'] for run in catalog.query(ion='He')] == [1.0e6, 2.0e6, 3.0e6]
+        assert len(catalog.query(energy=(1.5e6, None))) == 3
+        assert len(catalog.query(num_ions=200)) == 1
+        assert len(catalog.query(calculation=1)) == 1
+        assert len(catalog.query(angle=30.0)) == 1
+        assert len(catalog.query(elements='ZrO2')) == 3
+        assert len(catalog.query(elements=['Zr'], exact=True)) == 0
+        assert len(catalog.query(elements='Ni', exact=True)) == 1
+        assert len(catalog.query(layer='nick%')) == 1
+
+        run = catalog.query(ion='Ne')[0]
+        assert run['settings']['angle_ions'] == 0.0
+        assert [layer['name'] for layer in run['layers']] == ['oxide', 'metal']
+        assert set(run['layers'][0]['elements']) == {'Zr', 'O'}
+
+
+def test_prunes_removed_directories(tmp_path, runs):
+    path = str(tmp_path / 'catalog.sqlite')
+    with Catalog(path) as catalog:
+        catalog.update(runs)
+    shutil.rmtree(os.path.join(runs, sorted(os.listdir(runs))[0]))
+    with Catalog(path) as catalog:
+        assert catalog.update(runs) == (0, 1)
+        assert len(catalog) == 3
@@ -0,0 +1,81 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import subprocess
+
+import pytest
+
+display_module = pytest.importorskip('srim.display')
+HeadlessDisplay = display_module.HeadlessDisplay
+
+
+class FakeXvfb(object):
+    """ Stands for the Popen of Xvfb """
+    def __init__(self):
+        self.terminated = False
+
+    def terminate(self):
+        self.terminated = True
+
+    def wait(self, timeout=None):
+        return 0
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """ Commands given to subprocess.call, wineserver is missing """
+    calls = []
+
+    def call(command, **args):
+        calls.append(command)
+        if command == ['wineserver', '-p']:
+            raise FileNotFoundError('wineserver')
+        return 0
+
+    monkeypatch.setattr(subprocess, 'call', call)
+    return calls
+
+
+def _fake_start_xvfb(display):
+    def start_xvfb():
+        display._process = FakeXvfb()
+        display.number = 99
+    display._start_xvfb = start_xvfb
+    return display
+
+
+def test_failed_warm_up_stops_xvfb(tmp_path, calls):
+    display = HeadlessDisplay.for_worker(str(tmp_path / 'wine'))
+    lock = display._lock
+    process = None
+
+    def start_xvfb():
+        nonlocal process
+        process = display._process = FakeXvfb()
+        display.number = 99
+    display._start_xvfb = start_xvfb
+
+    with pytest.raises(FileNotFoundError):
+        display.start()
+    assert process.terminated
+    assert display._process is None and display.number is None
+    assert lock.closed and display._lock is None
+    # the wineserver never started, it is not killed
+    assert calls == [['wineserver', '-p']]
+
+    # the prefix is free again
+    other = HeadlessDisplay.for_worker(str(tmp_path / 'wine'))
+    assert other.wine_prefix == display.wine_prefix
+    other.stop()
+
+
+def test_stop_kills_started_wineserver(monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, 'call', lambda command, **args: calls.append(command) or 0)
+    display = _fake_start_xvfb(HeadlessDisplay()).start()
+    assert display.environment()['DISPLAY'] == ':99'
+    display.stop()
+    assert calls == [['wineserver', '-p'], ['wineserver', '-k']]
+    display.stop()
+    assert len(calls) == 2
@@ -0,0 +1,59 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import copy
+import pickle
+
+import pytest
+
+from srim.core.element import Element
+from srim.core.ion import Ion
+
+
+def test_element_interning():
+    zirconium = Element('Zr')
+    assert Element('Zirconium') is zirconium
+    assert Element(40) is zirconium
+    assert Element('Zr', mass=91.0) is not zirconium
+    assert Element('Zr', unique_name='Zr-oxide') != zirconium
+    assert copy.copy(zirconium) is zirconium
+    assert copy.deepcopy({zirconium: 1.0}) == {zirconium: 1.0}
+    assert pickle.loads(pickle.dumps(zirconium)) is zirconium
+
+
+def test_element_equality():
+    assert Element('O') == Element(8)
+    assert Element('O') != Element('Zr')
+    assert Element('O') != 'O'
+    assert len({Element('O'), Element(8), Element('Oxygen')}) == 1
+    # an integer and a float mass are distinct instances but equal values
+    assert Element('O', mass=16) is not Element('O', mass=16.0)
+    assert Element('O', mass=16) == Element('O', mass=16.0)
+    assert hash(Element('O', mass=16)) == hash(Element('O', mass=16.0))
+
+
+def test_element_immutable():
+    element = Element('O')
+    with pytest.raises(AttributeError):
+        element.mass = 18.0
+    with pytest.raises(AttributeError):
+        del element.symbol
+    with pytest.raises(AttributeError):
+        element.charge = 1
+
+
+def test_ion():
+    ion = Ion('He', 1.0e6)
+    assert Ion('Helium', 1.0e6) is ion
+    assert Ion(2, 2.0e6) is not ion
+    assert Ion('He', 1.0e6) != Ion('He', 2.0e6)
+    assert ion.energy == 1.0e6 and ion.symbol == 'He' and ion.atomic_number == 2
+    # an ion is never equal to the element of the same symbol
+    assert ion != Element('He')
+    assert pickle.loads(pickle.dumps(ion)) is ion
+    assert ion.velocity > 0.0
+    with pytest.raises(AttributeError):
+        ion.energy = 2.0e6
+    with pytest.raises(ValueError):
+        Ion('He', 0.0)
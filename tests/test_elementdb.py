@@ -0,0 +1,72 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from srim.core import elementdb
+from srim.core.elementdb import ElementDB, load_elementdb
+
+
+def test_lookup():
+    zirconium = ElementDB.lookup('Zr')
+    assert zirconium['z'] == 40
+    assert ElementDB.lookup('Zirconium') is zirconium
+    assert ElementDB.lookup(40) is zirconium
+    assert ElementDB.lookup(np.int64(40)) is zirconium
+    assert ElementDB.lookup(b'Zr') is zirconium
+
+    with pytest.raises(KeyError):
+        ElementDB.lookup('Xx')
+    with pytest.raises(KeyError):
+        ElementDB.lookup('Unobtainium')
+    with pytest.raises(IndexError):
+        ElementDB.lookup(500)
+    with pytest.raises(ValueError):
+        ElementDB.lookup(4.0)
+
+
+def test_table():
+    table = ElementDB.table()
+    assert table[0]['z'] == 0
+    for z in (1, 8, 40, 92):
+        element = ElementDB.lookup(z)
+        assert table[z]['symbol'] == element['symbol']
+        assert table[z]['mass'] == element['mass']
+    np.testing.assert_array_equal(ElementDB.masses([8, 40]), [ElementDB.lookup('O')['mass'], ElementDB.lookup('Zr')['mass']])
+    np.testing.assert_array_equal(ElementDB.atomic_numbers(['Zr', 'O', 'O']), [40, 8, 8])
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    return str(tmp_path / 'pysrim' / 'elements.pickle')
+
+
+def test_pickle_cache(cache_path, monkeypatch):
+    db = load_elementdb()
+    assert os.path.isfile(cache_path)
+
+    # the pickle is used while the yaml is unchanged
+    def create_elementdb():
+        raise AssertionError('elements.yaml parsed again')
+    monkeypatch.setattr(elementdb, 'create_elementdb', create_elementdb)
+    assert load_elementdb() == db
+
+
+@pytest.mark.parametrize('content', [
+    pickle.dumps(((0, 0), {'Zr': {'z': 0}})),   # elements.yaml changed since
+    b'not a pickle',
+    b''
+])
+def test_pickle_cache_invalidation(cache_path, content):
+    db = load_elementdb()
+    with open(cache_path, 'wb') as f:
+        f.write(content)
+    assert load_elementdb() == db
+    with open(cache_path, 'rb') as f:
+        assert pickle.load(f)[1] == db
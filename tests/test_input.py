@@ -0,0 +1,46 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import pytest
+
+from srim import input as srim_input
+from srim.srim import SRIM
+from srim.input import TRIMInput
+from srim.core.ion import Ion
+
+
+def _uncached(srim):
+    """ TRIM.IN bytes written without the target block cache """
+    srim_input._target_blocks.clear()
+    return TRIMInput(srim).to_bytes()
+
+
+def test_cached_blocks_are_identical(ion, target):
+    for energy in (1.0e5, 1.0e6, 2.0e6):
+        srim = SRIM(target, Ion('He', energy), calculation=2, angle_ions=10.0)
+        cached = TRIMInput(srim).to_bytes()
+        assert target in srim_input._target_blocks
+        assert cached == _uncached(srim)
+        assert TRIMInput(srim).to_bytes() == cached
+
+
+@pytest.mark.parametrize('name, value', [('stoich', 0.25), ('E_d', 40.0), ('lattice', 2.0), ('surface', 6.0)])
+def test_element_edited_in_place(ion, target, name, value):
+    srim = SRIM(target, ion)
+    before = TRIMInput(srim).to_bytes()
+
+    layer = target.layers[0]
+    element = next(iter(layer.elements))
+    layer.elements[element][name] = value
+    after = TRIMInput(srim).to_bytes()
+    assert after != before
+    assert after == _uncached(srim)
+
+
+def test_layer_edited_in_place(ion, target):
+    srim = SRIM(target, ion)
+    TRIMInput(srim).to_bytes()
+    target.layers[1].width = 5.0e3
+    target.layers[1].density = 7.0
+    assert TRIMInput(srim).to_bytes() == _uncached(srim)
@@ -0,0 +1,194 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+
+import numpy as np
+import pytest
+
+from srim import synthetic
+from srim.output import (
+    Results, Range, Vacancy, Transmit, Backscat, Sputter, Range3D, EXYZ,
+    Collision, SRIMOutputParseError, read_table
+)
+
+
+TABLE = (
+    b' ==========\r\n'
+    b'  DEPTH     Ions     Recoils\r\n'
+    b'  (Ang.)    Ions     Zr\r\n'
+    b'-----------  ----------  ----------\r\n'
+    b'100.00      1.0E+02     2.5E+01\r\n'
+    b'200.00      2.0E+02     5.0E+01\r\n'
+    b'300.00      .3E+03      7.5E+01\r\n'
+    b'\r\n'
+    b' Total recoils = 150\r\n'
+)
+
+
+def test_read_table():
+    columns, data = read_table(TABLE)
+    assert len(columns) == 3
+    assert data.shape == (3, 3)
+    np.testing.assert_allclose(data[:, 0], [100.0, 200.0, 300.0])
+    np.testing.assert_allclose(data[:, 1], [100.0, 200.0, 300.0])
+    np.testing.assert_allclose(data[:, 2], [25.0, 50.0, 75.0])
+
+
+def test_read_table_without_rows():
+    with pytest.raises(SRIMOutputParseError):
+        read_table(TABLE[:TABLE.index(b'100.00')])
+
+
+def test_read_table_ragged_rows():
+    with pytest.raises(SRIMOutputParseError):
+        read_table(TABLE.replace(b'     2.5E+01', b''))
+
+
+def test_tables(run_directory, ion, target):
+    results = Results(run_directory)
+    assert results.range.num_ions == 1000
+    assert results.range.ion.symbol == ion.symbol
+    # one column per atom of each layer: Zr, O (oxide) and Zr (metal)
+    assert results.range.elements.shape == (100, 3)
+    assert results.vacancy.depth.shape == (100,)
+    assert results.range.depth[-1] <= target.width
+    assert np.all(np.diff(results.range.depth) > 0)
+    for name in Results.tables:
+        assert getattr(results, name) is not None
+
+
+def test_merge_weights_by_num_ions(tmp_path, ion, target):
+    directories = []
+    for num_ions, seed in [(1000, 1), (3000, 2)]:
+        directory = str(tmp_path / 'run-{}'.format(seed))
+        os.makedirs(directory)
+        synthetic.write_tables(directory, ion, target, num_ions=num_ions, seed=seed)
+        directories.append(directory)
+
+    ranges = [Range(directory) for directory in directories]
+    merged = Range.merge(ranges)
+    assert merged.num_ions == 4000
+    np.testing.assert_allclose(merged.depth, ranges[0].depth)
+    np.testing.assert_allclose(merged.ions, 0.25 * ranges[0].ions + 0.75 * ranges[1].ions)
+    np.testing.assert_allclose(merged.elements, 0.25 * ranges[0].elements + 0.75 * ranges[1].elements)
+
+    results = Results.merge([Results(directory) for directory in directories], directory='merged')
+    assert results.directory == 'merged'
+    assert results.vacancy.num_ions == 4000
+    np.testing.assert_allclose(results.range.ions, merged.ions)
+
+
+def test_merge_rejects_other_bins(tmp_path, ion, target):
+    for bins in (100, 50):
+        directory = str(tmp_path / 'run-{}'.format(bins))
+        os.makedirs(directory)
+        synthetic.write_tables(directory, ion, target, bins=bins, seed=0)
+    with pytest.raises(ValueError):
+        Vacancy.merge([Vacancy(str(tmp_path / 'run-100')), Vacancy(str(tmp_path / 'run-50'))])
+
+
+def test_kinetics_glued_numbers(tmp_path):
+    with open(str(tmp_path / 'TRANSMIT.txt'), 'wb') as f:
+        f.write(b' ==========\r\n  SRIM-2013.00\r\n')
+        f.write(b'T      1   2 1.0000E+06 6.0000E+04-1.234E+01-5.000E+00  0.9000  0.1000 -0.2000\r\n')
+        f.write(b'T      2   2 .9986E+06 6.0000E+04 1.500E+01 2.000E+00  0.8000 -0.1000  0.3000\r\n')
+    transmit = Transmit(str(tmp_path))
+    assert transmit.data.shape == (2, 9)
+    np.testing.assert_array_equal(transmit.ion_numbers, [1, 2])
+    np.testing.assert_allclose(transmit.energy, [1.0e6, 0.9986e6])
+    np.testing.assert_allclose(transmit.position[0], [6.0e4, -12.34, -5.0])
+    np.testing.assert_allclose(transmit.direction[1], [0.8, -0.1, 0.3])
+
+
+@pytest.mark.parametrize('table_type, filename', [
+    (Transmit, 'TRANSMIT.txt'), (Backscat, 'BACKSCAT.txt'), (Sputter, 'SPUTTER.txt')])
+def test_kinetics(tmp_path, ion, target, table_type, filename):
+    synthetic.write_kinetics(str(tmp_path / filename), ion, target, num_particles=500, seed=3)
+
+    table = table_type(str(tmp_path))
+    assert table.data.shape == (500, 9)
+    np.testing.assert_array_equal(table.ion_numbers, np.arange(1, 501))
+    assert np.all((table.energy >= 0.0) & (table.energy <= ion.energy))
+    if table_type is Sputter:
+        assert set(table.atoms) <= {8, 40}
+    else:
+        assert set(table.atoms) == {ion.atomic_number}
+
+    # small chunks split lines, the parsed particles are the same
+    chunked = table_type(str(tmp_path), chunk_size=100)
+    np.testing.assert_array_equal(chunked.data, table.data)
+
+    counts, _ = table.angular_distribution(bins=9)
+    assert counts.sum() == 500
+
+
+def test_range_3d(tmp_path, ion, target):
+    synthetic.write_positions(str(tmp_path / 'RANGE_3D.txt'), ion, target, num_ions=300, seed=1)
+    range_3d = Range3D(str(tmp_path))
+    assert range_3d.data.shape == (300, 4)
+    np.testing.assert_array_equal(range_3d.ion_numbers, np.arange(1, 301))
+    assert np.any(range_3d.position[:, 1] < 0.0)
+
+    chunked = Range3D(str(tmp_path), chunk_size=64)
+    np.testing.assert_array_equal(chunked.data, range_3d.data)
+
+    bins = [np.linspace(0.0, target.width, 11), np.linspace(-1e4, 1e4, 5), np.linspace(-1e4, 1e4, 5)]
+    histogram, _ = range_3d.histogram(bins)
+    streamed, _ = Range3D.histogram_file(str(tmp_path / 'RANGE_3D.txt'), bins, chunk_size=64)
+    np.testing.assert_allclose(histogram, streamed)
+
+
+def test_exyz(tmp_path, ion, target):
+    synthetic.write_positions(str(tmp_path / 'EXYZ.txt'), ion, target, num_ions=20, points_per_ion=5, seed=1)
+    exyz = EXYZ(str(tmp_path))
+    assert exyz.data.shape == (100, 7)
+    np.testing.assert_array_equal(exyz.ion_numbers, np.repeat(np.arange(1, 21), 5))
+    # energies are written in keV
+    assert exyz.energy.max() < ion.energy
+    np.testing.assert_allclose(exyz.energy[:5], ion.energy * np.array([0.8, 0.6, 0.4, 0.2, 0.0]), atol=1.0)
+    assert exyz.electronic_stopping.shape == (100,)
+
+
+@pytest.fixture
+def collision_file(tmp_path, ion, target):
+    filename = str(tmp_path / 'COLLISON.txt')
+    synthetic.write_collisions(filename, ion, target, num_ions=25, collisions_per_ion=8,
+                               recoils_per_cascade=3, seed=5)
+    return filename
+
+
+def test_collision_index(collision_file):
+    with Collision(collision_file) as collision:
+        assert len(collision) == 25
+        assert os.path.isfile(collision_file + '.idx.npz')
+        ion, collisions, cascades = collision.read_arrays(3)
+        assert int(ion['ion_number']) == 4
+        assert len(collisions) > 0
+        assert np.all(collisions['ion_number'] == 4)
+        assert len(collision[3]['collisions']) == len(collisions)
+
+    # the sidecar index is reused, and ignored once the file changes
+    with Collision(collision_file) as collision:
+        assert len(collision) == 25
+    with open(collision_file, 'ab') as f:
+        f.write(b'\r\n')
+    with Collision(collision_file) as collision:
+        assert collision._ion_index[-1] == os.path.getsize(collision_file)
+
+
+def test_collision_iter_ions(collision_file):
+    with Collision(collision_file, index_file=False) as collision:
+        ions = list(collision.iter_ions(chunk_size=1024, arrays=True))
+        assert [int(ion['ion_number'][0]) for ion, _, _ in ions] == list(range(1, 26))
+
+        batches = list(collision.iter_ions(batch_size=10, arrays=True))
+        assert [len(ion) for ion, _, _ in batches] == [10, 10, 5]
+
+        all_ions, all_collisions, all_cascades = collision.to_arrays()
+        assert len(all_collisions) == sum(len(collisions) for _, collisions, _ in batches)
+        assert len(all_cascades) == sum(len(cascades) for _, _, cascades in batches)
+
+        dictionaries = list(collision.iter_ions())
+        assert len(dictionaries) == 25
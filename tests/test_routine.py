@@ -0,0 +1,59 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+
+import numpy as np
+import pytest
+
+from srim import synthetic
+from srim.srim import SRIM
+from srim.input import TRIMInput
+from srim.output import Range, Vacancy
+from srim.routine import merge_results
+
+
+@pytest.fixture
+def steps(tmp_path, ion, target):
+    """ Two step calculations, the second one plotted from 1 um """
+    directories = []
+    for step, (plot_xmin, seed) in enumerate([(0.0, 1), (1.0e4, 2)]):
+        directory = str(tmp_path / 'steps' / 'step-{}'.format(step))
+        os.makedirs(directory)
+        srim = SRIM(target, ion, calculation=2, number_ions=100, random_seed=seed,
+                    plot_xmin=plot_xmin, plot_xmax=target.width)
+        TRIMInput(srim).write(directory)
+        synthetic.write_tables(directory, ion, target, num_ions=100, bins=20, seed=seed)
+        directories.append(directory)
+    return directories
+
+
+def test_merge_results(tmp_path, steps):
+    total_range, total_vacancy = merge_results(steps, offsets='plot_xmin', save_directory=str(tmp_path))
+    ranges = [Range(directory) for directory in steps]
+    vacancies = [Vacancy(directory) for directory in steps]
+
+    assert total_range.shape == (40, 1 + 1 + ranges[0].elements.shape[1])
+    assert total_vacancy.shape == (40, 2 + vacancies[0].vacancies.shape[1])
+    assert np.all(np.diff(total_range[:, 0]) >= 0.0)
+    np.testing.assert_allclose(np.sort(total_range[:, 0]), np.sort(np.concatenate(
+        [ranges[0].depth, ranges[1].depth + 1.0e4])))
+    np.testing.assert_allclose(total_range[:, 1].sum(), ranges[0].ions.sum() + ranges[1].ions.sum())
+    np.testing.assert_allclose(total_vacancy[:, 1].sum(), vacancies[0].knock_ons.sum() + vacancies[1].knock_ons.sum())
+
+    np.testing.assert_allclose(np.loadtxt(str(tmp_path / 'total_range.txt')), total_range, rtol=1e-4)
+    with np.load(str(tmp_path / 'total.npz')) as saved:
+        np.testing.assert_array_equal(saved['offsets'], [0.0, 1.0e4])
+        assert list(saved['directories']) == steps
+
+
+def test_merge_results_directories(tmp_path, steps):
+    pattern = str(tmp_path / 'steps' / 'step-*')
+    total_range, _ = merge_results(pattern, offsets=[0.0, 5.0], save_directory=str(tmp_path))
+    np.testing.assert_allclose(total_range[-1, 0], Range(steps[1]).depth[-1] + 5.0)
+
+    with pytest.raises(ValueError):
+        merge_results(pattern, offsets=[0.0], save_directory=str(tmp_path))
+    with pytest.raises(ValueError):
+        merge_results(str(tmp_path / 'missing-*'), save_directory=str(tmp_path))
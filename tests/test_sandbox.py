@@ -0,0 +1,69 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import shutil
+
+import pytest
+
+from srim.srim import create_sandbox
+
+
+@pytest.fixture
+def installation(tmp_path):
+    """ SRIM installation with leftovers of a previous run """
+    directory = tmp_path / 'SRIM'
+    (directory / 'SR Module').mkdir(parents=True)
+    (directory / 'SRIM Outputs').mkdir()
+    (directory / 'Data').mkdir()
+    for filename in ['TRIM.exe', 'TRIM.IN', 'TRIMAUTO', 'RANGE.txt', 'Data/ATOMDATA',
+                     'SR Module/SRModule.exe', 'SR Module/SR.IN', 'SRIM Outputs/RANGE.txt']:
+        (directory / filename).write_text(filename)
+    return str(directory)
+
+
+def test_links_installation(tmp_path, installation):
+    sandbox = create_sandbox(installation, str(tmp_path / 'sandbox'))
+    for filename in ['TRIM.exe', 'Data/ATOMDATA', 'SR Module/SRModule.exe']:
+        path = os.path.join(sandbox, filename)
+        assert os.path.islink(path)
+        assert os.readlink(path) == os.path.join(installation, filename)
+
+    # files and folders written by a run are private to the sandbox
+    for filename in ['TRIM.IN', 'TRIMAUTO', 'RANGE.txt', 'SR Module/SR.IN']:
+        assert not os.path.lexists(os.path.join(sandbox, filename))
+    assert os.path.isdir(os.path.join(sandbox, 'SRIM Outputs'))
+    assert os.listdir(os.path.join(sandbox, 'SRIM Outputs')) == []
+
+    # writing in the sandbox leaves the installation untouched
+    with open(os.path.join(sandbox, 'TRIM.IN'), 'w') as f:
+        f.write('sandbox')
+    with open(os.path.join(installation, 'TRIM.IN')) as f:
+        assert f.read() == 'TRIM.IN'
+
+
+def test_copies_installation(tmp_path, installation):
+    sandbox = create_sandbox(installation, str(tmp_path / 'sandbox'), link=False)
+    path = os.path.join(sandbox, 'TRIM.exe')
+    assert os.path.isfile(path) and not os.path.islink(path)
+
+
+def test_temporary_sandboxes(installation):
+    sandboxes = [create_sandbox(installation) for _ in range(2)]
+    try:
+        assert sandboxes[0] != sandboxes[1]
+        assert all(os.path.islink(os.path.join(sandbox, 'TRIM.exe')) for sandbox in sandboxes)
+    finally:
+        for sandbox in sandboxes:
+            shutil.rmtree(sandbox)
+
+
+def test_existing_sandbox(tmp_path, installation):
+    sandbox = create_sandbox(installation, str(tmp_path / 'sandbox'))
+    assert create_sandbox(installation, sandbox) == sandbox
+
+
+def test_missing_installation(tmp_path):
+    with pytest.raises(ValueError):
+        create_sandbox(str(tmp_path / 'missing'))
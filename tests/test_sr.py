@@ -0,0 +1,83 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import numpy as np
+import pytest
+
+from srim.srim import SR
+from srim.output import SRResults, SRIMOutputParseError
+
+
+# SR_OUTPUT.txt in MeV/(mg/cm2) with decimal commas of a Windows locale
+SR_OUTPUT = (
+    ' ==================================================================\r\n'
+    '              Calculation using SRIM-2006 \r\n'
+    '              SRIM version ---> SRIM-2013.00\r\n'
+    ' ==================================================================\r\n'
+    '\r\n'
+    ' Ion = Helium [2] , Mass = 4,003 amu\r\n'
+    '\r\n'
+    ' Target Density =  5,6800E+00 g/cm3 = 8,3240E+22 atoms/cm3\r\n'
+    ' ====================================\r\n'
+    ' Bragg Correction = 0.00%\r\n'
+    ' Stopping Units =  MeV / (mg/cm2) \r\n'
+    ' See bottom of Table for other Stopping units \r\n'
+    '\r\n'
+    '   Ion        dE/dx      dE/dx     Projected  Longitudinal   Lateral\r\n'
+    '  Energy      Elec.      Nuclear     Range     Straggling   Straggling\r\n'
+    '-----------  ---------- ---------- ----------  ----------  ----------\r\n'
+    '999.99 eV   1,000E-01  2,000E-02      95 A         60 A         44 A   \r\n'
+    '10.00 keV   3,000E-01  1,000E-02     812 A        402 A        301 A   \r\n'
+    '2.00 MeV    1,500E+00  1,000E-03    3,27 um      2500 A       1,20 um  \r\n'
+    '-----------------------------------------------------------\r\n'
+    ' Multiply Stopping by        for Stopping Units\r\n'
+    ' -------------------        ------------------\r\n'
+    '  1,7606E+01                 eV / Angstrom \r\n'
+    '  1,7606E+02                keV / micron   \r\n'
+    '  1,0000E+00                MeV / (mg/cm2) \r\n'
+    '(C) 1984,1989,1992,1998,2008 by J.P. Biersack and J.F. Ziegler\r\n'
+)
+
+
+@pytest.fixture
+def sr_output(tmp_path):
+    with open(str(tmp_path / 'SR_OUTPUT.txt'), 'wb') as f:
+        f.write(SR_OUTPUT.encode('latin-1'))
+    return str(tmp_path)
+
+
+def test_sr_results(sr_output):
+    results = SRResults(sr_output)
+    assert results.ion == {'name': 'Helium', 'atomic_number': 2, 'mass': 4.003}
+    assert results.stopping_units == 'MeV / (mg/cm2)'
+    assert results.conversions['keV / micron'] == 176.06
+    np.testing.assert_allclose(results.energy, [999.99, 1.0e4, 2.0e6])
+    # stopping is converted to eV/Ang
+    np.testing.assert_allclose(results.electronic, 17.606 * np.array([0.1, 0.3, 1.5]))
+    np.testing.assert_allclose(results.nuclear, 17.606 * np.array([0.02, 0.01, 0.001]))
+    np.testing.assert_allclose(results.stopping, results.electronic + results.nuclear)
+    np.testing.assert_allclose(results.projected_range, [95.0, 812.0, 3.27e4])
+    np.testing.assert_allclose(results.longitudinal_straggling, [60.0, 402.0, 2500.0])
+    np.testing.assert_allclose(results.lateral_straggling, [44.0, 301.0, 1.2e4])
+
+
+@pytest.mark.parametrize('text', [
+    SR_OUTPUT.replace(' Ion = ', ''),
+    SR_OUTPUT.replace('eV / Angstrom', ''),
+    SR_OUTPUT[:SR_OUTPUT.index('999.99 eV')]
+])
+def test_sr_results_errors(tmp_path, text):
+    with open(str(tmp_path / 'SR_OUTPUT.txt'), 'wb') as f:
+        f.write(text.encode('latin-1'))
+    with pytest.raises(SRIMOutputParseError):
+        SRResults(str(tmp_path))
+
+
+def test_sr_run(ion, target, srim_directory, executor):
+    results = SR(target.layers[0], ion, energy_min=1.0e4).run(srim_directory, sandbox=True, executor=executor)
+    assert executor.runs == 1
+    assert results.ion['atomic_number'] == ion.atomic_number
+    assert results.energy[0] == pytest.approx(1.0e4)
+    assert results.energy[-1] == pytest.approx(ion.energy, rel=1e-3)
+    assert np.all(np.diff(results.projected_range) > 0.0)
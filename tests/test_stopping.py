@@ -0,0 +1,94 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+
+import numpy as np
+import pytest
+
+from srim.srim import SRIMRunError
+from srim.executor import FakeExecutor
+from srim.stopping import StoppingTable, energy_through_target
+
+
+class FailingExecutor(FakeExecutor):
+    """ SR Module exiting with an error """
+    def run(self, program, directory):
+        return 1
+
+
+@pytest.fixture
+def table():
+    """ Power law table, exactly interpolated in log-log """
+    energy = np.logspace(3, 7, 41)
+    return StoppingTable(energy, 1.0e-2 * energy ** 0.5, 1.0e2 * energy ** -0.5, 1.0e-2 * energy ** 0.75)
+
+
+def test_interpolation(table):
+    energy = np.array([2.0e3, 3.3e4, 5.0e5, 7.7e6])
+    np.testing.assert_allclose(table.electronic(energy), 1.0e-2 * energy ** 0.5, rtol=1e-10)
+    np.testing.assert_allclose(table.nuclear(energy), 1.0e2 * energy ** -0.5, rtol=1e-10)
+    np.testing.assert_allclose(table.stopping(energy), table.electronic(energy) + table.nuclear(energy))
+    np.testing.assert_allclose(table.range(energy), 1.0e-2 * energy ** 0.75, rtol=1e-10)
+    # clamped outside of the table
+    assert table.electronic(1.0e2) == table.electronic(1.0e3)
+    assert table.electronic(1.0e8) == table.electronic(1.0e7)
+
+
+def test_energy_after(table):
+    energy = np.array([1.0e5, 1.0e6])
+    np.testing.assert_allclose(table.energy_after(energy, 0.0), energy, rtol=1e-10)
+    np.testing.assert_array_equal(table.energy_after(energy, 1.0e12), [0.0, 0.0])
+
+    # crossing two slabs is crossing their total thickness
+    middle = table.energy_after(1.0e6, 1.0e4)
+    assert 0.0 < middle < 1.0e6
+    np.testing.assert_allclose(table.energy_after(middle, 2.0e4), table.energy_after(1.0e6, 3.0e4), rtol=1e-6)
+    np.testing.assert_allclose(table.path_length(1.0e6) - table.path_length(middle), 1.0e4, rtol=1e-6)
+
+
+def test_energy_through_target(table, target):
+    energies = energy_through_target([table, table], target, [1.0e6, 1.0e3])
+    assert energies.shape == (2, 2)
+    np.testing.assert_allclose(energies[0, 0], table.energy_after(1.0e6, target.layers[0].width))
+    assert energies[0, 0] > energies[1, 0] >= 0.0
+    np.testing.assert_array_equal(energies[:, 1], [0.0, 0.0])
+    with pytest.raises(ValueError):
+        energy_through_target([table], target, 1.0e6)
+
+
+def test_save_and_load(tmp_path, table):
+    path = str(tmp_path / 'table.npz')
+    table.metadata['ion'] = 'He'
+    table.save(path)
+    loaded = StoppingTable.load(path)
+    np.testing.assert_array_equal(loaded.energy, table.energy)
+    assert loaded.metadata == {'ion': 'He'}
+
+
+def test_compute(tmp_path, monkeypatch, ion, target, srim_directory, executor):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'home'))
+    layer = target.layers[0]
+
+    # tables of other executors never go to the default cache
+    table = StoppingTable.compute(ion, layer, srim_directory=srim_directory, executor=executor)
+    assert np.all(np.diff(table.energy) > 0.0)
+    assert table.metadata['layer'] == 'oxide'
+    assert not os.path.exists(str(tmp_path / 'home'))
+
+    cache_directory = str(tmp_path / 'tables')
+    StoppingTable.compute(ion, layer, srim_directory=srim_directory, cache_directory=cache_directory,
+                          executor=executor)
+    StoppingTable.compute(ion, layer, srim_directory=srim_directory, cache_directory=cache_directory,
+                          executor=executor)
+    assert executor.runs == 2
+    assert len(os.listdir(cache_directory)) == 1
+
+
+def test_failed_compute_is_not_saved(tmp_path, ion, target, srim_directory):
+    cache_directory = str(tmp_path / 'tables')
+    with pytest.raises(SRIMRunError):
+        StoppingTable.compute(ion, target.layers[0], srim_directory=srim_directory,
+                              cache_directory=cache_directory, executor=FailingExecutor())
+    assert not os.path.exists(cache_directory) or os.listdir(cache_directory) == []
@@ -0,0 +1,47 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import numpy as np
+
+from srim.output import Results
+from srim.store import ResultStore, export_results, load_results
+
+
+def test_export_round_trip(tmp_path, run_directory):
+    results = Results(run_directory)
+    path = str(tmp_path / 'run.npz')
+    export_results(results, path, {'name': 'run'})
+
+    loaded, metadata = load_results(path)
+    assert metadata['name'] == 'run'
+    assert metadata['number_ions'] == 1000
+    assert [layer['name'] for layer in metadata['layers']] == ['oxide', 'metal']
+    for name in Results.tables:
+        original, copy = getattr(results, name), getattr(loaded, name)
+        for key, value in original.__dict__.items():
+            if isinstance(value, np.ndarray):
+                np.testing.assert_array_equal(getattr(copy, key), value)
+    assert loaded.range.num_ions == results.range.num_ions
+    assert loaded.range.ion.symbol == results.range.ion.symbol
+    assert loaded.vacancy.columns == results.vacancy.columns
+
+
+def test_store(tmp_path, run_directory):
+    directory = str(tmp_path / 'store')
+    store = ResultStore(directory)
+    results = Results(run_directory)
+    for energy in (1.0e6, 2.0e6):
+        store.add(results, {'energy': energy, 'layer': 'oxide'}, flush=False)
+    store.flush()
+
+    store = ResultStore(directory)
+    assert len(store) == 2
+    assert {'energy': 2.0e6, 'layer': 'oxide'} in store
+    assert {'energy': 3.0e6, 'layer': 'oxide'} not in store
+    assert store.find(energy=1.0e6) == [{'energy': 1.0e6, 'layer': 'oxide'}]
+
+    loaded, metadata = store.load({'layer': 'oxide', 'energy': 1.0e6})
+    np.testing.assert_array_equal(loaded.range.ions, results.range.ions)
+    assert metadata['parameters'] == {'energy': 1.0e6, 'layer': 'oxide'}
+    assert len(store.load_all(layer='oxide')) == 2
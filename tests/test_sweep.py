@@ -0,0 +1,133 @@
+### PYSRIM : Python wrapper for SRIM calculation
+### Project initiated by : Christopher Ostrouchov
+### Modified by : Victor Garric : victor.garric@gmail.com, 2018
+
+import os
+import copy
+import json
+
+import pytest
+
+from srim.sweep import Sweep, load_index, load_parameters, PARAMETERS_FILENAME
+from srim.store import ResultStore
+from srim.executor import FakeExecutor
+
+
+BASE = {
+    'ion': {'identifier': 'He', 'energy': 1.0e6},
+    'layers': [{'formula': 'ZrO2', 'density': 5.68, 'width': 1.0e4}],
+    'settings': {'number_ions': 100, 'calculation': 2}
+}
+
+
+def test_configurations():
+    sweep = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6], 'layers.0.width': [1.0e4, 2.0e4, 3.0e4]})
+    assert len(sweep) == 6
+    assert len(list(sweep.configurations())) == 6
+
+    zipped = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6], 'layers.0.width': [1.0e4, 2.0e4]}, mode='zip')
+    assert list(zipped.configurations()) == [
+        {'ion.energy': 1.0e6, 'layers.0.width': 1.0e4},
+        {'ion.energy': 2.0e6, 'layers.0.width': 2.0e4}]
+
+    with pytest.raises(ValueError):
+        Sweep(BASE, {'ion.energy': [1.0e6], 'layers.0.width': [1.0e4, 2.0e4]}, mode='zip')
+
+    job = sweep.job({'ion.energy': 2.0e6, 'layers.0.width': 3.0e4})
+    assert job.ion.energy == 2.0e6
+    assert job.target.width == 3.0e4
+    assert BASE['layers'][0]['width'] == 1.0e4
+
+
+def test_names_do_not_depend_on_order():
+    sweep = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6]})
+    reordered = Sweep(BASE, {'ion.energy': [3.0e6, 2.0e6, 1.0e6]})
+    names = {sweep.name(configuration) for configuration in sweep.configurations()}
+    assert names < {reordered.name(configuration) for configuration in reordered.configurations()}
+
+
+def test_skips_completed(tmp_path, srim_directory, executor):
+    save_directory = str(tmp_path / 'sweep')
+    sweep = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6], 'layers.0.width': [1.0e4, 2.0e4]})
+    index = sweep.run(srim_directory, save_directory, max_workers=1, executor=executor)
+    assert executor.runs == 4
+    assert len(index) == 4
+    for run in load_index(save_directory):
+        record = load_parameters(run['directory'])
+        assert record['parameters'] == run['parameters']
+        assert record['base'] == BASE
+        assert record['specification'] == sweep.specification(run['parameters'])
+        assert os.path.isfile(os.path.join(run['directory'], 'RANGE.txt'))
+
+    sweep.run(srim_directory, save_directory, max_workers=1, executor=executor)
+    assert executor.runs == 4
+
+    # a new value only runs its configurations, whatever its position
+    progress = []
+    extended = Sweep(BASE, {'ion.energy': [3.0e6, 1.0e6, 2.0e6], 'layers.0.width': [1.0e4, 2.0e4]})
+    extended.run(srim_directory, save_directory, max_workers=1, executor=executor,
+                 progress=lambda done, total, job, results: progress.append((done, total)))
+    assert executor.runs == 6
+    assert progress[-1] == (6, 6)
+    assert len(load_index(save_directory)) == 6
+
+
+def test_progress_counts_repeats_once(tmp_path, srim_directory, executor):
+    progress = []
+    sweep = Sweep(BASE, [{'ion.energy': 1.0e6}, {'ion.energy': 2.0e6}, {'ion.energy': 1.0e6}])
+    sweep.run(srim_directory, str(tmp_path / 'sweep'), max_workers=1, executor=executor,
+              progress=lambda done, total, job, results: progress.append((done, total)))
+    assert executor.runs == 2
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_base_change_reruns(tmp_path, srim_directory, executor):
+    save_directory = str(tmp_path / 'sweep')
+    parameters = {'ion.energy': [1.0e6, 2.0e6]}
+    Sweep(BASE, parameters).run(srim_directory, save_directory, max_workers=1, executor=executor)
+
+    base = copy.deepcopy(BASE)
+    base['ion']['identifier'] = 'Ne'
+    index = Sweep(base, parameters).run(srim_directory, save_directory, max_workers=1, executor=executor)
+    assert executor.runs == 4
+    for run in index:
+        assert load_parameters(os.path.join(save_directory, run['directory']))['base'] == base
+
+
+def test_parallel_run_and_store(tmp_path, srim_directory):
+    save_directory = str(tmp_path / 'sweep')
+    sweep = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6, 3.0e6, 4.0e6, 5.0e6]})
+    sweep.run(srim_directory, save_directory, max_workers=2, executor=FakeExecutor())
+    store = ResultStore.from_sweep(save_directory, str(tmp_path / 'store'))
+    assert len(store) == 5
+    assert len(store.find(**{'ion.energy': 3.0e6})) == 1
+
+    # a sweep over another base sharing the store adds its own runs
+    base = copy.deepcopy(BASE)
+    base['settings']['number_ions'] = 200
+    other_directory = str(tmp_path / 'other')
+    Sweep(base, {'ion.energy': [1.0e6, 2.0e6]}).run(
+        srim_directory, other_directory, max_workers=1, executor=FakeExecutor())
+    store = ResultStore.from_sweep(other_directory, str(tmp_path / 'store'))
+    assert len(store) == 7
+    loaded = [store.load(parameters)[0] for parameters in store.find(**{'ion.energy': 1.0e6})]
+    assert {results.range.num_ions for results in loaded} == {100, 200}
+    assert {parameters['base']['settings']['number_ions'] for parameters in store} == {100, 200}
+
+
+def test_store_skips_runs_of_another_base(tmp_path, srim_directory):
+    save_directory = str(tmp_path / 'sweep')
+    index = Sweep(BASE, {'ion.energy': [1.0e6, 2.0e6, 3.0e6]}).run(
+        srim_directory, save_directory, max_workers=1, executor=FakeExecutor())
+
+    # a directory computed under another base, and one of an older pysrim
+    base = copy.deepcopy(BASE)
+    base['settings']['number_ions'] = 200
+    other = Sweep(base, [])
+    with open(os.path.join(save_directory, index[0]['directory'], PARAMETERS_FILENAME), 'w') as f:
+        json.dump(other.record(index[0]['parameters']), f)
+    with open(os.path.join(save_directory, index[1]['directory'], PARAMETERS_FILENAME), 'w') as f:
+        json.dump(index[1]['parameters'], f)
+
+    store = ResultStore.from_sweep(save_directory)
+    assert list(store) == [dict(index[2]['parameters'], base=BASE)]